@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Alert, TriggeredAlert
+from .models import (
+    Alert, AlertChange, AlertStatistics, NotificationOutbox, NotificationPreference, TriggeredAlert, WebhookEndpoint,
+)
 
 
 @admin.register(Alert)
@@ -25,3 +27,42 @@ class TriggeredAlertAdmin(admin.ModelAdmin):
     readonly_fields = ['triggered_at', 'email_sent_at']
 
 
+@admin.register(AlertChange)
+class AlertChangeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'operation', 'alert_id', 'user_id', 'created_at']
+    list_filter = ['operation', 'created_at']
+    search_fields = ['alert_id']
+    ordering = ['-id']
+    readonly_fields = ['alert_id', 'user_id', 'operation', 'data', 'created_at']
+
+
+@admin.register(AlertStatistics)
+class AlertStatisticsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'total_alerts', 'active_alerts', 'total_triggered', 'reconciled_at']
+    search_fields = ['user__username']
+    readonly_fields = [
+        'total_alerts', 'active_alerts', 'threshold_alerts', 'duration_alerts', 'total_triggered', 'reconciled_at'
+    ]
+
+
+@admin.register(NotificationPreference)
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    list_display = ['user', 'daily_digest', 'updated_at']
+    list_filter = ['daily_digest']
+    search_fields = ['user__username']
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'channel', 'user', 'triggered_alert', 'status', 'attempts', 'available_at', 'sent_at']
+    list_filter = ['channel', 'status']
+    search_fields = ['user__username', 'idempotency_key']
+    readonly_fields = ['idempotency_key', 'lease_owner', 'leased_until', 'created_at', 'sent_at']
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ['user', 'url', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['user__username', 'url']
+    readonly_fields = ['secret', 'created_at']
@@ -0,0 +1,103 @@
+import base64
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.utils.urls import replace_query_param
+
+from stock_alerting.asyncapi import async_api_view, json_response, paginate
+from stocks.history import from_cursor, to_cursor
+
+from .models import Alert, TriggeredAlert
+from .serializers import AlertSerializer, TriggeredAlertSerializer
+
+TRIGGERED_MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(row):
+    raw = f"{to_cursor(row['triggered_at'])}:{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    triggered_at, _, id = base64.urlsafe_b64decode(cursor.encode()).decode().partition(':')
+    return from_cursor(triggered_at), int(id)
+
+
+@async_api_view('Failed to fetch alerts')
+async def alert_list(request):
+    """GET /api/alerts/ on the async ORM"""
+    queryset = Alert.objects.filter(user=request.user).select_related('stock').order_by('-created_at')
+
+    is_active = request.GET.get('is_active')
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active.lower() == 'true')
+    stock_symbol = request.GET.get('stock_symbol')
+    if stock_symbol:
+        queryset = queryset.filter(stock__symbol__icontains=stock_symbol)
+
+    page = await paginate(request, queryset, lambda rows: {
+        'success': True,
+        'data': AlertSerializer(rows, many=True).data
+    })
+    if page is None:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+    return json_response(page)
+
+
+@async_api_view('Failed to fetch triggered alerts')
+async def triggered_alert_list(request):
+    """GET /api/triggered-alerts/ on the async ORM.
+
+    Same rows and ``days`` parameter, newest first, in numbered pages.
+    With ``?pagination=cursor`` (and ``page_size``) the cursor is a keyset
+    position on (triggered_at, id) and pages only forward.
+    """
+    queryset = TriggeredAlert.objects.filter(user=request.user).flat().order_by('-triggered_at', '-id')
+
+    days = request.GET.get('days')
+    if days:
+        try:
+            since = timezone.now() - timezone.timedelta(days=int(days))
+            queryset = queryset.filter(triggered_at__gte=since)
+        except ValueError:
+            pass
+
+    def results(rows):
+        return {
+            'success': True,
+            'data': TriggeredAlertSerializer(rows, many=True).data
+        }
+
+    if request.GET.get('pagination') != 'cursor':
+        page = await paginate(request, queryset, results)
+        if page is None:
+            return json_response({'detail': 'Invalid page.'}, status=404)
+        return json_response(page)
+
+    try:
+        page_size = min(int(request.GET['page_size']), TRIGGERED_MAX_PAGE_SIZE)
+    except (KeyError, ValueError):
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    if page_size < 1:
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            triggered_at, id = decode_cursor(cursor)
+        except (ValueError, OverflowError):
+            return json_response({'detail': 'Invalid cursor'}, status=404)
+        queryset = queryset.filter(Q(triggered_at__lt=triggered_at) | Q(triggered_at=triggered_at, id__lt=id))
+
+    rows = [row async for row in queryset[:page_size + 1]]
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(rows[-1]))
+
+    return json_response({
+        'next': next_url,
+        'previous': None,
+        'results': results(rows)
+    })
@@ -0,0 +1,190 @@
+import codecs
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from stocks.models import Stock
+from .models import Alert, AlertChange, AlertStatistics, TriggeredAlert
+from .serializers import AlertCreateSerializer
+from .signals import deleting_in_bulk
+
+FILTER_FIELDS = {'ids', 'stock_symbol', 'alert_type', 'is_active'}
+
+DUPLICATE_ERROR = "An active alert with this condition already exists"
+
+
+class TooManyRows(ValueError):
+    pass
+
+
+class CSVParser(BaseParser):
+    """Parses a CSV upload with a header row into a list of row dicts.
+
+    Rows are read from the request stream one at a time and reading stops
+    after ALERT_BULK_MAX_ROWS + 1 rows, so an oversized upload is rejected
+    without being read in full. Empty cells are left out of the row.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return []
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            reader = csv.DictReader(codecs.iterdecode(stream, encoding))
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for row in islice(reader, settings.ALERT_BULK_MAX_ROWS + 1)
+            ]
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ParseError(f"CSV parse error - {e}")
+
+
+def resolve_stocks(symbols):
+    """Active stocks by symbol for every symbol in ``symbols``, in one query"""
+    symbols = {symbol.strip().upper() for symbol in symbols if isinstance(symbol, str)}
+    return {stock.symbol: stock for stock in Stock.objects.filter(symbol__in=symbols, is_active=True)}
+
+
+def alert_rows(data):
+    """The list of alert rows in a request body: a JSON array, ``{"alerts": [...]}`` or parsed CSV"""
+    if isinstance(data, dict):
+        data = data.get('alerts')
+    if not isinstance(data, list) or not data:
+        raise ValueError("Expected a non-empty list of alerts")
+    if len(data) > settings.ALERT_BULK_MAX_ROWS:
+        raise TooManyRows(f"At most {settings.ALERT_BULK_MAX_ROWS} alerts can be created per request")
+    return data
+
+
+def create_alerts(user, rows):
+    """Validate each row on its own and insert the valid ones with one bulk_create.
+
+    Symbols are resolved up front and duplicates of the user's active
+    alerts (or of earlier rows) are caught before inserting, so one bad row
+    never fails the batch. A duplicate inserted concurrently after that check
+    is reported on its row as well. Returns one result per row, in order: the new
+    Alert or a dict of errors.
+    """
+    stocks = resolve_stocks(row.get('stock_symbol') for row in rows if isinstance(row, dict))
+    active = set(Alert.objects.filter(
+        user=user, is_active=True, stock__in=stocks.values()
+    ).values_list('stock_id', 'alert_type', 'condition', 'threshold_price'))
+
+    results = []
+    pending = []
+    for row in rows:
+        if not isinstance(row, dict):
+            results.append({'non_field_errors': ["Expected an object"]})
+            continue
+        serializer = AlertCreateSerializer(data=row, context={'stocks': stocks})
+        if not serializer.is_valid():
+            results.append(serializer.errors)
+            continue
+
+        data = dict(serializer.validated_data)
+        alert = Alert(user=user, stock=data.pop('stock_symbol'), **data)
+        try:
+            alert.clean()
+        except DjangoValidationError as e:
+            results.append({'non_field_errors': e.messages})
+            continue
+
+        key = (alert.stock_id, alert.alert_type, alert.condition, alert.threshold_price)
+        if key in active:
+            results.append({'non_field_errors': [DUPLICATE_ERROR]})
+            continue
+        active.add(key)
+        pending.append((len(results), alert))
+        results.append(alert)
+
+    if pending:
+        try:
+            insert_alerts([alert for _, alert in pending])
+        except IntegrityError:
+            # A concurrent request created one of these alerts after the
+            # duplicate check; insert row by row so only the conflicts fail
+            for index, alert in pending:
+                try:
+                    insert_alerts([alert])
+                except IntegrityError:
+                    results[index] = {'non_field_errors': [DUPLICATE_ERROR]}
+    return results
+
+
+def insert_alerts(alerts):
+    with transaction.atomic():
+        Alert.objects.bulk_create(alerts)
+        AlertChange.record_inserts(alerts)
+
+
+def filter_alerts(queryset, filters):
+    """Narrow ``queryset`` by a bulk operation's filter; an empty filter is refused"""
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError("A non-empty filter is required")
+    unknown = set(filters) - FILTER_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown filter fields: {', '.join(sorted(unknown))}")
+
+    if 'ids' in filters:
+        ids = filters['ids']
+        if not isinstance(ids, list) or not all(isinstance(value, int) for value in ids):
+            raise ValueError("ids must be a list of integers")
+        queryset = queryset.filter(id__in=ids)
+    if 'stock_symbol' in filters:
+        symbols = filters['stock_symbol']
+        symbols = [symbols] if isinstance(symbols, str) else symbols
+        if not isinstance(symbols, list) or not all(isinstance(value, str) for value in symbols):
+            raise ValueError("stock_symbol must be a symbol or a list of symbols")
+        queryset = queryset.filter(stock__symbol__in=[symbol.upper() for symbol in symbols])
+    if 'alert_type' in filters:
+        queryset = queryset.filter(alert_type=filters['alert_type'])
+    if 'is_active' in filters:
+        if not isinstance(filters['is_active'], bool):
+            raise ValueError("is_active must be true or false")
+        queryset = queryset.filter(is_active=filters['is_active'])
+    return queryset
+
+
+def set_active(queryset, is_active):
+    """Activate or deactivate every matching alert with one UPDATE; returns the changed ids"""
+    with transaction.atomic():
+        alert_ids = list(queryset.exclude(is_active=is_active).values_list('id', flat=True))
+        if alert_ids:
+            fields = {'is_active': is_active, 'updated_at': timezone.now()}
+            if is_active:
+                # Re-armed from scratch, like a new alert
+                fields.update(condition_first_met=None, condition_currently_met=False)
+            try:
+                Alert.objects.filter(id__in=alert_ids).update(**fields)
+            except IntegrityError:
+                raise ValueError("Reactivating would duplicate an active alert")
+            AlertChange.record_updates(alert_ids)
+    return alert_ids
+
+
+def delete_alerts(queryset):
+    """Delete every matching alert, recording the changes in bulk; returns the count deleted"""
+    with transaction.atomic():
+        alerts = list(queryset.values_list('id', 'user_id'))
+        if not alerts:
+            return 0
+        alert_ids = [alert_id for alert_id, _ in alerts]
+        # Counted before the cascade removes them
+        trigger_counts = dict(
+            TriggeredAlert.objects.filter(alert_id__in=alert_ids).order_by().values('user_id')
+            .annotate(count=Count('id')).values_list('user_id', 'count')
+        )
+        with deleting_in_bulk():
+            Alert.objects.filter(id__in=alert_ids).delete()
+        AlertChange.record_deletes(alerts)
+        if trigger_counts:
+            AlertStatistics.remove_triggers(trigger_counts)
+    return len(alerts)
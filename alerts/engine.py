@@ -0,0 +1,507 @@
+import heapq
+import itertools
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Max
+from django.utils import timezone
+
+from stocks.models import Stock, StockPrice
+from .changefeed import reflected_changes
+from .indicators import IndicatorBank, indicator_spec, indicator_triggered
+from .models import Alert, TriggeredAlert
+from .services import commit_triggers
+
+logger = logging.getLogger(__name__)
+
+
+class AlertState:
+    """In-memory copy of an active alert.
+
+    ``condition_first_met`` is only set when the alert runs its own duration
+    timer; otherwise it follows the shared timer of its predicate. A fired
+    re-arming alert is disarmed until the price has moved back past its band
+    (``crossed``) and ``cooldown_until`` has passed.
+    """
+
+    __slots__ = (
+        'id', 'user_id', 'stock_id', 'alert_type', 'condition',
+        'threshold_price', 'duration', 'indicator_period', 'spec', 'condition_first_met',
+        'rearm', 'cooldown', 'hysteresis', 'armed', 'crossed', 'cooldown_until',
+    )
+
+    def __init__(self, id, user_id, stock_id, alert_type, condition, threshold_price,
+                 duration_minutes=None, condition_first_met=None, indicator_period=None,
+                 rearm=False, cooldown_minutes=None, hysteresis=None):
+        self.id = id
+        self.user_id = user_id
+        self.stock_id = stock_id
+        self.alert_type = alert_type
+        self.condition = condition
+        self.threshold_price = Decimal(str(threshold_price))
+        self.duration = timedelta(minutes=duration_minutes) if duration_minutes else None
+        self.indicator_period = indicator_period
+        self.spec = indicator_spec(alert_type, indicator_period) if alert_type in Alert.INDICATOR_TYPES else None
+        self.condition_first_met = condition_first_met
+        self.rearm = rearm
+        self.cooldown = timedelta(minutes=cooldown_minutes) if rearm and cooldown_minutes else None
+        self.hysteresis = Decimal(str(hysteresis)) if rearm and hysteresis else Decimal('0')
+        self.armed = True
+        self.crossed = False
+        self.cooldown_until = None
+
+    def disarm(self, now):
+        self.armed = False
+        self.crossed = False
+        self.cooldown_until = now + self.cooldown if self.cooldown else None
+
+    @classmethod
+    def from_alert(cls, alert):
+        # The Alert's condition_first_met belongs to the Celery path and the
+        # engine never writes it back, so duration timers start fresh
+        return cls(
+            alert.id, alert.user_id, alert.stock_id, alert.alert_type, alert.condition,
+            alert.threshold_price, alert.duration_minutes,
+            indicator_period=alert.indicator_period, rearm=alert.rearm,
+            cooldown_minutes=alert.cooldown_minutes, hysteresis=alert.hysteresis,
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['id'], data['user_id'], data['stock_id'], data['alert_type'],
+            data['condition'], data['threshold_price'], data.get('duration_minutes'),
+            indicator_period=data.get('indicator_period'), rearm=data.get('rearm', False),
+            cooldown_minutes=data.get('cooldown_minutes'), hysteresis=data.get('hysteresis'),
+        )
+
+    @property
+    def key(self):
+        return (
+            self.stock_id, self.alert_type, self.condition,
+            self.threshold_price, self.duration, self.indicator_period,
+            self.rearm, self.cooldown, self.hysteresis,
+        )
+
+
+class Predicate:
+    """A distinct alert condition shared by every alert that subscribes to it"""
+
+    __slots__ = (
+        'key', 'stock_id', 'alert_type', 'condition', 'threshold_price',
+        'duration', 'spec', 'subscribers', 'first_met', 'own_timers', 'hysteresis', 'disarmed',
+    )
+
+    def __init__(self, state):
+        self.key = state.key
+        self.stock_id = state.stock_id
+        self.alert_type = state.alert_type
+        self.condition = state.condition
+        self.threshold_price = state.threshold_price
+        self.duration = state.duration
+        self.spec = state.spec
+        self.subscribers = {}
+        # Shared duration timer, and subscribers running their own instead
+        self.first_met = None
+        self.own_timers = set()
+        # Fired re-arming subscribers waiting to re-arm
+        self.hysteresis = state.hysteresis
+        self.disarmed = {}
+
+    def check_condition(self, price):
+        if self.condition == 'above':
+            return price > self.threshold_price
+        elif self.condition == 'below':
+            return price < self.threshold_price
+        return False
+
+    def rearm_met(self, price):
+        """Whether the price has moved back past the threshold by the hysteresis band"""
+        if self.spec is not None:
+            # Indicator alerts re-arm on cooldown alone
+            return True
+        if self.condition == 'above':
+            return price <= self.threshold_price - self.hysteresis
+        return price >= self.threshold_price + self.hysteresis
+
+
+def load_prices():
+    """Last known price per stock"""
+    return dict(Stock.objects.filter(current_price__isnull=False).values_list('id', 'current_price'))
+
+
+def recent_ticks(stock_id, lookback):
+    """The last ``lookback`` stored (price, volume) ticks of a stock, oldest first"""
+    return list(reversed(
+        StockPrice.objects.filter(stock_id=stock_id)
+        .order_by('-timestamp')
+        .values_list('price', 'volume')[:lookback]
+    ))
+
+
+def load_alert_states():
+    """Stream AlertState objects for every active alert.
+
+    Re-arming alerts that have fired before start disarmed, with their
+    cooldown counted from the last trigger. Duration timers are not
+    restored: one still holding restarts from the last known price.
+    """
+    last_triggered = dict(
+        TriggeredAlert.objects.filter(alert__is_active=True, alert__rearm=True)
+        .values('alert_id').annotate(last=Max('triggered_at')).values_list('alert_id', 'last')
+    )
+    alerts = Alert.objects.filter(is_active=True).only(
+        'id', 'user_id', 'stock_id', 'alert_type', 'condition', 'threshold_price',
+        'duration_minutes', 'indicator_period', 'rearm', 'cooldown_minutes', 'hysteresis',
+    )
+    for alert in alerts.iterator(chunk_size=2000):
+        state = AlertState.from_alert(alert)
+        if alert.id in last_triggered:
+            state.disarm(last_triggered[alert.id])
+        yield state
+
+
+class EngineLoop:
+    """Event loop shared by the single-process and partitioned engines"""
+
+    # Last change id per alert already in the loaded snapshot
+    _reflected = {}
+
+    def load_change_position(self, change_feed):
+        """Keep the consumer where it is and note what the snapshot about to be read covers.
+
+        Replaying from the stored position picks up changes whose
+        transactions were still open when the snapshot was read; changes
+        the snapshot already holds are skipped rather than re-applied, so
+        superseded versions of an alert are never evaluated.
+        """
+        self._reflected = reflected_changes(change_feed.position) if change_feed is not None else {}
+
+    def apply_change(self, change, now=None):
+        """Apply an AlertChange row from the change feed"""
+        if change.id <= self._reflected.get(change.alert_id, 0):
+            return
+        if change.operation == 'delete' or not change.data.get('is_active'):
+            self.remove_alert(change.alert_id)
+        else:
+            self.add_alert(AlertState.from_dict(change.data), now)
+
+    def maintain(self, now):
+        """Periodic housekeeping hook, called once per cycle"""
+
+    def apply_events(self, events, now):
+        for event in events:
+            try:
+                self.apply(event, now)
+            except Exception as e:
+                logger.error(f"Alert engine failed to apply {event.get('type')} event: {e}")
+
+    def run(self, event_queue, change_feed=None, batch_size=500, max_wait=1.0, should_stop=None):
+        """Consume price events and alert changes until ``should_stop`` returns True"""
+        while not (should_stop and should_stop()):
+            if change_feed is not None:
+                change_feed.consume(self.apply_change)
+
+            timeout = max_wait
+            deadline = self.next_deadline()
+            if deadline is not None:
+                timeout = min(timeout, max((deadline - timezone.now()).total_seconds(), 0))
+
+            events = event_queue.get_batch(timeout, batch_size)
+            now = timezone.now()
+            self.apply_events(events, now)
+            self.on_clock(now)
+            self.maintain(now)
+
+            triggered_count = len(self.pending)
+            if triggered_count:
+                self.flush()
+                published = [event['published_at'] for event in events if 'published_at' in event]
+                if published:
+                    latency_ms = (time.time() - min(published)) * 1000
+                    logger.info(f"Alert engine fired {triggered_count} alerts, {latency_ms:.1f} ms after tick")
+
+    def flush(self):
+        """Hand all pending triggers to the sink in one batch"""
+        if not self.pending:
+            return []
+        triggers, self.pending = self.pending, []
+        return self.sink(triggers)
+
+
+class AlertEngine(EngineLoop):
+    """Long-running evaluator holding the active alert book in memory.
+
+    Mirrors ``Alert.should_trigger``: threshold alerts fire as soon as a price
+    meets their condition, duration alerts once the condition has held for
+    ``duration_minutes``. Duration deadlines are kept in a heap so they fire
+    on time even when no new price arrives. Fired alerts leave the book and
+    are handed to ``sink`` in batches; nothing else is written back, so
+    duration timers start fresh on every load. Alert inserts, updates and
+    deletes arrive through the AlertChange feed.
+
+    Alerts with identical conditions subscribe to one Predicate, which is
+    evaluated once per tick and fans its trigger out to every subscriber, so
+    tick cost scales with distinct predicates rather than with users.
+    Indicator predicates share one IndicatorBank per stock, updated once per
+    tick; new indicators are primed from stored history when
+    ``prime_indicators`` is set.
+
+    Re-arming alerts stay in the book when they fire. They are disarmed until
+    the price moves back past their hysteresis band and the cooldown passes,
+    so only their TriggeredAlert rows are written.
+    """
+
+    def __init__(self, sink=commit_triggers, prime_indicators=True):
+        self.sink = sink
+        self.prime_indicators = prime_indicators
+        self.alerts = {}
+        self.predicates = {}
+        self.book = defaultdict(dict)
+        self.prices = {}
+        self.indicators = {}
+        self.deadlines = []
+        self.pending = []
+        self._sequence = itertools.count()
+
+    def load(self, now=None, change_feed=None):
+        """Warm-start the book and last known prices from the database.
+
+        When a change feed consumer is given, changes after its stored
+        position that the snapshot misses are replayed on top.
+        """
+        now = now or timezone.now()
+        self.load_change_position(change_feed)
+        self.prices = load_prices()
+        for state in load_alert_states():
+            self.add_alert(state, now, prime=False)
+        if self.prime_indicators:
+            for stock_id, bank in self.indicators.items():
+                self._prime(stock_id, bank, list(bank.indicators))
+        logger.info(
+            f"Alert engine loaded {len(self.alerts)} alerts as {len(self.predicates)} "
+            f"predicates on {len(self.book)} stocks"
+        )
+
+    def add_alert(self, state, now=None, prime=True):
+        """Insert or replace an alert and evaluate it against the last known price"""
+        now = now or timezone.now()
+        key = state.key
+        previous = self.alerts.get(state.id)
+        if previous is not None and previous.key == key:
+            # An update that leaves the predicate alone keeps the running timer
+            if state.condition_first_met is None:
+                state.condition_first_met = previous.condition_first_met
+            state.armed, state.crossed, state.cooldown_until = previous.armed, previous.crossed, previous.cooldown_until
+            self.alerts[state.id] = state
+            predicate = self.predicates[key]
+            predicate.subscribers[state.id] = state
+            if not state.armed:
+                predicate.disarmed[state.id] = state
+            return
+
+        predicate = self.predicates.get(key)
+        new_indicator = False
+        if predicate is None:
+            predicate = Predicate(state)
+            if predicate.spec is not None:
+                # Acquire before releasing the previous version so shared state survives updates
+                bank = self.indicators.setdefault(state.stock_id, IndicatorBank())
+                new_indicator = bank.get(predicate.spec) is None
+                bank.acquire(predicate.spec)
+        self.remove_alert(state.id)
+        if key not in self.predicates:
+            self.predicates[key] = predicate
+            self.book[state.stock_id][key] = predicate
+
+        self.alerts[state.id] = state
+        predicate.subscribers[state.id] = state
+        if not state.armed:
+            predicate.disarmed[state.id] = state
+        if state.condition_first_met is None and predicate.first_met is not None:
+            # Joining a condition that already holds starts a fresh timer
+            state.condition_first_met = now
+        if state.condition_first_met is not None:
+            predicate.own_timers.add(state.id)
+            self._schedule(state.condition_first_met + predicate.duration, key, state.id)
+
+        if predicate.spec is not None:
+            if new_indicator and prime and self.prime_indicators:
+                self._prime(state.stock_id, self.indicators[state.stock_id], [predicate.spec])
+            # Crossovers and moves need a fresh tick, so there is nothing to evaluate yet
+            return
+
+        price = self.prices.get(state.stock_id)
+        if price is None:
+            return
+        if predicate.alert_type == 'threshold':
+            if predicate.check_condition(price):
+                self._fire(state, price, now)
+        elif len(predicate.subscribers) == 1:
+            self._evaluate(predicate, price, now)
+
+    def remove_alert(self, alert_id):
+        state = self.alerts.pop(alert_id, None)
+        if state is None:
+            return
+        predicate = self.predicates[state.key]
+        del predicate.subscribers[alert_id]
+        predicate.own_timers.discard(alert_id)
+        predicate.disarmed.pop(alert_id, None)
+        if predicate.subscribers:
+            return
+
+        del self.predicates[predicate.key]
+        stock_predicates = self.book[predicate.stock_id]
+        del stock_predicates[predicate.key]
+        if not stock_predicates:
+            del self.book[predicate.stock_id]
+        if predicate.spec is not None:
+            bank = self.indicators[predicate.stock_id]
+            bank.release(predicate.spec)
+            if not len(bank):
+                del self.indicators[predicate.stock_id]
+
+    def export_alerts(self, alert_ids):
+        """Remove alerts and return them with their effective duration timers, for moving to another engine"""
+        exported = []
+        for alert_id in alert_ids:
+            state = self.alerts.get(alert_id)
+            if state is None:
+                continue
+            if state.condition_first_met is None:
+                state.condition_first_met = self.predicates[state.key].first_met
+            self.remove_alert(alert_id)
+            exported.append(state)
+        return exported
+
+    def on_price(self, stock_id, price, now=None, volume=None):
+        """Apply a new price and evaluate every predicate on that stock once"""
+        now = now or timezone.now()
+        self.prices[stock_id] = price
+        bank = self.indicators.get(stock_id)
+        if bank is not None:
+            bank.update(price, volume)
+        predicates = self.book.get(stock_id)
+        if predicates:
+            for predicate in list(predicates.values()):
+                if predicate.disarmed:
+                    self._rearm(predicate, price, now)
+                self._evaluate(predicate, price, now)
+        self.on_clock(now)
+
+    def on_clock(self, now=None):
+        """Fire duration alerts whose deadline has passed"""
+        now = now or timezone.now()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, _, key, alert_id = heapq.heappop(self.deadlines)
+            predicate = self.predicates.get(key)
+            if predicate is None:
+                continue
+            price = self.prices.get(predicate.stock_id)
+            if price is None or not predicate.check_condition(price):
+                continue
+
+            # Skip stale entries left behind by a reset or removed alert
+            if alert_id is None:
+                if predicate.first_met is None or predicate.first_met + predicate.duration != deadline:
+                    continue
+                for state in list(predicate.subscribers.values()):
+                    if state.condition_first_met is None:
+                        self._fire(state, price, deadline)
+            else:
+                state = predicate.subscribers.get(alert_id)
+                if state is None or state.condition_first_met is None:
+                    continue
+                if state.condition_first_met + predicate.duration == deadline:
+                    self._fire(state, price, deadline)
+
+    def next_deadline(self):
+        return self.deadlines[0][0] if self.deadlines else None
+
+    def apply(self, event, now=None):
+        now = now or timezone.now()
+        if event['type'] == 'price':
+            self.on_price(event['stock_id'], Decimal(event['price']), now, event.get('volume'))
+        else:
+            logger.warning(f"Unknown alert engine event: {event['type']}")
+
+    def _evaluate(self, predicate, price, now):
+        if predicate.spec is not None:
+            if indicator_triggered(
+                predicate.alert_type, predicate.condition, predicate.threshold_price,
+                self.indicators[predicate.stock_id], predicate.spec,
+            ):
+                self._fire_all(predicate, price, now)
+            return
+
+        condition_met = predicate.check_condition(price)
+
+        if predicate.alert_type == 'threshold':
+            if condition_met:
+                self._fire_all(predicate, price, now)
+
+        elif predicate.alert_type == 'duration':
+            if not condition_met:
+                # Condition broken, reset every timer on this predicate
+                predicate.first_met = None
+                for alert_id in predicate.own_timers:
+                    predicate.subscribers[alert_id].condition_first_met = None
+                predicate.own_timers.clear()
+            elif predicate.first_met is None:
+                predicate.first_met = now
+                self._schedule(now + predicate.duration, predicate.key, None)
+
+    def _schedule(self, deadline, key, alert_id):
+        heapq.heappush(self.deadlines, (deadline, next(self._sequence), key, alert_id))
+
+    def _fire(self, state, price, now):
+        if not state.armed:
+            return
+        if state.rearm:
+            predicate = self.predicates[state.key]
+            state.disarm(now)
+            predicate.disarmed[state.id] = state
+            if state.id in predicate.own_timers:
+                predicate.own_timers.discard(state.id)
+                state.condition_first_met = None
+        else:
+            self.remove_alert(state.id)
+        self.pending.append((state, price))
+
+    def _fire_all(self, predicate, price, now):
+        if len(predicate.disarmed) == len(predicate.subscribers):
+            return
+        for state in list(predicate.subscribers.values()):
+            self._fire(state, price, now)
+
+    def _rearm(self, predicate, price, now):
+        crossed = predicate.rearm_met(price)
+        for state in list(predicate.disarmed.values()):
+            state.crossed = state.crossed or crossed
+            if state.crossed and (state.cooldown_until is None or now >= state.cooldown_until):
+                state.armed = True
+                del predicate.disarmed[state.id]
+
+    def recent_ticks(self, stock_id, lookback):
+        return recent_ticks(stock_id, lookback)
+
+    def _prime(self, stock_id, bank, specs):
+        """Feed recent stored ticks into newly created indicators"""
+        lookback = max(period for _, period in specs)
+        history = self.recent_ticks(stock_id, lookback)
+        if not history:
+            return
+        if len(specs) == len(bank):
+            for price, volume in history:
+                bank.update(price, volume)
+            return
+        for spec in specs:
+            indicator = bank.get(spec)
+            for price, volume in history:
+                sample = volume if spec[0] == 'volume_sma' else price
+                if sample is not None:
+                    indicator.update(float(sample))
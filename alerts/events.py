@@ -0,0 +1,78 @@
+import json
+import logging
+import queue
+import time
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+def publish_event(event):
+    """Push an event onto the alert engine queue (no-op unless the engine is enabled)"""
+    if not settings.ALERT_ENGINE_ENABLED:
+        return
+    event['published_at'] = time.time()
+    try:
+        get_redis().rpush(settings.ALERT_ENGINE_QUEUE, json.dumps(event))
+    except redis.RedisError as e:
+        logger.error(f"Failed to publish {event['type']} event to alert engine: {e}")
+
+
+def price_event(stock_id, price, volume=None, timestamp=None):
+    return {
+        'type': 'price',
+        'stock_id': stock_id,
+        'price': str(price),
+        'volume': volume,
+        'timestamp': timestamp.isoformat() if timestamp else None,
+    }
+
+
+class RedisEventQueue:
+    """Consumer side of the alert engine queue backed by a Redis list"""
+
+    def __init__(self, client=None, key=None):
+        self.client = client or get_redis()
+        self.key = key or settings.ALERT_ENGINE_QUEUE
+
+    def get_batch(self, timeout, max_events):
+        """Block up to ``timeout`` seconds for one event, then drain up to ``max_events``"""
+        item = self.client.blpop(self.key, timeout=max(timeout, 0.01))
+        if item is None:
+            return []
+        raw = [item[1]]
+        if max_events > 1:
+            raw.extend(self.client.lpop(self.key, max_events - 1) or [])
+        return [json.loads(value) for value in raw]
+
+
+class LocalEventQueue:
+    """In-process queue with the same interface, used by tests and embedded engines"""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def put(self, event):
+        self.queue.put(event)
+
+    def get_batch(self, timeout, max_events):
+        try:
+            events = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(events) < max_events:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
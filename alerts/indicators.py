@@ -0,0 +1,179 @@
+from collections import deque
+
+
+class SMA:
+    """Simple moving average over the last ``period`` samples, kept as a running sum"""
+
+    __slots__ = ('period', 'window', 'total', 'value', 'previous')
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.value = None
+        self.previous = None
+
+    def update(self, sample):
+        self.window.append(sample)
+        self.total += sample
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        self.previous = self.value
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+
+
+class EMA:
+    """Exponential moving average seeded with the SMA of the first ``period`` samples"""
+
+    __slots__ = ('period', 'alpha', 'count', 'total', 'value', 'previous')
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = None
+        self.previous = None
+
+    def update(self, sample):
+        self.previous = self.value
+        self.count += 1
+        if self.value is not None:
+            self.value += self.alpha * (sample - self.value)
+        else:
+            self.total += sample
+            if self.count == self.period:
+                self.value = self.total / self.period
+
+
+class RollingMinMax:
+    """Windowed min and max over the last ``period`` samples using monotonic deques"""
+
+    __slots__ = ('period', 'count', 'lows', 'highs', 'value', 'previous')
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.lows = deque()
+        self.highs = deque()
+        self.value = None
+        self.previous = None
+
+    def update(self, sample):
+        index = self.count
+        self.count += 1
+        while self.lows and self.lows[-1][1] >= sample:
+            self.lows.pop()
+        self.lows.append((index, sample))
+        while self.highs and self.highs[-1][1] <= sample:
+            self.highs.pop()
+        self.highs.append((index, sample))
+
+        oldest = index - self.period + 1
+        if self.lows[0][0] < oldest:
+            self.lows.popleft()
+        if self.highs[0][0] < oldest:
+            self.highs.popleft()
+
+        self.previous = self.value
+        if self.count >= self.period:
+            self.value = (self.lows[0][1], self.highs[0][1])
+
+
+INDICATORS = {
+    'sma': SMA,
+    'ema': EMA,
+    'minmax': RollingMinMax,
+    'volume_sma': SMA,
+}
+
+# Indicator each alert type is computed from
+ALERT_TYPE_INDICATORS = {
+    'percent_move': 'minmax',
+    'sma_cross': 'sma',
+    'ema_cross': 'ema',
+    'volume_spike': 'volume_sma',
+}
+
+
+def indicator_spec(alert_type, period):
+    return (ALERT_TYPE_INDICATORS[alert_type], period)
+
+
+class IndicatorBank:
+    """Rolling indicator state for one symbol.
+
+    Each distinct (kind, period) indicator exists once and is shared by every
+    alert that needs it; a tick updates each indicator in constant time.
+    """
+
+    def __init__(self):
+        self.indicators = {}
+        self.refcounts = {}
+        self.price = None
+        self.previous_price = None
+        self.volume = None
+
+    def __len__(self):
+        return len(self.indicators)
+
+    def acquire(self, spec):
+        if spec not in self.indicators:
+            kind, period = spec
+            self.indicators[spec] = INDICATORS[kind](period)
+            self.refcounts[spec] = 0
+        self.refcounts[spec] += 1
+        return self.indicators[spec]
+
+    def release(self, spec):
+        self.refcounts[spec] -= 1
+        if not self.refcounts[spec]:
+            del self.refcounts[spec]
+            del self.indicators[spec]
+
+    def get(self, spec):
+        return self.indicators.get(spec)
+
+    def update(self, price, volume=None):
+        price = float(price)
+        self.previous_price, self.price = self.price, price
+        self.volume = volume
+        for (kind, _), indicator in self.indicators.items():
+            if kind == 'volume_sma':
+                if volume is not None:
+                    indicator.update(float(volume))
+            else:
+                indicator.update(price)
+
+
+def indicator_triggered(alert_type, condition, threshold, bank, spec):
+    """Evaluate an indicator alert against the bank's latest tick"""
+    indicator = bank.get(spec)
+    if indicator is None or indicator.value is None or bank.price is None:
+        return False
+    price = bank.price
+    threshold = float(threshold)
+
+    if alert_type == 'percent_move':
+        low, high = indicator.value
+        if condition == 'above':
+            return low > 0 and (price - low) / low * 100 >= threshold
+        return high > 0 and (high - price) / high * 100 >= threshold
+
+    if alert_type in ('sma_cross', 'ema_cross'):
+        if indicator.previous is None or bank.previous_price is None:
+            return False
+        if condition == 'above':
+            factor = 1 + threshold / 100
+            return bank.previous_price <= indicator.previous * factor and price > indicator.value * factor
+        factor = 1 - threshold / 100
+        return bank.previous_price >= indicator.previous * factor and price < indicator.value * factor
+
+    if alert_type == 'volume_spike':
+        # Compare against the average of the ticks before this one
+        if bank.volume is None or not indicator.previous:
+            return False
+        return bank.volume >= threshold * indicator.previous
+
+    return False
@@ -0,0 +1,70 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from alerts.engine import AlertEngine, AlertState
+from alerts.parallel import PartitionedEngine
+
+
+class Command(BaseCommand):
+    help = "Benchmark alert evaluation throughput across worker process counts on synthetic data"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                            help="Worker process counts to measure")
+        parser.add_argument('--alerts', type=int, default=200000)
+        parser.add_argument('--stocks', type=int, default=500)
+        parser.add_argument('--ticks', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Ticks dispatched to the workers per round trip")
+        parser.add_argument('--skew', type=float, default=0.0,
+                            help="Fraction of alerts placed on a single stock")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        stocks = options['stocks']
+        now = timezone.now()
+
+        # Every alert gets a distinct threshold far from the walk so nothing fires
+        # and all workers keep their full book for the whole run
+        states = []
+        for alert_id in range(1, options['alerts'] + 1):
+            stock_id = 1 if rng.random() < options['skew'] else rng.randint(1, stocks)
+            condition = rng.choice(['above', 'below'])
+            offset = Decimal(alert_id % 10000) / 100
+            threshold = Decimal('1000.00') + offset if condition == 'above' else Decimal('1.00') + offset / 100
+            states.append((alert_id, alert_id, stock_id, 'threshold', condition, threshold))
+
+        ticks = [
+            (rng.randint(1, stocks), Decimal(rng.randint(9000, 11000)) / 100, None, now)
+            for _ in range(options['ticks'])
+        ]
+        batches = [ticks[i:i + options['batch_size']] for i in range(0, len(ticks), options['batch_size'])]
+
+        self.stdout.write(
+            f"{options['alerts']} alerts on {stocks} stocks (skew {options['skew']:.0%}), {len(ticks)} ticks"
+        )
+
+        engine = AlertEngine(sink=list, prime_indicators=False)
+        for state in states:
+            engine.add_alert(AlertState(*state), now)
+        started = time.perf_counter()
+        for stock_id, price, volume, tick_time in ticks:
+            engine.on_price(stock_id, price, tick_time, volume)
+        baseline = len(ticks) / (time.perf_counter() - started)
+        self.stdout.write(f"single process   {baseline:>12,.0f} ticks/s")
+
+        for workers in options['workers']:
+            with PartitionedEngine(workers, sink=list) as partitioned:
+                partitioned.add_alerts([AlertState(*state) for state in states], now)
+                if options['skew']:
+                    partitioned.rebalance(now)
+                started = time.perf_counter()
+                for batch in batches:
+                    partitioned.on_ticks(batch)
+                rate = len(ticks) / (time.perf_counter() - started)
+            self.stdout.write(f"{workers:>2} worker(s)     {rate:>12,.0f} ticks/s  {rate / baseline:5.2f}x")
@@ -0,0 +1,48 @@
+import signal
+from django.core.management.base import BaseCommand
+
+from alerts.changefeed import ChangeFeedConsumer
+from alerts.engine import AlertEngine
+from alerts.events import RedisEventQueue
+from alerts.parallel import PartitionedEngine
+
+
+class Command(BaseCommand):
+    help = "Run the long-running in-memory alert evaluator"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Maximum number of queued events applied per cycle")
+        parser.add_argument('--max-wait', type=float, default=1.0,
+                            help="Seconds to block waiting for events")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Partition evaluation across this many worker processes")
+
+    def handle(self, *args, **options):
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+        change_feed = ChangeFeedConsumer('alert-engine')
+        if options['workers'] > 1:
+            engine = PartitionedEngine(options['workers'])
+            engine.start()
+        else:
+            engine = AlertEngine()
+        engine.load(change_feed=change_feed)
+        self.stdout.write(f"Alert engine started on {options['workers']} worker(s)")
+
+        try:
+            engine.run(
+                RedisEventQueue(),
+                change_feed=change_feed,
+                batch_size=options['batch_size'],
+                max_wait=options['max_wait'],
+                should_stop=lambda: bool(stopping),
+            )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            engine.flush()
+            if isinstance(engine, PartitionedEngine):
+                engine.stop()
+            self.stdout.write("Alert engine stopped")
@@ -0,0 +1,37 @@
+import signal
+import time
+from django.core.management.base import BaseCommand
+
+from alerts.notifications import default_worker_name, drain_outbox
+from alerts.webhooks import WebhookDispatcher
+
+
+class Command(BaseCommand):
+    help = "Run a notification outbox dispatcher; start several to deliver in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Users claimed per batch (default: ALERT_NOTIFICATION_BATCH_SIZE)")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when the outbox has nothing due")
+        parser.add_argument('--worker', default=None, help="Name recorded on leased rows")
+
+    def handle(self, *args, **options):
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        worker = options['worker'] or default_worker_name()
+        self.stdout.write(f"Notification dispatcher {worker} started")
+
+        # Keep one webhook dispatcher so its connections stay alive between batches
+        webhooks = WebhookDispatcher(worker)
+        try:
+            while not stopping:
+                claimed, _ = drain_outbox(worker, options['batch_size'])
+                posted, _ = webhooks.drain(options['batch_size'])
+                if not claimed and not posted:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            webhooks.close()
+            self.stdout.write("Notification dispatcher stopped")
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_alert_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='indicator_period',
+            field=models.PositiveIntegerField(blank=True, help_text='Lookback in price updates, required for indicator alerts (minimum 2)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='alert',
+            name='alert_type',
+            field=models.CharField(choices=[('threshold', 'Threshold Alert'), ('duration', 'Duration Alert'), ('percent_move', 'Percent Move Alert'), ('sma_cross', 'SMA Crossover Alert'), ('ema_cross', 'EMA Crossover Alert'), ('volume_spike', 'Volume Spike Alert')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_alert_indicator_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='cooldown_minutes',
+            field=models.PositiveIntegerField(blank=True, help_text='Minimum minutes between triggers of a re-arming alert', null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='hysteresis',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Distance the price must move back past the threshold before a re-arming alert re-arms', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='rearm',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('alerts', '0010_webhook_endpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='triggeredalert',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='triggered_alerts', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:39
+
+from django.db import migrations, models
+
+
+def copy_alert_user(apps, schema_editor):
+    TriggeredAlert = apps.get_model('alerts', 'TriggeredAlert')
+    Alert = apps.get_model('alerts', 'Alert')
+    TriggeredAlert.objects.update(
+        user_id=models.Subquery(Alert.objects.filter(id=models.OuterRef('alert_id')).values('user_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    """Backfill on its own, so PostgreSQL commits the UPDATE before the table is altered"""
+
+    dependencies = [
+        ('alerts', '0011_triggered_alert_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_alert_user, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0012_backfill_triggered_alert_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='triggeredalert',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='triggered_alerts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='triggeredalert',
+            index=models.Index(fields=['user', '-triggered_at', '-id'], name='triggered_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_remove_user_email_notifications_and_more'),
+        ('alerts', '0013_triggered_alert_user_required'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertStatistics',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='alert_statistics', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_alerts', models.PositiveIntegerField(default=0)),
+                ('active_alerts', models.PositiveIntegerField(default=0)),
+                ('threshold_alerts', models.PositiveIntegerField(default=0)),
+                ('duration_alerts', models.PositiveIntegerField(default=0)),
+                ('total_triggered', models.PositiveBigIntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+import secrets
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from stocks.cache import bump_version, user_scope
 from stocks.models import Stock
 from django.core.exceptions import ValidationError
 
@@ -12,13 +16,32 @@ class Alert(models.Model):
     ALERT_TYPES = [
         ('threshold', 'Threshold Alert'),
         ('duration', 'Duration Alert'),
+        ('percent_move', 'Percent Move Alert'),
+        ('sma_cross', 'SMA Crossover Alert'),
+        ('ema_cross', 'EMA Crossover Alert'),
+        ('volume_spike', 'Volume Spike Alert'),
     ]
     
+    # Types computed from the tick stream by the alert engine. For these,
+    # threshold_price holds a percentage (percent_move, sma_cross, ema_cross)
+    # or a multiple of average volume (volume_spike).
+    INDICATOR_TYPES = frozenset({'percent_move', 'sma_cross', 'ema_cross', 'volume_spike'})
+    
     CONDITIONS = [
         ('above', 'Above'),
         ('below', 'Below'),
     ]
     
+    # Fields written by the evaluator to track duration alerts
+    TRACKING_FIELDS = frozenset({'condition_first_met', 'condition_currently_met'})
+    
+    # Fields published to the change feed
+    SNAPSHOT_FIELDS = [
+        'id', 'user_id', 'stock_id', 'alert_type', 'condition', 'threshold_price',
+        'duration_minutes', 'indicator_period', 'rearm', 'cooldown_minutes', 'hysteresis',
+        'is_active', 'updated_at',
+    ]
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alerts')
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='alerts')
     alert_type = models.CharField(max_length=20, choices=ALERT_TYPES)
@@ -29,6 +52,28 @@ class Alert(models.Model):
         blank=True, 
         help_text="Required for duration alerts (minimum 1 minute)"
     )
+    indicator_period = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Lookback in price updates, required for indicator alerts (minimum 2)"
+    )
+    
+    # Re-arming alerts stay active after a trigger and fire again once the
+    # price has moved back past threshold_price by the hysteresis band and the
+    # cooldown has passed. Only the alert engine evaluates them.
+    rearm = models.BooleanField(default=False)
+    cooldown_minutes = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Minimum minutes between triggers of a re-arming alert"
+    )
+    hysteresis = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Distance the price must move back past the threshold before a re-arming alert re-arms"
+    )
     
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -62,12 +107,38 @@ class Alert(models.Model):
                 raise ValidationError("Duration minutes is required for duration alerts")
             if self.duration_minutes < 1:
                 raise ValidationError("Duration must be at least 1 minute")
-        if self.alert_type == 'threshold' and self.duration_minutes:
+        if self.alert_type in self.INDICATOR_TYPES:
+            if not self.indicator_period or self.indicator_period < 2:
+                raise ValidationError("Indicator period of at least 2 is required for indicator alerts")
+            if self.alert_type == 'volume_spike' and self.condition != 'above':
+                raise ValidationError("Volume spike alerts only support the 'above' condition")
+        elif self.indicator_period:
+            self.indicator_period = None
+        if self.alert_type != 'duration' and self.duration_minutes:
             self.duration_minutes = None
+        if self.rearm:
+            if self.hysteresis is not None and self.hysteresis < 0:
+                raise ValidationError("Hysteresis cannot be negative")
+            if self.alert_type in self.INDICATOR_TYPES:
+                self.hysteresis = None
+        else:
+            self.cooldown_minutes = None
+            self.hysteresis = None
     
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields and set(update_fields) <= self.TRACKING_FIELDS:
+            super().save(*args, **kwargs)
+            return
+        
+        operation = 'insert' if self._state.adding else 'update'
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            AlertChange.record(self, operation)
+    
+    def snapshot(self):
+        return {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
     
     def check_condition(self, current_price):
         """Check if the alert condition is met with the current price"""
@@ -79,7 +150,14 @@ class Alert(models.Model):
     
     
     def should_trigger(self, current_price):
-        """Determine if the alert should be triggered"""
+        """Determine if the alert should be triggered.
+
+        Indicator and re-arming alerts depend on the tick history and are only
+        evaluated by the alert engine, so they never trigger here.
+        """
+        if self.alert_type in self.INDICATOR_TYPES or self.rearm:
+            return False
+        
         condition_met = self.check_condition(current_price)
         
         if self.alert_type == 'threshold':
@@ -113,10 +191,27 @@ class Alert(models.Model):
         return False
 
 
+class TriggeredAlertQuerySet(models.QuerySet):
+    def flat(self):
+        """One joined query of plain rows, the shape TriggeredAlertSerializer reads"""
+        return self.values(
+            'id', 'alert_id', 'trigger_price', 'triggered_at', 'email_sent', 'email_sent_at', 'notification_error',
+            stock_symbol=models.F('alert__stock__symbol'),
+            stock_name=models.F('alert__stock__name'),
+            alert_type=models.F('alert__alert_type'),
+            condition=models.F('alert__condition'),
+            threshold_price=models.F('alert__threshold_price'),
+        )
+
+
 class TriggeredAlert(models.Model):
     """Model representing alerts that have been triggered"""
     
+    objects = TriggeredAlertQuerySet.as_manager()
+    
     alert = models.ForeignKey(Alert, on_delete=models.CASCADE, related_name='triggered_instances')
+    # Copied from the alert so a user's history is read from one index
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='triggered_alerts')
     trigger_price = models.DecimalField(max_digits=10, decimal_places=2)
     triggered_at = models.DateTimeField(auto_now_add=True)
     
@@ -127,9 +222,283 @@ class TriggeredAlert(models.Model):
     
     class Meta:
         ordering = ['-triggered_at']
+        indexes = [
+            models.Index(fields=['user', '-triggered_at', '-id'], name='triggered_user_recent_idx'),
+        ]
     
     def __str__(self):
         return f"Triggered: {self.alert} at ${self.trigger_price} on {self.triggered_at}"
+    
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.alert.user_id
+        super().save(*args, **kwargs)
+
+
+class AlertStatistics(models.Model):
+    """Per-user alert and trigger counters behind the statistics endpoint.
+
+    Alert counts are recomputed from the user's alerts whenever one changes,
+    in the same transaction. Trigger totals are incremented as triggers are
+    committed, so reading them never scans trigger history; the periodic
+    reconciliation recomputes everything from the source tables.
+    """
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='alert_statistics')
+    total_alerts = models.PositiveIntegerField(default=0)
+    active_alerts = models.PositiveIntegerField(default=0)
+    threshold_alerts = models.PositiveIntegerField(default=0)
+    duration_alerts = models.PositiveIntegerField(default=0)
+    total_triggered = models.PositiveBigIntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    
+    ALERT_COUNTS = {
+        'total_alerts': models.Count('id'),
+        'active_alerts': models.Count('id', filter=models.Q(is_active=True)),
+        'threshold_alerts': models.Count('id', filter=models.Q(alert_type='threshold')),
+        'duration_alerts': models.Count('id', filter=models.Q(alert_type='duration')),
+    }
+    
+    def __str__(self):
+        return f"Statistics for {self.user}"
+    
+    @classmethod
+    def alert_counts(cls, user_ids):
+        counts = {
+            row.pop('user_id'): row
+            for row in Alert.objects.filter(user_id__in=user_ids).values('user_id').annotate(**cls.ALERT_COUNTS)
+        }
+        empty = dict.fromkeys(cls.ALERT_COUNTS, 0)
+        return {user_id: counts.get(user_id, empty) for user_id in user_ids}
+    
+    @classmethod
+    def refresh_alerts(cls, user_ids):
+        """Recompute alert counts for users whose counter rows exist, in one UPDATE"""
+        def count(aggregate):
+            return models.Subquery(
+                Alert.objects.filter(user_id=models.OuterRef('user_id')).order_by()
+                .values('user_id').annotate(count=aggregate).values('count'),
+                output_field=models.PositiveIntegerField(),
+            )
+        cls.objects.filter(user_id__in=user_ids).update(**{
+            field: Coalesce(count(aggregate), 0) for field, aggregate in cls.ALERT_COUNTS.items()
+        })
+    
+    @classmethod
+    def add_triggers(cls, counts_by_user):
+        """Add committed trigger counts, reconciling users without a counter row yet"""
+        updated = cls.objects.filter(user_id__in=counts_by_user).update(
+            total_triggered=models.F('total_triggered') + models.Case(
+                *[models.When(user_id=user_id, then=count) for user_id, count in counts_by_user.items()],
+                output_field=models.PositiveBigIntegerField(),
+            )
+        )
+        if updated < len(counts_by_user):
+            existing = set(cls.objects.filter(user_id__in=counts_by_user).values_list('user_id', flat=True))
+            cls.reconcile(user_id for user_id in counts_by_user if user_id not in existing)
+    
+    @classmethod
+    def remove_triggers(cls, counts_by_user):
+        """Subtract trigger counts of deleted alerts, in one UPDATE"""
+        cls.objects.filter(user_id__in=counts_by_user).update(
+            total_triggered=models.F('total_triggered') - models.Case(
+                *[models.When(user_id=user_id, then=count) for user_id, count in counts_by_user.items()],
+                output_field=models.PositiveBigIntegerField(),
+            )
+        )
+    
+    @classmethod
+    def reconcile(cls, user_ids):
+        """Recompute every counter of the given users from the source tables"""
+        user_ids = list(user_ids)
+        triggered = dict(
+            TriggeredAlert.objects.filter(user_id__in=user_ids).values('user_id')
+            .annotate(count=models.Count('id')).values_list('user_id', 'count')
+        )
+        now = timezone.now()
+        rows = [
+            cls(user_id=user_id, total_triggered=triggered.get(user_id, 0), reconciled_at=now, **counts)
+            for user_id, counts in cls.alert_counts(user_ids).items()
+        ]
+        cls.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['user'],
+            update_fields=[*cls.ALERT_COUNTS, 'total_triggered', 'reconciled_at']
+        )
+        return rows
+
+
+def generate_webhook_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """HTTP endpoint a user wants triggered alerts posted to"""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhook_endpoints')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(
+        max_length=64,
+        default=generate_webhook_secret,
+        help_text="Key for the HMAC-SHA256 signature sent with every delivery"
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.url}"
+
+
+class NotificationOutbox(models.Model):
+    """Notification owed for a triggered alert.
+
+    Rows are written in the same transaction as the TriggeredAlert, so a
+    notification cannot be lost between the trigger and the broker.
+    Dispatchers claim due rows under a lease and retry failures with
+    backoff; the idempotency key lets receivers drop duplicate deliveries.
+    """
+    
+    CHANNELS = [
+        ('email', 'Email'),
+        ('webhook', 'Webhook'),
+    ]
+    
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    triggered_alert = models.ForeignKey(TriggeredAlert, on_delete=models.CASCADE, related_name='outbox_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_outbox')
+    channel = models.CharField(max_length=20, choices=CHANNELS, default='email')
+    endpoint = models.ForeignKey(
+        WebhookEndpoint, on_delete=models.CASCADE, null=True, blank=True, related_name='outbox_entries'
+    )
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField()
+    leased_until = models.DateTimeField(null=True, blank=True)
+    lease_owner = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+            models.Index(fields=['lease_owner'], name='outbox_lease_owner_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.channel} for triggered alert {self.triggered_alert_id}: {self.status}"
+    
+    @staticmethod
+    def key_for(channel, triggered_alert_id, endpoint_id=None):
+        if endpoint_id is not None:
+            return f"{channel}:{endpoint_id}:{triggered_alert_id}"
+        return f"{channel}:{triggered_alert_id}"
 
 
+class AlertChange(models.Model):
+    """Outbox of Alert inserts, updates and deletes.
 
+    Rows are written in the same transaction as the change they describe, so
+    consumers reading in id order see every committed change exactly once.
+    """
+    
+    OPERATIONS = [
+        ('insert', 'Insert'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+    
+    alert_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATIONS)
+    data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['created_at'], name='alertchange_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.operation} alert {self.alert_id}"
+    
+    @classmethod
+    def record(cls, alert, operation):
+        bump_version(user_scope(alert.user_id))
+        AlertStatistics.refresh_alerts([alert.user_id])
+        return cls.objects.create(
+            alert_id=alert.id,
+            user_id=alert.user_id,
+            operation=operation,
+            data=None if operation == 'delete' else alert.snapshot()
+        )
+    
+    @classmethod
+    def record_inserts(cls, alerts):
+        """Record inserts for alerts created with bulk_create"""
+        user_ids = {alert.user_id for alert in alerts}
+        bump_version(*map(user_scope, user_ids))
+        AlertStatistics.refresh_alerts(user_ids)
+        return cls.objects.bulk_create([
+            cls(alert_id=alert.id, user_id=alert.user_id, operation='insert', data=alert.snapshot())
+            for alert in alerts
+        ])
+    
+    @classmethod
+    def record_updates(cls, alert_ids):
+        """Record updates for alerts changed in bulk, reading their current rows once"""
+        snapshots = list(Alert.objects.filter(id__in=alert_ids).values(*Alert.SNAPSHOT_FIELDS))
+        user_ids = {data['user_id'] for data in snapshots}
+        bump_version(*map(user_scope, user_ids))
+        AlertStatistics.refresh_alerts(user_ids)
+        return cls.objects.bulk_create([
+            cls(alert_id=data['id'], user_id=data['user_id'], operation='update', data=data)
+            for data in snapshots
+        ])
+    
+    @classmethod
+    def record_deletes(cls, alerts):
+        """Record deletes for alerts removed in bulk, given as (alert_id, user_id) pairs"""
+        user_ids = {user_id for _, user_id in alerts}
+        bump_version(*map(user_scope, user_ids))
+        AlertStatistics.refresh_alerts(user_ids)
+        return cls.objects.bulk_create([
+            cls(alert_id=alert_id, user_id=user_id, operation='delete')
+            for alert_id, user_id in alerts
+        ])
+
+
+class ChangeFeedCursor(models.Model):
+    """Last AlertChange id processed by a named consumer"""
+    
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class NotificationPreference(models.Model):
+    """How a user wants triggered alerts delivered"""
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_preference')
+    daily_digest = models.BooleanField(
+        default=False,
+        help_text="Send one email per day listing every trigger instead of coalesced alerts"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        mode = 'daily digest' if self.daily_digest else 'immediate'
+        return f"{self.user.username}: {mode}"
@@ -0,0 +1,430 @@
+import hashlib
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import NotificationOutbox, TriggeredAlert
+from .services import chunked
+
+logger = logging.getLogger(__name__)
+
+NO_EMAIL = "No email address"
+
+
+def build_message(triggered_alert):
+    """Subject and body of the notification email for a triggered alert"""
+    alert = triggered_alert.alert
+    stock = alert.stock
+    if alert.alert_type == 'duration':
+        subject = f"Stock Alert: {stock.symbol} {alert.condition} ${alert.threshold_price} for {alert.duration_minutes} minutes"
+        message = f"Your duration alert has been triggered!\n\nStock: {stock.symbol} ({stock.name})\nPrice {alert.condition} ${alert.threshold_price} for {alert.duration_minutes} minutes\nCurrent Price: ${triggered_alert.trigger_price}\nTriggered: {triggered_alert.triggered_at}"
+    else:
+        subject = f"Stock Alert: {stock.symbol} {alert.condition} ${alert.threshold_price}"
+        message = f"Your stock alert has been triggered!\n\nStock: {stock.symbol} ({stock.name})\nPrice {alert.condition} ${alert.threshold_price}\nCurrent Price: ${triggered_alert.trigger_price}\nTriggered: {triggered_alert.triggered_at}"
+    return subject, message
+
+
+def build_summary_message(triggered_alerts, total, digest=False):
+    """Subject and body of one email listing several triggered alerts.
+
+    Only the first ``ALERT_NOTIFICATION_MAX_LISTED`` triggers are listed;
+    ``total`` counts every trigger the message covers.
+    """
+    subject = f"Stock Alert Digest: {total} alerts triggered" if digest else f"Stock Alerts: {total} alerts triggered"
+    lines = [f"{total} of your stock alerts have been triggered!", ""]
+    for triggered_alert in triggered_alerts:
+        alert = triggered_alert.alert
+        duration = f" for {alert.duration_minutes} minutes" if alert.alert_type == 'duration' else ""
+        lines.append(
+            f"{alert.stock.symbol} ({alert.stock.name}) {alert.condition} ${alert.threshold_price}{duration}"
+            f" - ${triggered_alert.trigger_price} at {triggered_alert.triggered_at}"
+        )
+    if total > len(triggered_alerts):
+        lines.append(f"...and {total - len(triggered_alerts)} more")
+    return subject, "\n".join(lines)
+
+
+class Notification:
+    """One outgoing email covering one or more triggered alerts of a user.
+
+    Only the first ``ALERT_NOTIFICATION_MAX_LISTED`` triggers are held for
+    rendering; the rest are only counted, with the id range they span.
+    """
+
+    __slots__ = ('user_id', 'email', 'listed', 'total', 'first', 'last', 'digest')
+
+    def __init__(self, user_id, email, digest=False):
+        self.user_id = user_id
+        self.email = email
+        self.listed = []
+        self.total = 0
+        self.first = self.last = None
+        self.digest = digest
+
+    def add(self, triggered_alert):
+        if len(self.listed) < settings.ALERT_NOTIFICATION_MAX_LISTED:
+            self.listed.append(triggered_alert)
+        self.total += 1
+        self.first = triggered_alert.id if self.first is None else min(self.first, triggered_alert.id)
+        self.last = triggered_alert.id if self.last is None else max(self.last, triggered_alert.id)
+
+    def render(self):
+        if self.total == 1 and not self.digest:
+            return build_message(self.listed[0])
+        return build_summary_message(self.listed, self.total, self.digest)
+
+    @property
+    def idempotency_key(self):
+        """Stable across retries of the same set of triggers"""
+        raw = f"email:{self.user_id}:{self.first}-{self.last}:{self.total}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def group_notifications(triggered_alerts, digest=False):
+    """Merge triggered alerts into one Notification per user"""
+    by_user = {}
+    for triggered_alert in triggered_alerts:
+        user = triggered_alert.alert.user
+        notification = by_user.get(user.id)
+        if notification is None:
+            notification = by_user[user.id] = Notification(user.id, user.email, digest)
+        notification.add(triggered_alert)
+    return list(by_user.values())
+
+
+def send_notifications(notifications, connection=None):
+    """Email each Notification over a single SMTP connection.
+
+    The connection is opened once for the whole batch and each message is
+    still sent on its own, so one rejected recipient does not fail the
+    rest. Returns (sent notifications, {notification: error}).
+    """
+    errors = {}
+    messages = []
+    for notification in notifications:
+        if not notification.email:
+            errors[notification] = NO_EMAIL
+            continue
+        subject, body = notification.render()
+        key = notification.idempotency_key
+        messages.append((notification, EmailMessage(
+            subject=subject,
+            body=body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[notification.email],
+            headers={'Message-ID': f"<{key}@stock-alerting>", 'X-Idempotency-Key': key},
+        )))
+
+    sent = []
+    if messages:
+        connection = connection or get_connection(fail_silently=False)
+        pending = list(messages)
+        try:
+            connection.open()
+            while pending:
+                notification, message = pending[0]
+                try:
+                    connection.send_messages([message])
+                    sent.append(notification)
+                except Exception as e:
+                    errors[notification] = str(e)
+                pending.pop(0)
+        except Exception as e:
+            # Could not connect: the rest of the batch failed
+            for notification, _ in pending:
+                errors[notification] = str(e)
+        finally:
+            connection.close()
+
+    logger.info(
+        f"Delivered {sum(n.total for n in sent)} of {sum(n.total for n in [*sent, *errors])} "
+        f"alert notifications in {len(messages)} emails"
+    )
+    return sent, errors
+
+
+def by_error(errors):
+    """{error: [notification, ...]} from {notification: error}"""
+    grouped = defaultdict(list)
+    for notification, error in errors.items():
+        grouped[error].append(notification)
+    return grouped.items()
+
+
+def record_sent(triggered_alerts, outbox, now):
+    """Mark ``triggered_alerts`` emailed, then close their email ``outbox`` rows (both querysets)"""
+    TriggeredAlert.objects.filter(id__in=triggered_alerts.values('id')).update(
+        email_sent=True,
+        email_sent_at=now,
+        notification_error=''
+    )
+    outbox.update(
+        status='sent',
+        sent_at=now,
+        leased_until=None,
+        last_error=''
+    )
+
+
+def pending_notifications(digest=False):
+    """Triggered alerts not yet emailed and not failed, for digest or non-digest users"""
+    pending = TriggeredAlert.objects.filter(email_sent=False, notification_error='').select_related(
+        'alert__user', 'alert__stock'
+    )
+    if digest:
+        return pending.filter(alert__user__notification_preference__daily_digest=True)
+    return pending.exclude(alert__user__notification_preference__daily_digest=True)
+
+
+def default_worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def unleased_outbox(channel, now):
+    """Pending outbox rows of ``channel`` that no dispatcher holds a live lease on"""
+    return NotificationOutbox.objects.filter(status='pending', channel=channel).filter(
+        Q(leased_until__isnull=True) | Q(leased_until__lt=now)
+    )
+
+
+def lease_outbox(rows, worker, now):
+    """Lease ``rows`` to one dispatcher and return the lease owner token.
+
+    Must run inside a transaction. On databases with ``SKIP LOCKED`` the
+    candidates are locked so concurrent dispatchers skip each other's rows.
+    Elsewhere the conditional lease UPDATE is the arbiter: a row already
+    leased by another dispatcher no longer matches ``rows``.
+    """
+    owner = f"{worker or default_worker_name()}:{uuid.uuid4().hex[:8]}"
+    if db_connection.features.has_select_for_update_skip_locked:
+        rows = rows.filter(id__in=list(
+            rows.select_for_update(skip_locked=True, of=('self',)).values_list('id', flat=True)
+        ))
+    rows.update(
+        leased_until=now + timezone.timedelta(seconds=settings.ALERT_NOTIFICATION_LEASE_SECONDS),
+        lease_owner=owner,
+        attempts=F('attempts') + 1
+    )
+    return owner
+
+
+def retry_or_fail(rows, errors, now, permanent=()):
+    """Release failed rows for a retry with exponential backoff, or mark them failed.
+
+    ``errors`` maps outbox row id to its error; rows whose error is in
+    ``permanent`` or that used up ``ALERT_NOTIFICATION_MAX_ATTEMPTS`` fail.
+    """
+    by_outcome = defaultdict(list)
+    for row in rows:
+        error = errors.get(row.id)
+        if error is None:
+            continue
+        if error in permanent or row.attempts >= settings.ALERT_NOTIFICATION_MAX_ATTEMPTS:
+            by_outcome[('failed', None, error)].append(row.id)
+        else:
+            backoff = settings.ALERT_NOTIFICATION_RETRY_SECONDS * 2 ** (row.attempts - 1)
+            by_outcome[('pending', now + timezone.timedelta(seconds=backoff), error)].append(row.id)
+    for (status, retry_at, error), ids in by_outcome.items():
+        update = {'status': status, 'leased_until': None, 'last_error': error}
+        if retry_at is not None:
+            update['available_at'] = retry_at
+        NotificationOutbox.objects.filter(id__in=ids).update(**update)
+
+
+def release_failed(rows, error, now, permanent=()):
+    """retry_or_fail() for a queryset of rows sharing one error, with one UPDATE per attempt count"""
+    if error in permanent:
+        rows.update(status='failed', leased_until=None, last_error=error)
+        return
+    rows.filter(attempts__gte=settings.ALERT_NOTIFICATION_MAX_ATTEMPTS).update(
+        status='failed', leased_until=None, last_error=error
+    )
+    retrying = rows.filter(status='pending', attempts__lt=settings.ALERT_NOTIFICATION_MAX_ATTEMPTS)
+    for attempts in retrying.order_by().values_list('attempts', flat=True).distinct():
+        backoff = settings.ALERT_NOTIFICATION_RETRY_SECONDS * 2 ** (attempts - 1)
+        retrying.filter(attempts=attempts).update(
+            status='pending',
+            leased_until=None,
+            last_error=error,
+            available_at=now + timezone.timedelta(seconds=backoff)
+        )
+
+
+def claimable_outbox(now, user_ids=None):
+    """Unleased email outbox rows, excluding daily-digest users"""
+    rows = unleased_outbox('email', now).exclude(user__notification_preference__daily_digest=True)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    return rows
+
+
+def claim_outbox(worker=None, batch_size=None, user_ids=None, now=None):
+    """Lease every pending email outbox row of up to ``batch_size`` users with a due row.
+
+    A user is due once their earliest row reaches ``available_at``; all of
+    their pending rows are claimed together so they go out in one email.
+    Returns the claimed rows as a queryset, to be read a page at a time.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.ALERT_NOTIFICATION_BATCH_SIZE
+    claimable = claimable_outbox(now, user_ids)
+
+    with transaction.atomic():
+        due_users = list(
+            claimable.filter(available_at__lte=now)
+            .values('user_id').annotate(due=Min('available_at')).order_by('due')
+            .values_list('user_id', flat=True)[:batch_size]
+        )
+        if not due_users:
+            return NotificationOutbox.objects.none()
+        owner = lease_outbox(claimable.filter(user_id__in=due_users), worker, now)
+
+    return NotificationOutbox.objects.filter(lease_owner=owner)
+
+
+def outbox_notifications(rows):
+    """One Notification per user of the claimed ``rows``.
+
+    Counts and id ranges come from one aggregate, and only the first
+    ``ALERT_NOTIFICATION_MAX_LISTED`` rows of each user are loaded, so a
+    user with thousands of pending triggers costs one page of memory.
+    """
+    notifications = {}
+    for user_id, email, total, first, last in (
+        rows.order_by().values('user_id', 'user__email')
+        .annotate(total=Count('id'), first=Min('triggered_alert_id'), last=Max('triggered_alert_id'))
+        .values_list('user_id', 'user__email', 'total', 'first', 'last')
+    ):
+        notification = notifications[user_id] = Notification(user_id, email)
+        notification.total, notification.first, notification.last = total, first, last
+
+    listed = rows.annotate(position=Window(
+        RowNumber(), partition_by=[F('user_id')], order_by=F('triggered_alert_id').asc()
+    )).filter(position__lte=settings.ALERT_NOTIFICATION_MAX_LISTED).select_related(
+        'triggered_alert__alert__user', 'triggered_alert__alert__stock'
+    ).order_by('user_id', 'triggered_alert_id')
+    for row in listed:
+        notifications[row.user_id].listed.append(row.triggered_alert)
+    return list(notifications.values())
+
+
+def dispatch_outbox(worker=None, batch_size=None, user_ids=None, now=None):
+    """Claim one batch of outbox rows and email them over one SMTP connection.
+
+    Failed rows are released for a retry with exponential backoff, or marked
+    failed after ``ALERT_NOTIFICATION_MAX_ATTEMPTS`` attempts or when the
+    user has no email address. Returns (claimed count, sent count).
+    """
+    now = now or timezone.now()
+    rows = claim_outbox(worker, batch_size, user_ids, now)
+    claimed = rows.count()
+    if not claimed:
+        return 0, 0
+
+    # Rows already emailed through another path only need closing
+    closed = rows.filter(triggered_alert__email_sent=True).update(status='sent', sent_at=now, leased_until=None)
+    rows = rows.filter(status='pending')
+
+    sent, errors = send_notifications(outbox_notifications(rows))
+    if sent:
+        sent_rows = rows.filter(user_id__in=[notification.user_id for notification in sent])
+        record_sent(TriggeredAlert.objects.filter(id__in=sent_rows.values('triggered_alert_id')), sent_rows, now)
+    for error, notifications in by_error(errors):
+        failed_rows = rows.filter(user_id__in=[notification.user_id for notification in notifications])
+        TriggeredAlert.objects.filter(id__in=failed_rows.values('triggered_alert_id')).update(notification_error=error)
+        release_failed(failed_rows, error, now, permanent={NO_EMAIL})
+
+    return claimed, closed + sum(notification.total for notification in sent)
+
+
+def drain_outbox(worker=None, batch_size=None, user_ids=None, now=None):
+    """Dispatch batches until no due rows are left. Returns (claimed count, sent count)."""
+    claimed_total = sent_total = 0
+    while True:
+        claimed, sent = dispatch_outbox(worker, batch_size, user_ids, now)
+        if not claimed:
+            return claimed_total, sent_total
+        claimed_total += claimed
+        sent_total += sent
+
+
+def deliver_coalesced(triggered_alert_ids, now=None):
+    """Deliver the due outbox rows of the users owning ``triggered_alert_ids``, one email per user.
+
+    A user's email goes out once their oldest pending row is due (a
+    coalescing window after the trigger) and it covers every pending trigger
+    of that user, including ones committed by other batches inside the
+    window. Returns (sent count, deferred triggered alert ids, seconds until
+    the earliest deferred row is due).
+    """
+    now = now or timezone.now()
+    user_ids = set(
+        NotificationOutbox.objects.filter(triggered_alert_id__in=triggered_alert_ids, channel='email')
+        .values_list('user_id', flat=True)
+    )
+    if not user_ids:
+        return 0, [], None
+    _, sent_count = drain_outbox(user_ids=user_ids, now=now)
+
+    # Retries after a failed attempt are left to the outbox dispatcher
+    waiting = list(
+        claimable_outbox(now, user_ids)
+        .filter(triggered_alert_id__in=triggered_alert_ids, available_at__gt=now, attempts=0)
+        .values_list('triggered_alert_id', 'available_at')
+    )
+    retry_in = min((available_at - now).total_seconds() for _, available_at in waiting) if waiting else None
+    return sent_count, [triggered_alert_id for triggered_alert_id, _ in waiting], retry_in
+
+
+def covered(notifications, user_field, id_field):
+    """Q for the triggers each Notification was built from: its user's, up to its last id"""
+    return reduce(or_, (Q(**{user_field: n.user_id, f'{id_field}__lte': n.last}) for n in notifications))
+
+
+def dispatch_digests(batch_size=None):
+    """Send one digest per daily-digest user in batches of ``batch_size`` users, one SMTP connection per batch.
+
+    A failed digest counts an attempt on the user's email outbox rows and
+    leaves them pending for the next run, as the outbox dispatcher does;
+    after ``ALERT_NOTIFICATION_MAX_ATTEMPTS`` attempts, or when the user has
+    no email address, the rows fail and their triggers get a
+    ``notification_error`` so later digests skip them.
+    Returns (pending count, sent count).
+    """
+    batch_size = batch_size or settings.ALERT_NOTIFICATION_BATCH_SIZE
+    pending = pending_notifications(digest=True)
+    user_ids = list(pending.order_by('alert__user_id').values_list('alert__user_id', flat=True).distinct())
+    outbox = NotificationOutbox.objects.filter(channel='email', status='pending')
+
+    pending_count = sent_count = 0
+    for batch in chunked(user_ids, batch_size):
+        rows = pending.filter(alert__user_id__in=batch).order_by('alert__user_id', 'id')
+        sent, errors = send_notifications(group_notifications(rows.iterator(chunk_size=1000), digest=True))
+        now = timezone.now()
+        if sent:
+            record_sent(
+                pending.filter(covered(sent, 'alert__user_id', 'id')),
+                outbox.filter(covered(sent, 'user_id', 'triggered_alert_id')),
+                now
+            )
+        for error, notifications in by_error(errors):
+            failed_rows = outbox.filter(covered(notifications, 'user_id', 'triggered_alert_id'))
+            failed_rows.update(attempts=F('attempts') + 1)
+            release_failed(failed_rows, error, now, permanent={NO_EMAIL})
+            pending.filter(covered(notifications, 'alert__user_id', 'id')).filter(
+                outbox_entries__channel='email', outbox_entries__status='failed'
+            ).update(notification_error=error)
+        pending_count += sum(notification.total for notification in [*sent, *errors])
+        sent_count += sum(notification.total for notification in sent)
+    return pending_count, sent_count
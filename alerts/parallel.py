@@ -0,0 +1,282 @@
+import heapq
+import logging
+import math
+import multiprocessing
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import connections
+from django.utils import timezone
+
+from .engine import AlertEngine, EngineLoop, load_alert_states, load_prices, recent_ticks
+from .services import commit_triggers
+
+logger = logging.getLogger(__name__)
+
+
+def plan_partitions(weights, workers, skew_threshold=1.25):
+    """Assign stocks to worker processes.
+
+    ``weights`` maps stock id to its evaluation cost (distinct predicates).
+    Stocks are placed by ``stock_id % workers`` unless that leaves the busiest
+    worker more than ``skew_threshold`` times above the mean. In that case
+    stocks are packed heaviest-first onto the least loaded workers, and a stock
+    heavier than one worker's fair share is split across several workers.
+    Returns a mapping of stock id to the list of workers that own it.
+    """
+    hashed = {stock_id: [stock_id % workers] for stock_id in weights}
+    total = sum(weights.values())
+    if workers == 1 or not total:
+        return hashed
+
+    loads = [0] * workers
+    for stock_id, weight in weights.items():
+        loads[stock_id % workers] += weight
+    fair_share = total / workers
+    if max(loads) <= skew_threshold * fair_share:
+        return hashed
+
+    plan = {}
+    heap = [(0, worker) for worker in range(workers)]
+    for stock_id, weight in sorted(weights.items(), key=lambda item: -item[1]):
+        shards = min(workers, math.ceil(weight / fair_share)) if weight > fair_share else 1
+        chosen = [heapq.heappop(heap) for _ in range(shards)]
+        plan[stock_id] = sorted(worker for _, worker in chosen)
+        for load, worker in chosen:
+            heapq.heappush(heap, (load + weight / shards, worker))
+    return plan
+
+
+class WorkerEngine(AlertEngine):
+    """AlertEngine of a worker process, priming indicators from ticks the parent read"""
+
+    def __init__(self):
+        super().__init__(sink=None)
+        self.history = {}
+
+    def recent_ticks(self, stock_id, lookback):
+        return self.history.get(stock_id, [])[-lookback:]
+
+
+def _serve(conn):
+    """Worker process: owns the alert book for its partition"""
+    engine = WorkerEngine()
+    while True:
+        command, payload = conn.recv()
+        extra = None
+        if command == 'add':
+            states, prices, history, now = payload
+            engine.prices.update(prices)
+            engine.history = history
+            for state in states:
+                engine.add_alert(state, now)
+            engine.history = {}
+        elif command == 'remove':
+            for alert_id in payload:
+                engine.remove_alert(alert_id)
+        elif command == 'export':
+            extra = engine.export_alerts(payload)
+        elif command == 'ticks':
+            for stock_id, price, volume, now in payload:
+                engine.on_price(stock_id, price, now, volume)
+        elif command == 'clock':
+            engine.on_clock(payload)
+        elif command == 'stop':
+            conn.send(([], None, None))
+            break
+        conn.send((engine.pending, engine.next_deadline(), extra))
+        engine.pending = []
+
+
+class PartitionedEngine(EngineLoop):
+    """Alert engine spread over a pool of worker processes.
+
+    Each worker runs an AlertEngine over its partition of stocks and only
+    receives ticks for those stocks; triggers come back over a pipe and are
+    committed by the parent. The partition is re-planned when the alert
+    distribution becomes skewed. Workers do not touch the database, so the
+    parent reads the stored ticks that prime indicator alerts and sends them
+    along, both on load and when a rebalance moves a stock.
+    """
+
+    def __init__(self, workers, sink=commit_triggers, skew_threshold=1.25, rebalance_interval=60):
+        self.workers = workers
+        self.sink = sink
+        self.skew_threshold = skew_threshold
+        self.rebalance_interval = rebalance_interval
+        self.routes = {}
+        self.alert_keys = {}
+        self.alert_workers = {}
+        self.prices = {}
+        self.deadlines = [None] * workers
+        self.pending = []
+        self.connections = []
+        self.processes = []
+        self._last_rebalance = None
+
+    def start(self):
+        # Children must not inherit open database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        for _ in range(self.workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_serve, args=(child_conn,), daemon=True)
+            process.start()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+
+    def stop(self):
+        self._request({worker: ('stop', None) for worker in range(len(self.connections))})
+        for process in self.processes:
+            process.join(timeout=5)
+        self.connections, self.processes = [], []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def load(self, now=None, change_feed=None):
+        now = now or timezone.now()
+        self.load_change_position(change_feed)
+        self.prices = load_prices()
+        states = list(load_alert_states())
+        self.routes = plan_partitions(self._weights(states), self.workers, self.skew_threshold)
+        self.add_alerts(states, now)
+        self._last_rebalance = now
+        logger.info(f"Partitioned alert engine loaded {len(states)} alerts on {self.workers} workers")
+
+    def worker_for(self, state):
+        owners = self.routes.get(state.stock_id)
+        if owners is None:
+            owners = self.routes[state.stock_id] = [state.stock_id % self.workers]
+        return owners[hash(state.key) % len(owners)]
+
+    def add_alerts(self, states, now=None):
+        now = now or timezone.now()
+        by_worker = defaultdict(list)
+        for state in states:
+            worker = self.worker_for(state)
+            if self.alert_workers.get(state.id, worker) != worker:
+                self.remove_alert(state.id)
+            by_worker[worker].append(state)
+            self.alert_keys[state.id] = state.key
+            self.alert_workers[state.id] = worker
+        requests = {}
+        for worker, worker_states in by_worker.items():
+            prices = {
+                state.stock_id: self.prices[state.stock_id]
+                for state in worker_states if state.stock_id in self.prices
+            }
+            lookbacks = defaultdict(int)
+            for state in worker_states:
+                if state.spec is not None:
+                    lookbacks[state.stock_id] = max(lookbacks[state.stock_id], state.spec[1])
+            history = {stock_id: recent_ticks(stock_id, lookback) for stock_id, lookback in lookbacks.items()}
+            requests[worker] = ('add', (worker_states, prices, history, now))
+        self._request(requests)
+
+    def add_alert(self, state, now=None):
+        self.add_alerts([state], now)
+
+    def remove_alert(self, alert_id):
+        worker = self.alert_workers.pop(alert_id, None)
+        if worker is None:
+            return
+        del self.alert_keys[alert_id]
+        self._request({worker: ('remove', [alert_id])})
+
+    def apply(self, event, now=None):
+        self.apply_events([event], now or timezone.now())
+
+    def apply_events(self, events, now):
+        ticks = []
+        for event in events:
+            try:
+                if event['type'] == 'price':
+                    ticks.append((event['stock_id'], Decimal(event['price']), event.get('volume'), now))
+            except Exception as e:
+                logger.error(f"Alert engine failed to apply {event.get('type')} event: {e}")
+        self.on_ticks(ticks)
+
+    def on_ticks(self, ticks):
+        """Route (stock_id, price, volume, now) ticks to the workers owning each stock"""
+        by_worker = defaultdict(list)
+        for tick in ticks:
+            stock_id = tick[0]
+            self.prices[stock_id] = tick[1]
+            for worker in self.routes.get(stock_id, ()):
+                by_worker[worker].append(tick)
+        self._request({worker: ('ticks', worker_ticks) for worker, worker_ticks in by_worker.items()})
+
+    def on_price(self, stock_id, price, now=None, volume=None):
+        self.on_ticks([(stock_id, price, volume, now or timezone.now())])
+
+    def on_clock(self, now=None):
+        now = now or timezone.now()
+        due = [
+            worker for worker, deadline in enumerate(self.deadlines)
+            if deadline is not None and deadline <= now
+        ]
+        self._request({worker: ('clock', now) for worker in due})
+
+    def next_deadline(self):
+        deadlines = [deadline for deadline in self.deadlines if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def maintain(self, now):
+        if self._last_rebalance is None or (now - self._last_rebalance).total_seconds() >= self.rebalance_interval:
+            self.rebalance(now)
+
+    def rebalance(self, now=None):
+        """Re-plan partitions from the current book and move alerts whose owner changed"""
+        now = now or timezone.now()
+        self._last_rebalance = now
+        weights = Counter()
+        for stock_id, _ in set((key[0], key) for key in self.alert_keys.values()):
+            weights[stock_id] += 1
+        plan = plan_partitions(weights, self.workers, self.skew_threshold)
+        if plan == {stock_id: self.routes.get(stock_id) for stock_id in plan}:
+            return 0
+
+        self.routes = {**self.routes, **plan}
+        moves = defaultdict(list)
+        for alert_id, key in self.alert_keys.items():
+            current = self.alert_workers[alert_id]
+            owners = self.routes[key[0]]
+            if owners[hash(key) % len(owners)] != current:
+                moves[current].append(alert_id)
+
+        replies = self._request({worker: ('export', alert_ids) for worker, alert_ids in moves.items()})
+        moved = [state for reply in replies.values() for state in reply]
+        for state in moved:
+            del self.alert_workers[state.id]
+        self.add_alerts(moved, now)
+        logger.info(f"Rebalanced alert partitions, moved {len(moved)} alerts")
+        return len(moved)
+
+    def _weights(self, states):
+        weights = Counter()
+        for stock_id, _ in set((state.stock_id, state.key) for state in states):
+            weights[stock_id] += 1
+        return weights
+
+    def _request(self, requests):
+        """Send one command per worker, then gather the replies so workers run in parallel"""
+        for worker, message in requests.items():
+            self.connections[worker].send(message)
+        extras = {}
+        for worker in requests:
+            triggers, deadline, extra = self.connections[worker].recv()
+            for state, _ in triggers:
+                if state.rearm:
+                    continue
+                self.alert_workers.pop(state.id, None)
+                self.alert_keys.pop(state.id, None)
+            self.pending.extend(triggers)
+            self.deadlines[worker] = deadline
+            if extra is not None:
+                extras[worker] = extra
+        return extras
@@ -0,0 +1,131 @@
+import csv
+import logging
+import time
+from decimal import Decimal
+
+from django.utils.dateparse import parse_datetime
+
+from stocks.models import Stock, StockPrice
+from .engine import AlertEngine, AlertState
+from .models import Alert
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayTrigger:
+    __slots__ = ('alert_id', 'user_id', 'stock_id', 'alert_type', 'price', 'triggered_at')
+
+    def __init__(self, state, price, triggered_at):
+        self.alert_id = state.id
+        self.user_id = state.user_id
+        self.stock_id = state.stock_id
+        self.alert_type = state.alert_type
+        self.price = price
+        self.triggered_at = triggered_at
+
+
+class ReplayResult:
+    def __init__(self):
+        self.triggers = []
+        self.ticks = 0
+        self.alerts = 0
+        self.started_at = None
+        self.ended_at = None
+        self.wall_seconds = 0.0
+
+    @property
+    def simulated_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.ended_at - self.started_at).total_seconds()
+
+    @property
+    def ticks_per_second(self):
+        return self.ticks / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def speedup(self):
+        """Simulated time covered per second of wall time"""
+        return self.simulated_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+
+def stored_ticks(since, until=None, symbols=None):
+    """Stream (stock_id, price, volume, timestamp) from StockPrice in time order"""
+    prices = StockPrice.objects.filter(timestamp__gte=since)
+    if until is not None:
+        prices = prices.filter(timestamp__lt=until)
+    if symbols:
+        prices = prices.filter(stock__symbol__in=symbols)
+    return prices.order_by('timestamp', 'id').values_list(
+        'stock_id', 'price', 'volume', 'timestamp'
+    ).iterator(chunk_size=5000)
+
+
+def archive_ticks(path, symbols=None):
+    """Stream ticks from a CSV archive with symbol, timestamp, price and optional volume columns.
+
+    Rows must already be in time order.
+    """
+    stock_ids = dict(Stock.objects.values_list('symbol', 'id'))
+    with open(path, newline='') as archive:
+        for row in csv.DictReader(archive):
+            symbol = row['symbol'].upper()
+            if symbols and symbol not in symbols:
+                continue
+            stock_id = stock_ids.get(symbol)
+            if stock_id is None:
+                continue
+            volume = row.get('volume')
+            yield stock_id, Decimal(row['price']), int(volume) if volume else None, parse_datetime(row['timestamp'])
+
+
+def replay(ticks, alerts=None, speed=None):
+    """Run ticks through the alert engine on a simulated clock.
+
+    Every alert starts with fresh timers and indicators and nothing is written
+    to the database. ``speed`` paces the replay at that multiple of real time;
+    by default it runs as fast as possible.
+    """
+    if alerts is None:
+        alerts = Alert.objects.filter(is_active=True)
+
+    result = ReplayResult()
+    engine = AlertEngine(sink=lambda triggers: None, prime_indicators=False)
+
+    def collect(now):
+        for state, price in engine.pending:
+            result.triggers.append(ReplayTrigger(state, price, now))
+        engine.pending = []
+
+    wall_start = time.perf_counter()
+    for stock_id, price, volume, timestamp in ticks:
+        if result.started_at is None:
+            result.started_at = timestamp
+            for alert in alerts:
+                engine.add_alert(AlertState.from_alert(alert), timestamp)
+                result.alerts += 1
+            collect(timestamp)
+
+        # Fire duration deadlines that fall between ticks at their own time
+        deadline = engine.next_deadline()
+        while deadline is not None and deadline <= timestamp:
+            engine.on_clock(deadline)
+            collect(deadline)
+            deadline = engine.next_deadline()
+
+        engine.on_price(stock_id, price, timestamp, volume)
+        collect(timestamp)
+        result.ticks += 1
+        result.ended_at = timestamp
+
+        if speed:
+            ahead = (timestamp - result.started_at).total_seconds() / speed - (time.perf_counter() - wall_start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    result.wall_seconds = time.perf_counter() - wall_start
+    logger.info(
+        f"Replayed {result.ticks} ticks against {result.alerts} alerts: "
+        f"{len(result.triggers)} triggers, {result.ticks_per_second:.0f} ticks/s"
+    )
+    return result
@@ -1,8 +1,59 @@
+import copy
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import Alert, TriggeredAlert
+from .models import Alert, NotificationPreference, TriggeredAlert, WebhookEndpoint
+from .webhooks import check_webhook_url
 from stocks.models import Stock
 
 
+def current(data, instance, field):
+    """``field`` as the alert will have it: from ``data``, else from ``instance`` on a partial update"""
+    if field in data:
+        return data[field]
+    return getattr(instance, field, None)
+
+
+def validate_indicator_fields(data, instance=None):
+    alert_type = current(data, instance, 'alert_type')
+    indicator_period = current(data, instance, 'indicator_period')
+    
+    if alert_type in Alert.INDICATOR_TYPES:
+        if not settings.ALERT_ENGINE_ENABLED:
+            raise serializers.ValidationError(
+                "Indicator alerts require the alert engine to be enabled"
+            )
+        if not indicator_period or indicator_period < 2:
+            raise serializers.ValidationError(
+                "Indicator period of at least 2 is required for indicator alerts"
+            )
+        if alert_type == 'volume_spike' and current(data, instance, 'condition') != 'above':
+            raise serializers.ValidationError(
+                "Volume spike alerts only support the 'above' condition"
+            )
+    elif indicator_period:
+        data['indicator_period'] = None
+    
+    return data
+
+
+def validate_rearm_fields(data, instance=None):
+    if current(data, instance, 'rearm'):
+        if not settings.ALERT_ENGINE_ENABLED:
+            raise serializers.ValidationError(
+                "Re-arming alerts require the alert engine to be enabled"
+            )
+        hysteresis = current(data, instance, 'hysteresis')
+        if hysteresis is not None and hysteresis < 0:
+            raise serializers.ValidationError("Hysteresis cannot be negative")
+    elif 'rearm' in data or instance is None:
+        data['cooldown_minutes'] = None
+        data['hysteresis'] = None
+    
+    return data
+
+
 class AlertSerializer(serializers.ModelSerializer):
     stock_symbol = serializers.CharField(source='stock.symbol', read_only=True)
     stock_name = serializers.CharField(source='stock.name', read_only=True)
@@ -11,7 +62,8 @@ class AlertSerializer(serializers.ModelSerializer):
         model = Alert
         fields = [
             'id', 'stock', 'stock_symbol', 'stock_name', 'alert_type', 
-            'condition', 'threshold_price', 'duration_minutes', 'is_active',
+            'condition', 'threshold_price', 'duration_minutes', 'indicator_period',
+            'rearm', 'cooldown_minutes', 'hysteresis', 'is_active',
             'condition_first_met', 'condition_currently_met', 
             'created_at', 'updated_at'
         ]
@@ -21,17 +73,27 @@ class AlertSerializer(serializers.ModelSerializer):
         ]
     
     def validate(self, data):
-        alert_type = data.get('alert_type')
-        duration_minutes = data.get('duration_minutes')
+        alert_type = current(data, self.instance, 'alert_type')
+        duration_minutes = current(data, self.instance, 'duration_minutes')
         
         if alert_type == 'duration' and not duration_minutes:
             raise serializers.ValidationError(
                 "Duration minutes is required for duration alerts"
             )
         
-        if alert_type == 'threshold' and duration_minutes:
+        if alert_type != 'duration' and duration_minutes:
             data['duration_minutes'] = None
         
+        data = validate_rearm_fields(validate_indicator_fields(data, self.instance), self.instance)
+        
+        # save() runs Alert.clean(); check the merged alert here so a bad combination is a 400, not a 500
+        alert = copy.copy(self.instance) if self.instance else Alert()
+        for field, value in data.items():
+            setattr(alert, field, value)
+        try:
+            alert.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
         return data
     
     def create(self, validated_data):
@@ -46,10 +108,18 @@ class AlertCreateSerializer(serializers.ModelSerializer):
         model = Alert
         fields = [
             'stock_symbol', 'alert_type', 'condition', 
-            'threshold_price', 'duration_minutes'
+            'threshold_price', 'duration_minutes', 'indicator_period',
+            'rearm', 'cooldown_minutes', 'hysteresis'
         ]
     
     def validate_stock_symbol(self, value):
+        # Bulk creation resolves every symbol of the batch up front
+        stocks = self.context.get('stocks')
+        if stocks is not None:
+            stock = stocks.get(value.strip().upper())
+            if stock is None:
+                raise serializers.ValidationError(f"Stock '{value}' not found or not active")
+            return stock
         try:
             stock = Stock.objects.get(symbol=value.upper(), is_active=True)
             return stock
@@ -65,10 +135,10 @@ class AlertCreateSerializer(serializers.ModelSerializer):
                 "Duration minutes is required for duration alerts"
             )
         
-        if alert_type == 'threshold' and duration_minutes:
+        if alert_type != 'duration' and duration_minutes:
             data['duration_minutes'] = None
         
-        return data
+        return validate_rearm_fields(validate_indicator_fields(data))
     
     def create(self, validated_data):
         stock = validated_data.pop('stock_symbol')
@@ -77,30 +147,66 @@ class AlertCreateSerializer(serializers.ModelSerializer):
         return Alert.objects.create(**validated_data)
 
 
-class TriggeredAlertSerializer(serializers.ModelSerializer):
-    alert = AlertSerializer(read_only=True)
-    stock_symbol = serializers.CharField(source='alert.stock.symbol', read_only=True)
-    stock_name = serializers.CharField(source='alert.stock.name', read_only=True)
-    alert_type = serializers.CharField(source='alert.alert_type', read_only=True)
-    condition = serializers.CharField(source='alert.condition', read_only=True)
-    threshold_price = serializers.DecimalField(
-        source='alert.threshold_price', 
-        max_digits=10, 
-        decimal_places=2, 
-        read_only=True
-    )
+class TriggeredAlertSerializer(serializers.Serializer):
+    """Flat, read-only triggered alert built from a ``TriggeredAlert.objects.flat()`` row.
+
+    The fields are declared for the schema; rows are plain dicts from one
+    joined query and are turned into output directly.
+    """
+    id = serializers.IntegerField(read_only=True)
+    alert = serializers.IntegerField(read_only=True)
+    stock_symbol = serializers.CharField(read_only=True)
+    stock_name = serializers.CharField(read_only=True)
+    alert_type = serializers.CharField(read_only=True)
+    condition = serializers.CharField(read_only=True)
+    threshold_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    trigger_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    triggered_at = serializers.DateTimeField(read_only=True)
+    email_sent = serializers.BooleanField(read_only=True)
+    email_sent_at = serializers.DateTimeField(read_only=True)
+    notification_error = serializers.CharField(read_only=True)
     
+    def to_representation(self, row):
+        datetime_field = self.fields['triggered_at']
+        email_sent_at = row['email_sent_at']
+        return {
+            'id': row['id'],
+            'alert': row['alert_id'],
+            'stock_symbol': row['stock_symbol'],
+            'stock_name': row['stock_name'],
+            'alert_type': row['alert_type'],
+            'condition': row['condition'],
+            'threshold_price': str(row['threshold_price']),
+            'trigger_price': str(row['trigger_price']),
+            'triggered_at': datetime_field.to_representation(row['triggered_at']),
+            'email_sent': row['email_sent'],
+            'email_sent_at': datetime_field.to_representation(email_sent_at) if email_sent_at else None,
+            'notification_error': row['notification_error'],
+        }
+
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
     class Meta:
-        model = TriggeredAlert
-        fields = [
-            'id', 'alert', 'stock_symbol', 'stock_name', 'alert_type',
-            'condition', 'threshold_price', 'trigger_price', 'triggered_at',
-            'email_sent', 'email_sent_at', 'notification_error'
-        ]
-        read_only_fields = (
-            'id', 'alert', 'stock_symbol', 'stock_name', 'alert_type',
-            'condition', 'threshold_price', 'trigger_price', 'triggered_at',
-            'email_sent', 'email_sent_at', 'notification_error'
-        )
+        model = NotificationPreference
+        fields = ['daily_digest', 'updated_at']
+        read_only_fields = ['updated_at']
 
 
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    """Webhook endpoint without its signing secret, which is shown only on create and rotation"""
+    
+    class Meta:
+        model = WebhookEndpoint
+        fields = ['id', 'url', 'is_active', 'created_at']
+        read_only_fields = ['id', 'created_at']
+    
+    def validate_url(self, value):
+        try:
+            check_webhook_url(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+    
+    def create(self, validated_data):
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
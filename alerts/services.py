@@ -0,0 +1,101 @@
+import logging
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from stocks.cache import bump_version, user_scope
+
+from .models import Alert, AlertChange, AlertStatistics, NotificationOutbox, TriggeredAlert, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+
+def chunked(items, size):
+    """Yield successive lists of at most ``size`` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def commit_triggers(triggers):
+    """Persist a batch of (alert, trigger_price) pairs.
+
+    ``alert`` may be an Alert or any object exposing its ``id`` and
+    ``user_id``. All triggers are written with a single bulk INSERT into
+    TriggeredAlert and the fired one-time alerts are deactivated with a single
+    UPDATE, in one transaction together with their change feed and
+    notification outbox rows (one email row per trigger, plus one per active
+    webhook endpoint of its user). Re-arming alerts stay active and only get their
+    TriggeredAlert row. Once it commits, the triggers are pushed to connected
+    stream clients and notification batches are enqueued as a low-latency
+    nudge; the outbox dispatcher delivers anything they miss.
+    """
+    if not triggers:
+        return []
+
+    alert_ids = [alert.id for alert, _ in triggers if not getattr(alert, 'rearm', False)]
+
+    with transaction.atomic():
+        triggered_alerts = TriggeredAlert.objects.bulk_create([
+            TriggeredAlert(alert_id=alert.id, user_id=alert.user_id, trigger_price=price)
+            for alert, price in triggers
+        ])
+        # Coalescing holds each user's email until their first trigger is a window old
+        now = timezone.now()
+        available_at = now + timezone.timedelta(seconds=settings.ALERT_NOTIFICATION_COALESCE_SECONDS)
+        endpoints = defaultdict(list)
+        for endpoint_id, user_id in WebhookEndpoint.objects.filter(
+            user_id__in={alert.user_id for alert, _ in triggers}, is_active=True
+        ).values_list('id', 'user_id'):
+            endpoints[user_id].append(endpoint_id)
+        outbox = []
+        for triggered, (alert, _) in zip(triggered_alerts, triggers):
+            outbox.append(NotificationOutbox(
+                triggered_alert_id=triggered.id,
+                user_id=alert.user_id,
+                channel='email',
+                idempotency_key=NotificationOutbox.key_for('email', triggered.id),
+                available_at=available_at,
+            ))
+            outbox.extend(
+                NotificationOutbox(
+                    triggered_alert_id=triggered.id,
+                    user_id=alert.user_id,
+                    channel='webhook',
+                    endpoint_id=endpoint_id,
+                    idempotency_key=NotificationOutbox.key_for('webhook', triggered.id, endpoint_id),
+                    available_at=now,
+                )
+                for endpoint_id in endpoints.get(alert.user_id, ())
+            )
+        NotificationOutbox.objects.bulk_create(outbox)
+        AlertStatistics.add_triggers(Counter(alert.user_id for alert, _ in triggers))
+        if alert_ids:
+            Alert.objects.filter(id__in=alert_ids).update(
+                is_active=False,
+                updated_at=timezone.now()
+            )
+            AlertChange.record_updates(alert_ids)
+
+    # Re-arming alerts record no change, so their users' cached reads are moved on here
+    bump_version(*{user_scope(alert.user_id) for alert, _ in triggers})
+    triggered_ids = [triggered.id for triggered in triggered_alerts]
+    webhooks = bool(endpoints)
+    transaction.on_commit(lambda: enqueue_notifications(triggered_ids, webhooks))
+
+    logger.info(f"Committed {len(triggered_alerts)} triggered alerts")
+    return triggered_alerts
+
+
+def enqueue_notifications(triggered_alert_ids, webhooks=False):
+    """Enqueue notification delivery with one task message per batch, plus one webhook dispatch"""
+    from .stream import publish_triggers
+    from .tasks import dispatch_webhooks, send_alert_notifications
+
+    publish_triggers(triggered_alert_ids)
+
+    batch_size = settings.ALERT_NOTIFICATION_BATCH_SIZE
+    for batch in chunked(list(triggered_alert_ids), batch_size):
+        send_alert_notifications.delay(batch)
+    if webhooks:
+        dispatch_webhooks.delay()
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from stocks.signals import price_updated
+from .models import Alert, AlertChange, AlertStatistics
+from .events import publish_event, price_event
+from .stream import publish_price
+
+# Set while a bulk delete records its own changes, so the per-row handlers stand aside
+_deleting_in_bulk = ContextVar('deleting_in_bulk', default=False)
+
+
+@contextmanager
+def deleting_in_bulk():
+    token = _deleting_in_bulk.set(True)
+    try:
+        yield
+    finally:
+        _deleting_in_bulk.reset(token)
+
+
+@receiver(price_updated)
+def forward_price_update(sender, stock, price, volume=None, timestamp=None, **kwargs):
+    publish_event(price_event(stock.id, price, volume, timestamp))
+    publish_price(stock, price, timestamp)
+
+
+@receiver(pre_delete, sender=Alert)
+def count_deleted_triggers(sender, instance, **kwargs):
+    if _deleting_in_bulk.get():
+        return
+    # Counted before the cascade removes them
+    instance.deleted_trigger_count = instance.triggered_instances.count()
+
+
+@receiver(post_delete, sender=Alert)
+def record_alert_delete(sender, instance, **kwargs):
+    if _deleting_in_bulk.get():
+        return
+    # Runs inside the deletion's transaction, including cascades from User/Stock
+    AlertChange.record(instance, 'delete')
+    if instance.deleted_trigger_count:
+        AlertStatistics.remove_triggers({instance.user_id: instance.deleted_trigger_count})
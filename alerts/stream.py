@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db.models import F
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from stock_alerting.asyncapi import token_user_id
+
+from .events import get_redis
+from .models import Alert, TriggeredAlert
+from .serializers import TriggeredAlertSerializer
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'stream:'
+
+
+def price_channel(symbol):
+    return f"{CHANNEL_PREFIX}price:{symbol}"
+
+
+def user_channel(user_id):
+    return f"{CHANNEL_PREFIX}user:{user_id}"
+
+
+def publish_stream(channel, payload):
+    """Publish an event to push stream clients (no-op unless the stream is enabled)"""
+    if not settings.PUSH_STREAM_ENABLED:
+        return
+    try:
+        get_redis().publish(channel, json.dumps(payload, cls=DjangoJSONEncoder))
+    except redis.RedisError as e:
+        logger.error(f"Failed to publish to {channel}: {e}")
+
+
+def publish_price(stock, price, timestamp=None):
+    publish_stream(price_channel(stock.symbol), {
+        'symbol': stock.symbol,
+        'price': str(price),
+        'timestamp': timestamp,
+    })
+
+
+def publish_triggers(triggered_alert_ids):
+    """Push each committed trigger to its owner's stream, as a /api/triggered-alerts/ row"""
+    if not settings.PUSH_STREAM_ENABLED:
+        return
+    rows = TriggeredAlert.objects.filter(id__in=triggered_alert_ids).flat().annotate(owner_id=F('user_id'))
+    serializer = TriggeredAlertSerializer()
+    for row in rows:
+        publish_stream(user_channel(row['owner_id']), serializer.to_representation(row))
+
+
+class Subscription:
+    """One connected client: what it watches and its pending SSE frames"""
+
+    def __init__(self, user_id, symbols):
+        self.user_id = user_id
+        self.symbols = symbols
+        self.queue = asyncio.Queue(settings.PUSH_STREAM_QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, frame):
+        # A slow reader loses its oldest frames instead of growing without bound
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+
+class StreamBroker:
+    """Fans one Redis pub/sub connection out to every stream client of an event loop.
+
+    Clients never touch Redis or the database after subscribing: the broker
+    pattern-subscribes once, routes each message by its channel name to the
+    clients watching that symbol or user, and builds the SSE frame once for
+    all of them. An idle client costs a suspended coroutine and an empty queue.
+    """
+
+    def __init__(self):
+        self.by_symbol = defaultdict(set)
+        self.by_user = defaultdict(set)
+        self.listener = None
+
+    def __len__(self):
+        return sum(len(subscriptions) for subscriptions in self.by_user.values())
+
+    def subscribe(self, user_id, symbols):
+        subscription = Subscription(user_id, symbols)
+        self.by_user[user_id].add(subscription)
+        for symbol in symbols:
+            self.by_symbol[symbol].add(subscription)
+        self.ensure_listening()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._discard(self.by_user, subscription.user_id, subscription)
+        for symbol in subscription.symbols:
+            self._discard(self.by_symbol, symbol, subscription)
+
+    @staticmethod
+    def _discard(index, key, subscription):
+        subscriptions = index.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del index[key]
+
+    def dispatch(self, channel, data):
+        """Route one published message (JSON text) to its subscribers"""
+        kind, _, key = channel[len(CHANNEL_PREFIX):].partition(':')
+        if kind == 'price':
+            subscriptions = self.by_symbol.get(key)
+            event = 'price'
+        elif kind == 'user':
+            subscriptions = self.by_user.get(int(key))
+            event = 'alert'
+        else:
+            return 0
+        if not subscriptions:
+            return 0
+        frame = f"event: {event}\ndata: {data}\n\n"
+        for subscription in subscriptions:
+            subscription.put(frame)
+        return len(subscriptions)
+
+    def ensure_listening(self):
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.get_running_loop().create_task(self.listen())
+
+    async def listen(self):
+        while True:
+            client = aioredis.Redis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        self.dispatch(message['channel'].decode(), message['data'].decode())
+            except redis.RedisError as e:
+                logger.error(f"Push stream lost its Redis subscription: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+
+_brokers = weakref.WeakKeyDictionary()
+
+
+def get_broker():
+    """The broker of the running event loop (one per server process under ASGI)"""
+    loop = asyncio.get_running_loop()
+    broker = _brokers.get(loop)
+    if broker is None:
+        broker = _brokers[loop] = StreamBroker()
+    return broker
+
+
+async def watched_symbols(user_id):
+    """Symbols of the user's active alerts"""
+    queryset = Alert.objects.filter(user_id=user_id, is_active=True).values_list(
+        'stock__symbol', flat=True
+    ).distinct()
+    return {symbol async for symbol in queryset}
+
+
+async def event_frames(broker, user_id, symbols):
+    subscription = broker.subscribe(user_id, symbols)
+    loop = asyncio.get_running_loop()
+    # Bounded lifetime: EventSource reconnects by itself, and a client that
+    # vanished without a write error is released by the next reconnect window
+    closes_at = loop.time() + settings.PUSH_STREAM_MAX_AGE
+    try:
+        yield f"retry: {settings.PUSH_STREAM_RETRY_MS}\n: subscribed to {len(symbols)} symbols\n\n"
+        while loop.time() < closes_at:
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), settings.PUSH_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def stream(request):
+    """Server-Sent Events: prices of watched symbols and the user's own triggers.
+
+    Watches the symbols of the user's active alerts, or ``?symbols=A,B``.
+    Serve it from the ASGI application so each client is a coroutine rather
+    than a worker thread.
+    """
+    user_id = token_user_id(request, allow_query=True)
+    if user_id is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Authentication credentials were not provided or are invalid'
+        }, status=401)
+    if not settings.PUSH_STREAM_ENABLED:
+        return JsonResponse({
+            'success': False,
+            'error': 'Push stream is disabled'
+        }, status=503)
+
+    if request.GET.get('symbols'):
+        symbols = {symbol.strip().upper() for symbol in request.GET['symbols'].split(',') if symbol.strip()}
+    else:
+        symbols = await watched_symbols(user_id)
+    symbols = set(sorted(symbols)[:settings.PUSH_STREAM_MAX_SYMBOLS])
+
+    response = StreamingHttpResponse(
+        event_frames(get_broker(), user_id, symbols), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
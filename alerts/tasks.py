@@ -1,11 +1,13 @@
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
 import logging
-from celery import group
 
-from .models import Alert, TriggeredAlert
+from .models import Alert, AlertChange, AlertStatistics
+from .notifications import deliver_coalesced, dispatch_digests, drain_outbox
+from .services import commit_triggers
+from .webhooks import dispatch_webhooks as drain_webhooks
 
 logger = logging.getLogger(__name__)
 
@@ -27,18 +29,8 @@ def evaluate_alert(alert_id):
         should_trigger = alert.should_trigger(current_price)
         
         if should_trigger:
-            # Create triggered alert record
-            triggered_alert = TriggeredAlert.objects.create(
-                alert=alert,
-                trigger_price=current_price
-            )
-            
-            # Send notification
-            send_alert_notification.delay(triggered_alert.id)
-            
-            # Deactivate alert to prevent repeated triggers
-            alert.is_active = False
-            alert.save()
+            # Record the trigger, deactivate the alert and enqueue its notification
+            triggered_alert, = commit_triggers([(alert, current_price)])
             
             logger.info(f"Alert triggered: {alert}")
             
@@ -74,31 +66,45 @@ def evaluate_alert(alert_id):
 
 @shared_task
 def evaluate_all_alerts():
-    """Evaluate all active alerts concurrently"""
+    """Evaluate all active alerts in one pass and commit their triggers in bulk"""
+    if settings.ALERT_ENGINE_ENABLED:
+        # The long-running alert engine owns evaluation
+        return {'success': True, 'skipped': True, 'timestamp': timezone.now().isoformat()}
+    
     try:
-        active_alerts = Alert.objects.filter(is_active=True)
-        if not active_alerts.exists():
+        active_alerts = list(
+            Alert.objects.filter(is_active=True)
+            .exclude(alert_type__in=Alert.INDICATOR_TYPES)
+            .exclude(rearm=True)
+            .select_related('stock')
+        )
+        if not active_alerts:
             logger.info("No active alerts found.")
             return {
                 'success': True,
                 'total_alerts': 0,
                 'triggered_count': 0,
-                'results': [],
+                'triggered_alert_ids': [],
                 'timestamp': timezone.now().isoformat()
             }
 
-        tasks = group(evaluate_alert.s(alert.id) for alert in active_alerts)
-        results = tasks.apply_async().get()  # wait for all tasks to complete
+        triggers = []
+        for alert in active_alerts:
+            current_price = alert.stock.current_price
+            if current_price is None:
+                continue
+            if alert.should_trigger(current_price):
+                triggers.append((alert, current_price))
 
-        triggered_count = sum(1 for result in results if result.get('triggered'))
+        triggered_alerts = commit_triggers(triggers)
 
-        logger.info(f"Evaluated {len(active_alerts)} alerts, {triggered_count} triggered")
+        logger.info(f"Evaluated {len(active_alerts)} alerts, {len(triggered_alerts)} triggered")
 
         return {
             'success': True,
             'total_alerts': len(active_alerts),
-            'triggered_count': triggered_count,
-            'results': results,
+            'triggered_count': len(triggered_alerts),
+            'triggered_alert_ids': [triggered.id for triggered in triggered_alerts],
             'timestamp': timezone.now().isoformat()
         }
 
@@ -112,52 +118,96 @@ def evaluate_all_alerts():
 
 
 @shared_task
-def send_alert_notification(triggered_alert_id):
-    """Send email notification for a triggered alert"""
+def send_alert_notifications(triggered_alert_ids):
+    """Deliver the outbox rows of a batch of triggered alerts as soon as they are due.
+
+    Users still inside their coalescing window are retried when it closes.
+    The outbox dispatcher delivers anything this nudge misses.
+    """
+    try:
+        sent_count, deferred_ids, retry_in = deliver_coalesced(triggered_alert_ids)
+        if deferred_ids:
+            send_alert_notifications.apply_async((deferred_ids,), countdown=retry_in)
+        return {'success': True, 'sent': sent_count, 'deferred': len(deferred_ids)}
+    except Exception as e:
+        logger.error(f"Error sending alert notification batch: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def dispatch_notifications():
+    """Drain every due notification outbox row"""
     try:
-        triggered_alert = TriggeredAlert.objects.get(id=triggered_alert_id)
-        alert = triggered_alert.alert
-        user = alert.user
+        claimed_count, sent_count = drain_outbox()
         
-        if not user.email:
-            logger.warning(f"No email address for user {user.username}")
-            triggered_alert.notification_error = "No email address"
-            triggered_alert.save()
-            return {'triggered_alert_id': triggered_alert_id, 'success': False, 'error': 'No email address'}
+        if claimed_count:
+            logger.info(f"Outbox dispatch sent {sent_count} of {claimed_count} claimed notifications")
+        return {'success': True, 'claimed': claimed_count, 'sent': sent_count}
         
-        # Simple email content
-        if alert.alert_type == 'duration':
-            subject = f"Stock Alert: {alert.stock.symbol} {alert.condition} ${alert.threshold_price} for {alert.duration_minutes} minutes"
-            message = f"Your duration alert has been triggered!\n\nStock: {alert.stock.symbol} ({alert.stock.name})\nPrice {alert.condition} ${alert.threshold_price} for {alert.duration_minutes} minutes\nCurrent Price: ${triggered_alert.trigger_price}\nTriggered: {triggered_alert.triggered_at}"
-        else:
-            subject = f"Stock Alert: {alert.stock.symbol} {alert.condition} ${alert.threshold_price}"
-            message = f"Your stock alert has been triggered!\n\nStock: {alert.stock.symbol} ({alert.stock.name})\nPrice {alert.condition} ${alert.threshold_price}\nCurrent Price: ${triggered_alert.trigger_price}\nTriggered: {triggered_alert.triggered_at}"
+    except Exception as e:
+        logger.error(f"Notification sweep failed: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def dispatch_webhooks():
+    """Post every due webhook outbox row"""
+    try:
+        claimed_count, sent_count = drain_webhooks()
         
-        # Send email
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False
-        )
+        if claimed_count:
+            logger.info(f"Webhook dispatch sent {sent_count} of {claimed_count} claimed webhooks")
+        return {'success': True, 'claimed': claimed_count, 'sent': sent_count}
         
-        # Update triggered alert
-        triggered_alert.email_sent = True
-        triggered_alert.email_sent_at = timezone.now()
-        triggered_alert.save()
+    except Exception as e:
+        logger.error(f"Webhook dispatch failed: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def send_notification_digests():
+    """Send one email per daily-digest user listing their pending triggers"""
+    try:
+        pending_count, sent_count = dispatch_digests()
+        
+        logger.info(f"Digest run sent {sent_count} of {pending_count} pending notifications")
+        return {'success': True, 'pending': pending_count, 'sent': sent_count}
+        
+    except Exception as e:
+        logger.error(f"Notification digest failed: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def prune_alert_changes():
+    """Delete change feed rows older than the retention window"""
+    try:
+        cutoff = timezone.now() - timezone.timedelta(days=settings.ALERT_CHANGEFEED_RETENTION_DAYS)
+        deleted, _ = AlertChange.objects.filter(created_at__lt=cutoff).delete()
+        
+        logger.info(f"Pruned {deleted} alert change records")
+        return {'success': True, 'pruned_records': deleted}
+        
+    except Exception as e:
+        logger.error(f"Alert change pruning failed: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def reconcile_alert_statistics(batch_size=1000):
+    """Recompute every user's statistics counters from the alert and trigger tables"""
+    try:
+        user_ids = sorted(
+            set(Alert.objects.values_list('user_id', flat=True).distinct())
+            | set(AlertStatistics.objects.values_list('user_id', flat=True))
+        )
+        for start in range(0, len(user_ids), batch_size):
+            with transaction.atomic():
+                AlertStatistics.reconcile(user_ids[start:start + batch_size])
         
-        logger.info(f"Alert notification sent to {user.email} for {alert}")
-        return {'triggered_alert_id': triggered_alert_id, 'success': True, 'email_sent': True, 'recipient': user.email}
+        logger.info(f"Reconciled alert statistics for {len(user_ids)} users")
+        return {'success': True, 'reconciled_users': len(user_ids)}
         
-    except TriggeredAlert.DoesNotExist:
-        logger.error(f"Triggered alert {triggered_alert_id} not found")
-        return {'triggered_alert_id': triggered_alert_id, 'success': False, 'error': 'Triggered alert not found'}
     except Exception as e:
-        logger.error(f"Error sending notification for triggered alert {triggered_alert_id}: {e}")
-        # Save error to triggered alert if it exists
-        try:
-            TriggeredAlert.objects.filter(id=triggered_alert_id).update(notification_error=str(e))
-        except:
-            pass
-        return {'triggered_alert_id': triggered_alert_id, 'success': False, 'error': str(e)}
+        logger.error(f"Alert statistics reconciliation failed: {e}")
+        return {'success': False, 'error': str(e)}
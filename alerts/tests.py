@@ -1,10 +1,38 @@
+from asgiref.sync import sync_to_async
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
-from unittest.mock import patch
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, MagicMock
+from django.test import override_settings
+from django.db import transaction
 
-from alerts.models import Alert, TriggeredAlert
+from alerts.models import (
+    Alert, AlertChange, AlertStatistics, NotificationOutbox, NotificationPreference, TriggeredAlert,
+    ChangeFeedCursor, WebhookEndpoint,
+)
+from alerts.tasks import evaluate_all_alerts, reconcile_alert_statistics
+from alerts.engine import AlertEngine, AlertState, Predicate
+from alerts.events import LocalEventQueue, price_event
+from alerts.changefeed import ChangeFeedConsumer
+from alerts.services import commit_triggers
+from alerts.indicators import SMA, EMA, RollingMinMax, IndicatorBank
+from alerts.serializers import AlertCreateSerializer
+from alerts.replay import replay, stored_ticks
+from alerts.parallel import PartitionedEngine, plan_partitions
+from alerts.notifications import (
+    claim_outbox, deliver_coalesced, dispatch_outbox, drain_outbox, outbox_notifications,
+)
+from alerts.tasks import send_alert_notifications, send_notification_digests
+from alerts.webhooks import WebhookDispatcher, sign_payload
+from alerts.stream import StreamBroker, event_frames, get_broker, price_channel, publish_triggers, user_channel
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 from stocks.models import Stock, StockPrice
 
 User = get_user_model()
@@ -154,3 +182,1711 @@ class TriggeredAlertModelTest(TestCase):
         self.assertIsNone(triggered_alert.email_sent_at)
 
 
+class EvaluateAllAlertsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.stock = Stock.objects.create(
+            symbol='AAPL',
+            name='Apple Inc.',
+            exchange='NASDAQ',
+            current_price=Decimal('210.00')
+        )
+        self.firing = [
+            Alert.objects.create(
+                user=self.user,
+                stock=self.stock,
+                alert_type='threshold',
+                condition='above',
+                threshold_price=Decimal(price)
+            )
+            for price in ('190.00', '200.00')
+        ]
+        self.quiet = Alert.objects.create(
+            user=self.user,
+            stock=self.stock,
+            alert_type='threshold',
+            condition='below',
+            threshold_price=Decimal('150.00')
+        )
+    
+    @patch('alerts.tasks.send_alert_notifications.delay')
+    def test_triggers_committed_in_bulk(self, mock_delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = evaluate_all_alerts()
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['total_alerts'], 3)
+        self.assertEqual(result['triggered_count'], 2)
+        
+        triggered = TriggeredAlert.objects.filter(alert__in=self.firing)
+        self.assertEqual(triggered.count(), 2)
+        self.assertFalse(Alert.objects.filter(id__in=[a.id for a in self.firing], is_active=True).exists())
+        self.assertTrue(Alert.objects.get(id=self.quiet.id).is_active)
+        
+        # One notification message for the whole batch
+        mock_delay.assert_called_once()
+        self.assertCountEqual(mock_delay.call_args[0][0], result['triggered_alert_ids'])
+    
+    @patch('alerts.tasks.send_alert_notifications.delay')
+    def test_bulk_commit_query_count(self, mock_delay):
+        AlertStatistics.reconcile([self.user.id])
+        # select active alerts + insert triggers + webhook endpoints + outbox
+        # rows + trigger counters + deactivate + change feed rows + alert
+        # counters, plus savepoint bookkeeping
+        with self.assertNumQueries(11):
+            evaluate_all_alerts()
+
+
+class AlertEngineTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.stock = Stock.objects.create(
+            symbol='AAPL',
+            name='Apple Inc.',
+            exchange='NASDAQ',
+            current_price=Decimal('190.00')
+        )
+        self.fired = []
+        self.engine = AlertEngine(sink=self.fired.extend)
+        self.now = timezone.now()
+    
+    def make_alert(self, **kwargs):
+        fields = {
+            'user': self.user,
+            'stock': self.stock,
+            'alert_type': 'threshold',
+            'condition': 'above',
+            'threshold_price': Decimal('200.00'),
+        }
+        fields.update(kwargs)
+        return Alert.objects.create(**fields)
+    
+    def test_warm_start_loads_active_alerts(self):
+        alert = self.make_alert()
+        self.make_alert(threshold_price=Decimal('180.00'), is_active=False)
+        
+        self.engine.load(self.now)
+        
+        self.assertEqual(list(self.engine.alerts), [alert.id])
+        self.assertEqual(self.engine.prices[self.stock.id], Decimal('190.00'))
+    
+    def test_threshold_alert_fires_on_price(self):
+        alert = self.make_alert()
+        self.engine.load(self.now)
+        
+        self.engine.on_price(self.stock.id, Decimal('199.00'), self.now)
+        self.assertEqual(self.engine.pending, [])
+        
+        self.engine.on_price(self.stock.id, Decimal('201.00'), self.now)
+        self.engine.flush()
+        
+        self.assertEqual([(state.id, price) for state, price in self.fired], [(alert.id, Decimal('201.00'))])
+        self.assertNotIn(alert.id, self.engine.alerts)
+    
+    def test_duration_alert_fires_from_clock(self):
+        alert = self.make_alert(alert_type='duration', duration_minutes=5)
+        self.engine.load(self.now)
+        
+        self.engine.on_price(self.stock.id, Decimal('205.00'), self.now)
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=4))
+        self.assertEqual(self.engine.pending, [])
+        
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=5))
+        self.assertEqual([state.id for state, _ in self.engine.pending], [alert.id])
+    
+    def test_warm_start_ignores_stored_duration_timer(self):
+        # Left behind by the Celery path, which the engine never updates
+        alert = self.make_alert(
+            alert_type='duration', duration_minutes=5,
+            condition_first_met=self.now - timezone.timedelta(hours=1), condition_currently_met=True
+        )
+        Stock.objects.filter(id=self.stock.id).update(current_price=Decimal('205.00'))
+        self.engine.load(self.now)
+        
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=4))
+        self.assertEqual(self.engine.pending, [])
+        
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=5))
+        self.assertEqual([state.id for state, _ in self.engine.pending], [alert.id])
+    
+    def test_duration_timer_resets_when_condition_breaks(self):
+        self.make_alert(alert_type='duration', duration_minutes=5)
+        self.engine.load(self.now)
+        
+        self.engine.on_price(self.stock.id, Decimal('205.00'), self.now)
+        self.engine.on_price(self.stock.id, Decimal('195.00'), self.now + timezone.timedelta(minutes=1))
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=10))
+        
+        self.assertEqual(self.engine.pending, [])
+    
+    def test_alert_events_update_book(self):
+        self.engine.load(self.now)
+        alert = self.make_alert(threshold_price=Decimal('180.00'))
+        
+        # A new alert whose condition already holds fires immediately
+        self.engine.add_alert(AlertState.from_alert(alert), self.now)
+        self.assertEqual([state.id for state, _ in self.engine.pending], [alert.id])
+        
+        other = self.make_alert(threshold_price=Decimal('250.00'))
+        self.engine.add_alert(AlertState.from_alert(other), self.now)
+        other.delete()
+        self.engine.apply_change(AlertChange.objects.last(), self.now)
+        self.assertNotIn(other.id, self.engine.alerts)
+    
+    def test_engine_follows_change_feed(self):
+        change_feed = ChangeFeedConsumer('test-engine')
+        self.engine.load(self.now, change_feed=change_feed)
+        
+        alert = self.make_alert(threshold_price=Decimal('250.00'))
+        change_feed.consume(self.engine.apply_change)
+        self.assertIn(alert.id, self.engine.alerts)
+        
+        alert.threshold_price = Decimal('260.00')
+        alert.save()
+        change_feed.consume(self.engine.apply_change)
+        self.assertEqual(self.engine.alerts[alert.id].threshold_price, Decimal('260.00'))
+        
+        alert.delete()
+        change_feed.consume(self.engine.apply_change)
+        self.assertNotIn(alert.id, self.engine.alerts)
+    
+    def test_load_skips_changes_in_snapshot_and_replays_the_rest(self):
+        change_feed = ChangeFeedConsumer('test-engine')
+        # Inserted below the current price, then raised, before the engine starts
+        alert = self.make_alert(threshold_price=Decimal('180.00'))
+        alert.threshold_price = Decimal('250.00')
+        alert.save()
+        
+        # An id allocated by a transaction still open while the snapshot is read
+        in_flight = AlertChange.objects.create(alert_id=0, user_id=self.user.id, operation='delete')
+        AlertChange.objects.filter(id=in_flight.id).delete()
+        self.make_alert(threshold_price=Decimal('270.00'))
+        
+        self.engine.load(self.now, change_feed=change_feed)
+        late = self.make_alert(threshold_price=Decimal('260.00'))
+        AlertChange.objects.filter(alert_id=late.id).update(id=in_flight.id)
+        change_feed.consume(self.engine.apply_change)
+        
+        self.assertEqual(self.engine.pending, [])
+        self.assertEqual(self.engine.alerts[alert.id].threshold_price, Decimal('250.00'))
+        self.assertIn(late.id, self.engine.alerts)
+    
+    @patch('alerts.tasks.send_alert_notifications.delay')
+    def test_run_writes_triggers(self, mock_delay):
+        alert = self.make_alert()
+        engine = AlertEngine()
+        engine.load()
+        
+        event_queue = LocalEventQueue()
+        event_queue.put(price_event(self.stock.id, Decimal('210.00')))
+        cycles = iter([False, True])
+        engine.run(event_queue, max_wait=0.01, should_stop=lambda: next(cycles))
+        
+        triggered = TriggeredAlert.objects.get(alert=alert)
+        self.assertEqual(triggered.trigger_price, Decimal('210.00'))
+        self.assertFalse(Alert.objects.get(id=alert.id).is_active)
+
+
+class AlertChangeFeedTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.stock = Stock.objects.create(
+            symbol='AAPL',
+            name='Apple Inc.',
+            exchange='NASDAQ'
+        )
+    
+    def create_alert(self, price='200.00'):
+        return Alert.objects.create(
+            user=self.user,
+            stock=self.stock,
+            alert_type='threshold',
+            condition='above',
+            threshold_price=Decimal(price)
+        )
+    
+    def test_mutations_are_recorded(self):
+        alert = self.create_alert()
+        alert.threshold_price = Decimal('210.00')
+        alert.save()
+        alert_id = alert.id
+        alert.delete()
+        
+        changes = list(AlertChange.objects.filter(alert_id=alert_id))
+        self.assertEqual([change.operation for change in changes], ['insert', 'update', 'delete'])
+        self.assertEqual(changes[0].data['threshold_price'], '200.00')
+        self.assertEqual(changes[1].data['threshold_price'], '210.00')
+        self.assertIsNone(changes[2].data)
+    
+    def test_tracking_updates_are_not_recorded(self):
+        alert = self.create_alert()
+        alert.condition_currently_met = True
+        alert.save(update_fields=['condition_currently_met'])
+        
+        self.assertEqual(AlertChange.objects.filter(alert_id=alert.id).count(), 1)
+    
+    def test_cascade_delete_is_recorded(self):
+        alert = self.create_alert()
+        self.stock.delete()
+        
+        self.assertTrue(AlertChange.objects.filter(alert_id=alert.id, operation='delete').exists())
+    
+    def test_bulk_deactivation_is_recorded(self):
+        alert = self.create_alert()
+        with patch('alerts.tasks.send_alert_notifications.delay'):
+            commit_triggers([(alert, Decimal('205.00'))])
+        
+        change = AlertChange.objects.filter(alert_id=alert.id).last()
+        self.assertEqual(change.operation, 'update')
+        self.assertFalse(change.data['is_active'])
+    
+    def test_consumer_is_ordered_and_resumable(self):
+        first = self.create_alert('200.00')
+        second = self.create_alert('210.00')
+        
+        consumer = ChangeFeedConsumer('test', batch_size=1)
+        seen = []
+        consumer.consume(seen.append)
+        self.assertEqual([change.alert_id for change in seen], [first.id])
+        
+        # A new consumer with the same name resumes after the committed position
+        resumed = ChangeFeedConsumer('test')
+        resumed.consume(seen.append)
+        self.assertEqual([change.alert_id for change in seen], [first.id, second.id])
+        self.assertEqual(resumed.consume(seen.append), 0)
+    
+    def test_consumer_waits_for_gaps(self):
+        self.create_alert('200.00')
+        consumer = ChangeFeedConsumer('test')
+        consumer.consume(lambda change: None)
+        
+        # Simulate a change whose transaction has not committed yet
+        later = AlertChange.objects.create(alert_id=0, user_id=self.user.id, operation='delete')
+        AlertChange.objects.filter(id=later.id).update(id=later.id + 1)
+        self.assertEqual(consumer.poll(), [])
+        
+        consumer.gap_timeout = 0
+        self.assertEqual([change.id for change in consumer.poll()], [later.id + 1])
+    
+    def test_consumer_delivers_late_commits_after_moving_past(self):
+        self.create_alert('200.00')
+        consumer = ChangeFeedConsumer('test', gap_timeout=0)
+        consumer.consume(lambda change: None)
+        
+        # The change at ``missing`` commits only after the consumer has moved past it
+        later = AlertChange.objects.create(alert_id=0, user_id=self.user.id, operation='delete')
+        missing = later.id
+        AlertChange.objects.filter(id=later.id).update(id=later.id + 1)
+        seen = []
+        consumer.consume(seen.append)
+        self.assertEqual(ChangeFeedCursor.objects.get(name='test').position, missing - 1)
+        
+        AlertChange.objects.create(id=missing, alert_id=0, user_id=self.user.id, operation='delete')
+        consumer.consume(seen.append)
+        self.assertEqual([change.id for change in seen], [missing + 1, missing])
+        self.assertEqual(ChangeFeedCursor.objects.get(name='test').position, missing + 1)
+        self.assertEqual(consumer.consume(seen.append), 0)
+    
+    def test_consumer_gives_up_on_rolled_back_ids(self):
+        self.create_alert('200.00')
+        consumer = ChangeFeedConsumer('test', gap_timeout=0, late_timeout=0)
+        consumer.consume(lambda change: None)
+        
+        later = AlertChange.objects.create(alert_id=0, user_id=self.user.id, operation='delete')
+        AlertChange.objects.filter(id=later.id).update(id=later.id + 1)
+        consumer.consume(lambda change: None)
+        AlertChange.objects.create(alert_id=0, user_id=self.user.id, operation='delete')
+        consumer.consume(lambda change: None)
+        
+        self.assertEqual(ChangeFeedCursor.objects.get(name='test').position, consumer.high)
+
+
+class IndicatorTest(TestCase):
+    samples = [10.0, 12.0, 11.0, 15.0, 9.0, 9.5, 14.0, 13.0]
+    
+    def test_sma_matches_window_mean(self):
+        sma = SMA(3)
+        for i, sample in enumerate(self.samples):
+            sma.update(sample)
+            if i >= 2:
+                self.assertAlmostEqual(sma.value, sum(self.samples[i - 2:i + 1]) / 3)
+            else:
+                self.assertIsNone(sma.value)
+    
+    def test_ema_seeds_with_sma(self):
+        ema = EMA(3)
+        for sample in self.samples[:3]:
+            ema.update(sample)
+        self.assertAlmostEqual(ema.value, 11.0)
+        ema.update(15.0)
+        self.assertAlmostEqual(ema.value, 11.0 + 0.5 * (15.0 - 11.0))
+    
+    def test_rolling_min_max_matches_window(self):
+        window = RollingMinMax(4)
+        for i, sample in enumerate(self.samples):
+            window.update(sample)
+            if i >= 3:
+                recent = self.samples[i - 3:i + 1]
+                self.assertEqual(window.value, (min(recent), max(recent)))
+    
+    def test_indicators_are_shared_per_spec(self):
+        bank = IndicatorBank()
+        first = bank.acquire(('sma', 5))
+        second = bank.acquire(('sma', 5))
+        self.assertIs(first, second)
+        self.assertEqual(len(bank), 1)
+        
+        bank.release(('sma', 5))
+        self.assertEqual(len(bank), 1)
+        bank.release(('sma', 5))
+        self.assertEqual(len(bank), 0)
+
+
+class IndicatorAlertTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.stock = Stock.objects.create(
+            symbol='AAPL',
+            name='Apple Inc.',
+            exchange='NASDAQ'
+        )
+        self.engine = AlertEngine(sink=list, prime_indicators=False)
+        self.now = timezone.now()
+    
+    def add_alert(self, alert_type, condition, threshold, period):
+        alert = Alert.objects.create(
+            user=self.user,
+            stock=self.stock,
+            alert_type=alert_type,
+            condition=condition,
+            threshold_price=Decimal(threshold),
+            indicator_period=period
+        )
+        self.engine.add_alert(AlertState.from_alert(alert), self.now)
+        return alert
+    
+    def feed(self, prices, volumes=None):
+        volumes = volumes or [None] * len(prices)
+        fired = []
+        for price, volume in zip(prices, volumes):
+            self.engine.on_price(self.stock.id, Decimal(price), self.now, volume)
+            fired.extend(state.id for state, _ in self.engine.pending)
+            self.engine.pending = []
+        return fired
+    
+    def test_sma_cross_above(self):
+        alert = self.add_alert('sma_cross', 'above', '0.00', 3)
+        self.assertEqual(self.feed(['10', '10', '10', '9']), [])
+        self.assertEqual(self.feed(['12']), [alert.id])
+    
+    def test_percent_move_from_window_low(self):
+        alert = self.add_alert('percent_move', 'above', '5.00', 3)
+        self.assertEqual(self.feed(['100', '101', '104']), [])
+        self.assertEqual(self.feed(['107']), [alert.id])
+    
+    def test_volume_spike(self):
+        alert = self.add_alert('volume_spike', 'above', '3.00', 2)
+        self.assertEqual(self.feed(['10', '10', '10'], [100, 100, 250]), [])
+        self.assertEqual(self.feed(['10'], [900]), [alert.id])
+    
+    def test_alerts_share_indicator(self):
+        self.add_alert('ema_cross', 'above', '0.00', 5)
+        self.add_alert('ema_cross', 'below', '1.00', 5)
+        self.assertEqual(len(self.engine.indicators[self.stock.id]), 1)
+    
+    def test_indicator_state_survives_alert_update(self):
+        alert = self.add_alert('sma_cross', 'above', '0.00', 3)
+        self.feed(['10', '10', '10'])
+        indicator = self.engine.indicators[self.stock.id].get(('sma', 3))
+        
+        alert.threshold_price = Decimal('1.00')
+        alert.save()
+        self.engine.add_alert(AlertState.from_alert(alert), self.now)
+        
+        self.assertIs(self.engine.indicators[self.stock.id].get(('sma', 3)), indicator)
+    
+    def test_indicators_primed_from_history(self):
+        for minutes, price in enumerate(['10', '11', '12']):
+            StockPrice.objects.create(
+                stock=self.stock,
+                price=Decimal(price),
+                timestamp=self.now - timezone.timedelta(minutes=10 - minutes)
+            )
+        self.add_alert('sma_cross', 'above', '0.00', 3)
+        
+        engine = AlertEngine(sink=list)
+        engine.load(self.now)
+        self.assertAlmostEqual(engine.indicators[self.stock.id].get(('sma', 3)).value, 11.0)
+    
+    def test_indicator_alerts_require_engine(self):
+        request = MagicMock(user=self.user)
+        data = {
+            'stock_symbol': 'AAPL',
+            'alert_type': 'sma_cross',
+            'condition': 'above',
+            'threshold_price': '0.50',
+            'indicator_period': 20,
+        }
+        serializer = AlertCreateSerializer(data=data, context={'request': request})
+        self.assertFalse(serializer.is_valid())
+        
+        with override_settings(ALERT_ENGINE_ENABLED=True):
+            serializer = AlertCreateSerializer(data=data, context={'request': request})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            
+            serializer = AlertCreateSerializer(data=dict(data, indicator_period=None), context={'request': request})
+            self.assertFalse(serializer.is_valid())
+    
+    @override_settings(ALERT_ENGINE_ENABLED=True)
+    def test_partial_update_keeps_indicator_fields(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        alert = self.add_alert('sma_cross', 'above', '0.00', 20)
+        
+        response = client.patch(f'/api/alerts/{alert.id}/', {'indicator_period': 50}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        alert.refresh_from_db()
+        self.assertEqual((alert.alert_type, alert.indicator_period), ('sma_cross', 50))
+        
+        response = client.patch(f'/api/alerts/{alert.id}/', {'threshold_price': '1.00'}, format='json')
+        alert.refresh_from_db()
+        self.assertEqual((response.status_code, alert.indicator_period), (200, 50))
+        
+        spike = self.add_alert('volume_spike', 'above', '3.00', 10)
+        response = client.patch(f'/api/alerts/{spike.id}/', {'condition': 'below'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.patch(f'/api/alerts/{spike.id}/', {'indicator_period': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReplayTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.stock = Stock.objects.create(
+            symbol='AAPL',
+            name='Apple Inc.',
+            exchange='NASDAQ'
+        )
+        self.start = timezone.now() - timezone.timedelta(hours=2)
+        for minutes, price in [(0, '195'), (10, '205'), (20, '206'), (60, '207')]:
+            StockPrice.objects.create(
+                stock=self.stock,
+                price=Decimal(price),
+                timestamp=self.start + timezone.timedelta(minutes=minutes)
+            )
+    
+    def test_replay_reports_triggers_on_simulated_clock(self):
+        threshold = Alert.objects.create(
+            user=self.user,
+            stock=self.stock,
+            alert_type='threshold',
+            condition='above',
+            threshold_price=Decimal('200.00')
+        )
+        duration = Alert.objects.create(
+            user=self.user,
+            stock=self.stock,
+            alert_type='duration',
+            condition='above',
+            threshold_price=Decimal('201.00'),
+            duration_minutes=30
+        )
+        
+        result = replay(stored_ticks(self.start))
+        
+        fired = {trigger.alert_id: trigger for trigger in result.triggers}
+        self.assertEqual(fired[threshold.id].triggered_at, self.start + timezone.timedelta(minutes=10))
+        self.assertEqual(fired[threshold.id].price, Decimal('205.00'))
+        # Condition first met at minute 10, so the duration deadline falls at minute 40
+        self.assertEqual(fired[duration.id].triggered_at, self.start + timezone.timedelta(minutes=40))
+        self.assertEqual(result.ticks, 4)
+        self.assertEqual(result.simulated_seconds, 3600)
+        self.assertGreater(result.ticks_per_second, 0)
+    
+    def test_replay_does_not_write(self):
+        alert = Alert.objects.create(
+            user=self.user,
+            stock=self.stock,
+            alert_type='threshold',
+            condition='above',
+            threshold_price=Decimal('200.00')
+        )
+        
+        replay(stored_ticks(self.start))
+        
+        self.assertFalse(TriggeredAlert.objects.exists())
+        self.assertTrue(Alert.objects.get(id=alert.id).is_active)
+
+
+class SharedPredicateTest(TestCase):
+    def setUp(self):
+        self.engine = AlertEngine(sink=list, prime_indicators=False)
+        self.now = timezone.now()
+    
+    def subscribe(self, alert_id, user_id, alert_type='threshold', duration_minutes=None):
+        state = AlertState(alert_id, user_id, 1, alert_type, 'above', '200.00', duration_minutes)
+        self.engine.add_alert(state, self.now)
+        return state
+    
+    def test_identical_alerts_share_one_predicate(self):
+        for user_id in range(1, 101):
+            self.subscribe(user_id, user_id)
+        self.subscribe(101, 1, 'duration', 5)
+        
+        self.assertEqual(len(self.engine.alerts), 101)
+        self.assertEqual(len(self.engine.predicates), 2)
+    
+    def test_trigger_fans_out_to_subscribers(self):
+        for user_id in range(1, 4):
+            self.subscribe(user_id, user_id)
+        
+        with patch.object(Predicate, 'check_condition', autospec=True, side_effect=Predicate.check_condition) as check:
+            self.engine.on_price(1, Decimal('201.00'), self.now)
+        
+        check.assert_called_once()
+        self.assertEqual(sorted(state.user_id for state, _ in self.engine.pending), [1, 2, 3])
+        self.assertEqual(self.engine.predicates, {})
+    
+    def test_late_subscriber_runs_its_own_timer(self):
+        self.subscribe(1, 1, 'duration', 5)
+        self.engine.on_price(1, Decimal('201.00'), self.now)
+        
+        self.now += timezone.timedelta(minutes=2)
+        late = self.subscribe(2, 2, 'duration', 5)
+        self.assertEqual(late.condition_first_met, self.now)
+        
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=3))
+        self.assertEqual([state.id for state, _ in self.engine.pending], [1])
+        
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=5))
+        self.assertEqual([state.id for state, _ in self.engine.pending], [1, 2])
+    
+    def test_reset_clears_every_timer(self):
+        self.subscribe(1, 1, 'duration', 5)
+        self.engine.on_price(1, Decimal('201.00'), self.now)
+        late = self.subscribe(2, 2, 'duration', 5)
+        
+        self.engine.on_price(1, Decimal('199.00'), self.now + timezone.timedelta(minutes=1))
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=10))
+        
+        self.assertIsNone(late.condition_first_met)
+        self.assertEqual(self.engine.pending, [])
+
+
+class PartitionedEngineTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+    
+    def states(self):
+        return [
+            AlertState(alert_id, alert_id, alert_id % 6 + 1, 'duration' if alert_id % 4 == 0 else 'threshold',
+                       'above', '100.00', 5 if alert_id % 4 == 0 else None)
+            for alert_id in range(1, 61)
+        ]
+    
+    def test_balanced_stocks_are_hashed(self):
+        plan = plan_partitions({stock_id: 10 for stock_id in range(8)}, 4)
+        
+        self.assertEqual(plan, {stock_id: [stock_id % 4] for stock_id in range(8)})
+    
+    def test_hot_stock_is_split(self):
+        weights = {stock_id: 10 for stock_id in range(1, 9)}
+        weights[0] = 80
+        
+        plan = plan_partitions(weights, 4)
+        
+        self.assertGreater(len(plan[0]), 1)
+        self.assertTrue(all(len(owners) == 1 for stock_id, owners in plan.items() if stock_id))
+    
+    def test_matches_single_process_engine(self):
+        ticks = [
+            (stock_id, Decimal(price), None, self.now + timezone.timedelta(minutes=minute))
+            for minute, price in enumerate(['99.00', '101.00'])
+            for stock_id in range(1, 7)
+        ]
+        later = self.now + timezone.timedelta(minutes=7)
+        
+        single = AlertEngine(sink=list, prime_indicators=False)
+        for state in self.states():
+            single.add_alert(state, self.now)
+        for stock_id, price, volume, now in ticks:
+            single.on_price(stock_id, price, now, volume)
+        single.on_clock(later)
+        
+        with PartitionedEngine(3, sink=list) as engine:
+            engine.add_alerts(self.states(), self.now)
+            engine.on_ticks(ticks)
+            self.assertEqual(engine.next_deadline(), self.now + timezone.timedelta(minutes=6))
+            engine.on_clock(later)
+        
+        self.assertEqual(
+            sorted(state.id for state, _ in engine.pending),
+            sorted(state.id for state, _ in single.pending),
+        )
+        self.assertEqual(len(engine.pending), 60)
+        self.assertEqual(engine.alert_workers, {})
+    
+    def test_rebalance_keeps_duration_timers(self):
+        states = [AlertState(alert_id, alert_id, 1, 'duration', 'above', str(100 + alert_id), 5)
+                  for alert_id in range(1, 41)]
+        states += [AlertState(alert_id, alert_id, alert_id, 'threshold', 'above', '500.00')
+                   for alert_id in range(41, 45)]
+        
+        with PartitionedEngine(4, sink=list) as engine:
+            engine.routes = {stock_id: [stock_id % 4] for stock_id in range(1, 45)}
+            engine.add_alerts(states, self.now)
+            engine.on_price(1, Decimal('200.00'), self.now)
+            
+            moved = engine.rebalance(self.now + timezone.timedelta(minutes=1))
+            engine.on_clock(self.now + timezone.timedelta(minutes=5))
+        
+        self.assertGreater(moved, 0)
+        self.assertGreater(len(engine.routes[1]), 1)
+        self.assertEqual(sorted(state.id for state, _ in engine.pending), list(range(1, 41)))
+    
+    def test_malformed_events_are_skipped(self):
+        state = AlertState(1, 1, 1, 'threshold', 'above', '100.00')
+        events = [
+            {'type': 'price', 'price': '101.00'},
+            {'type': 'price', 'stock_id': 1, 'price': 'n/a'},
+            {'type': 'price', 'stock_id': 1, 'price': '101.00'},
+        ]
+        
+        with PartitionedEngine(2, sink=list) as engine:
+            engine.add_alerts([state], self.now)
+            engine.apply_events(events, self.now)
+        
+        self.assertEqual([fired.id for fired, _ in engine.pending], [1])
+    
+    def test_workers_prime_indicators_from_history(self):
+        stock = Stock.objects.create(symbol='PRIM', name='Primed Inc.', current_price=Decimal('10.00'))
+        StockPrice.objects.bulk_create([
+            StockPrice(stock=stock, price=Decimal('10.00'), timestamp=self.now - timezone.timedelta(minutes=minute))
+            for minute in (1, 2)
+        ])
+        state = AlertState(1, 1, stock.id, 'percent_move', 'above', '10.00', indicator_period=3)
+        
+        with PartitionedEngine(2, sink=list) as engine:
+            engine.add_alerts([state], self.now)
+            engine.on_price(stock.id, Decimal('12.00'), self.now)
+        
+        self.assertEqual([fired.id for fired, _ in engine.pending], [1])
+
+
+class RearmAlertTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rearm', email='rearm@example.com', password='x')
+        self.stock = Stock.objects.create(symbol='REARM', name='Rearm Inc.', current_price=Decimal('190.00'))
+        self.engine = AlertEngine(sink=list, prime_indicators=False)
+        self.now = timezone.now()
+    
+    def subscribe(self, alert_id=1, alert_type='threshold', duration_minutes=None, cooldown_minutes=None, hysteresis='2.00'):
+        state = AlertState(alert_id, 1, 1, alert_type, 'above', '200.00', duration_minutes,
+                           rearm=True, cooldown_minutes=cooldown_minutes, hysteresis=hysteresis)
+        self.engine.add_alert(state, self.now)
+        return state
+    
+    def tick(self, price, minutes):
+        self.engine.on_price(1, Decimal(price), self.now + timezone.timedelta(minutes=minutes))
+        fired = [state.id for state, _ in self.engine.pending]
+        self.engine.pending = []
+        return fired
+    
+    def test_rearms_past_hysteresis_band(self):
+        self.subscribe()
+        
+        self.assertEqual(self.tick('201.00', 0), [1])
+        self.assertEqual(self.tick('202.00', 1), [])
+        self.assertEqual(self.tick('199.00', 2), [])
+        self.assertEqual(self.tick('201.00', 3), [])
+        self.assertEqual(self.tick('198.00', 4), [])
+        self.assertEqual(self.tick('201.00', 5), [1])
+        self.assertIn(1, self.engine.alerts)
+    
+    def test_cooldown_delays_rearm(self):
+        self.subscribe(cooldown_minutes=10, hysteresis=None)
+        
+        self.assertEqual(self.tick('201.00', 0), [1])
+        self.assertEqual(self.tick('199.00', 1), [])
+        self.assertEqual(self.tick('201.00', 2), [])
+        self.assertEqual(self.tick('201.00', 11), [1])
+    
+    def test_duration_rearm_restarts_timer(self):
+        self.subscribe(alert_type='duration', duration_minutes=5)
+        
+        self.tick('201.00', 0)
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=5))
+        self.assertEqual([state.id for state, _ in self.engine.pending], [1])
+        self.engine.pending = []
+        
+        self.assertEqual(self.tick('201.00', 20), [])
+        self.assertEqual(self.tick('197.00', 21), [])
+        self.assertEqual(self.tick('201.00', 22), [])
+        self.engine.on_clock(self.now + timezone.timedelta(minutes=27))
+        self.assertEqual([state.id for state, _ in self.engine.pending], [1])
+    
+    def test_trigger_keeps_alert_active(self):
+        alert = Alert.objects.create(
+            user=self.user, stock=self.stock, alert_type='threshold', condition='above',
+            threshold_price=Decimal('200.00'), rearm=True, hysteresis=Decimal('1.00'),
+        )
+        changes = AlertChange.objects.count()
+        
+        with patch('alerts.services.enqueue_notifications'):
+            commit_triggers([(AlertState.from_alert(alert), Decimal('201.00'))])
+            commit_triggers([(AlertState.from_alert(alert), Decimal('202.00'))])
+        
+        self.assertTrue(Alert.objects.get(id=alert.id).is_active)
+        self.assertEqual(alert.triggered_instances.count(), 2)
+        self.assertEqual(AlertChange.objects.count(), changes)
+    
+    def test_fired_alert_loads_disarmed(self):
+        alert = Alert.objects.create(
+            user=self.user, stock=self.stock, alert_type='threshold', condition='above',
+            threshold_price=Decimal('180.00'), rearm=True, cooldown_minutes=30,
+        )
+        TriggeredAlert.objects.create(alert=alert, trigger_price=Decimal('185.00'))
+        
+        self.engine.load()
+        
+        self.assertEqual(self.engine.pending, [])
+        self.assertFalse(self.engine.alerts[alert.id].armed)
+    
+    @override_settings(ALERT_ENGINE_ENABLED=True)
+    def test_partial_update_keeps_rearm_fields(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        alert = Alert.objects.create(
+            user=self.user, stock=self.stock, alert_type='threshold', condition='above',
+            threshold_price=Decimal('10.00'), rearm=True, cooldown_minutes=15, hysteresis=Decimal('1.50'),
+        )
+        
+        response = client.patch(f'/api/alerts/{alert.id}/', {'threshold_price': '11.00'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        alert.refresh_from_db()
+        self.assertEqual((alert.rearm, alert.cooldown_minutes, alert.hysteresis), (True, 15, Decimal('1.50')))
+        
+        response = client.patch(f'/api/alerts/{alert.id}/', {'hysteresis': '-1.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        
+        client.patch(f'/api/alerts/{alert.id}/', {'rearm': False}, format='json')
+        alert.refresh_from_db()
+        self.assertEqual((alert.rearm, alert.cooldown_minutes, alert.hysteresis), (False, None, None))
+    
+    def test_evaluate_all_alerts_skips_rearm(self):
+        alert = Alert.objects.create(
+            user=self.user, stock=self.stock, alert_type='threshold', condition='above',
+            threshold_price=Decimal('150.00'), rearm=True,
+        )
+        
+        with override_settings(ALERT_ENGINE_ENABLED=False):
+            result = evaluate_all_alerts()
+        
+        self.assertEqual(result['total_alerts'], 0)
+        self.assertTrue(Alert.objects.get(id=alert.id).is_active)
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server that accepts every message"""
+    
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+    
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 sink")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply("250 sink")
+            elif command == 'DATA':
+                self.reply("354 go ahead")
+                data = []
+                while (chunk := self.rfile.readline().decode()) not in ('.\r\n', ''):
+                    data.append(chunk)
+                self.server.messages.append(''.join(data))
+                self.reply("250 queued")
+            elif command == 'RCPT' and 'reject' in line:
+                self.reply("550 no such user")
+            elif command == 'QUIT':
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class BatchedNotificationTest(TestCase):
+    def setUp(self):
+        self.sink = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPSinkHandler)
+        self.sink.daemon_threads = True
+        self.sink.connections = 0
+        self.sink.messages = []
+        threading.Thread(target=self.sink.serve_forever, daemon=True).start()
+        self.addCleanup(self.sink.server_close)
+        self.addCleanup(self.sink.shutdown)
+        
+        settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.sink.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+            DEFAULT_FROM_EMAIL='alerts@example.com', ALERT_NOTIFICATION_COALESCE_SECONDS=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        
+        self.stock = Stock.objects.create(symbol='MAIL', name='Mail Inc.', current_price=Decimal('100.00'))
+    
+    def trigger(self, username, email=None, threshold='90.00', user=None):
+        user = user or User.objects.create_user(username=username, email=email, password='x')
+        alert = Alert.objects.create(
+            user=user, stock=self.stock, alert_type='threshold', condition='above',
+            threshold_price=Decimal(threshold),
+        )
+        triggered, = commit_triggers([(alert, Decimal('100.00'))])
+        return triggered
+    
+    def test_batch_uses_one_connection(self):
+        triggered = [self.trigger(f'user{i}', f'user{i}@example.com') for i in range(5)]
+        
+        result = send_alert_notifications([t.id for t in triggered])
+        
+        self.assertEqual(result['sent'], 5)
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual(len(self.sink.messages), 5)
+        self.assertEqual(TriggeredAlert.objects.filter(email_sent=True, email_sent_at__isnull=False).count(), 5)
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 5)
+    
+    def test_failures_are_recorded_per_message(self):
+        sent = self.trigger('good', 'good@example.com')
+        rejected = self.trigger('bad', 'reject@example.com')
+        no_email = self.trigger('none', '')
+        
+        result = send_alert_notifications([sent.id, rejected.id, no_email.id])
+        
+        self.assertEqual(result['sent'], 1)
+        self.assertTrue(TriggeredAlert.objects.get(id=sent.id).email_sent)
+        self.assertIn('reject@example.com', TriggeredAlert.objects.get(id=rejected.id).notification_error)
+        self.assertEqual(TriggeredAlert.objects.get(id=no_email.id).notification_error, "No email address")
+        
+        # Delivery errors are retried later, a missing address is final
+        retry = NotificationOutbox.objects.get(triggered_alert=rejected)
+        self.assertEqual((retry.status, retry.attempts), ('pending', 1))
+        self.assertGreater(retry.available_at, timezone.now())
+        self.assertEqual(NotificationOutbox.objects.get(triggered_alert=no_email).status, 'failed')
+    
+    def test_dispatcher_drains_due_users_in_batches(self):
+        for i in range(5):
+            self.trigger(f'user{i}', f'user{i}@example.com')
+        
+        claimed, sent = drain_outbox(batch_size=2)
+        
+        self.assertEqual((claimed, sent), (5, 5))
+        self.assertEqual(self.sink.connections, 3)
+        self.assertEqual(drain_outbox(batch_size=2), (0, 0))
+    
+    def test_triggers_of_one_user_are_coalesced(self):
+        first = self.trigger('busy', 'busy@example.com')
+        user = first.alert.user
+        others = [self.trigger(None, threshold=90 - i, user=user) for i in range(1, 15)]
+        
+        result = send_alert_notifications([first.id])
+        
+        self.assertEqual(result['sent'], 15)
+        self.assertEqual(len(self.sink.messages), 1)
+        self.assertIn('15 alerts triggered', self.sink.messages[0])
+        self.assertFalse(TriggeredAlert.objects.filter(id__in=[t.id for t in others], email_sent=False).exists())
+    
+    @override_settings(ALERT_NOTIFICATION_COALESCE_SECONDS=60)
+    def test_window_defers_delivery(self):
+        triggered = self.trigger('wait', 'wait@example.com')
+        
+        sent, deferred, retry_in = deliver_coalesced([triggered.id])
+        self.assertEqual((sent, deferred), (0, [triggered.id]))
+        self.assertGreater(retry_in, 50)
+        
+        later = timezone.now() + timezone.timedelta(seconds=61)
+        sent, deferred, _ = deliver_coalesced([triggered.id], now=later)
+        self.assertEqual((sent, deferred), (1, []))
+    
+    @override_settings(ALERT_NOTIFICATION_MAX_LISTED=3)
+    def test_digest_users_get_one_bounded_email(self):
+        triggered = [self.trigger('digest', 'digest@example.com')]
+        user = triggered[0].alert.user
+        NotificationPreference.objects.create(user=user, daily_digest=True)
+        triggered += [self.trigger(None, threshold=90 - i, user=user) for i in range(1, 6)]
+        
+        self.assertEqual(send_alert_notifications([t.id for t in triggered])['sent'], 0)
+        result = send_notification_digests()
+        
+        self.assertEqual(result['sent'], 6)
+        self.assertEqual(len(self.sink.messages), 1)
+        self.assertIn('Digest: 6 alerts triggered', self.sink.messages[0])
+        self.assertIn('...and 3 more', self.sink.messages[0])
+        self.assertFalse(NotificationOutbox.objects.filter(status='pending').exists())
+    
+    @override_settings(ALERT_NOTIFICATION_MAX_LISTED=3)
+    def test_claimed_rows_are_read_one_page_per_user(self):
+        first = self.trigger('backlog', 'backlog@example.com')
+        user = first.alert.user
+        for i in range(1, 8):
+            self.trigger(None, threshold=90 - i, user=user)
+        
+        notification, = outbox_notifications(claim_outbox('reader'))
+        self.assertEqual((len(notification.listed), notification.total), (3, 8))
+        
+        NotificationOutbox.objects.update(leased_until=None)
+        self.assertEqual(dispatch_outbox(), (8, 8))
+        self.assertEqual(len(self.sink.messages), 1)
+        self.assertIn('8 alerts triggered', self.sink.messages[0])
+        self.assertIn('...and 5 more', self.sink.messages[0])
+        self.assertEqual(TriggeredAlert.objects.filter(email_sent=True).count(), 8)
+    
+    @override_settings(ALERT_NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_failed_digest_retries_then_fails_its_outbox_rows(self):
+        triggered = self.trigger('digestfail', 'reject@example.com')
+        NotificationPreference.objects.create(user=triggered.alert.user, daily_digest=True)
+        
+        result = send_notification_digests()
+        
+        self.assertEqual((result['pending'], result['sent']), (1, 0))
+        row = NotificationOutbox.objects.get(triggered_alert=triggered)
+        self.assertEqual((row.status, row.attempts), ('pending', 1))
+        self.assertIn('reject@example.com', row.last_error)
+        triggered.refresh_from_db()
+        self.assertEqual(triggered.notification_error, '')
+        
+        self.assertEqual(send_notification_digests()['pending'], 1)
+        row.refresh_from_db()
+        triggered.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ('failed', 2))
+        self.assertIn('reject@example.com', triggered.notification_error)
+        self.assertEqual(send_notification_digests()['pending'], 0)
+
+
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='outbox', email='outbox@example.com', password='x')
+        self.stock = Stock.objects.create(symbol='OUTB', name='Outbox Inc.', current_price=Decimal('100.00'))
+        self.alert = Alert.objects.create(
+            user=self.user, stock=self.stock, alert_type='threshold', condition='above',
+            threshold_price=Decimal('90.00'),
+        )
+        self.later = timezone.now() + timezone.timedelta(minutes=5)
+    
+    def test_outbox_row_is_written_with_trigger(self):
+        triggered, = commit_triggers([(self.alert, Decimal('100.00'))])
+        
+        row = NotificationOutbox.objects.get(triggered_alert=triggered)
+        self.assertEqual((row.user_id, row.status, row.idempotency_key), (self.user.id, 'pending', f'email:{triggered.id}'))
+    
+    def test_outbox_rolls_back_with_trigger(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                commit_triggers([(self.alert, Decimal('100.00'))])
+                raise RuntimeError
+        
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertFalse(TriggeredAlert.objects.exists())
+    
+    def test_leased_rows_are_not_claimed_twice(self):
+        commit_triggers([(self.alert, Decimal('100.00'))])
+        
+        first = list(claim_outbox('a', now=self.later))
+        second = list(claim_outbox('b', now=self.later))
+        expired = list(claim_outbox('c', now=self.later + timezone.timedelta(hours=1)))
+        
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        self.assertEqual([row.id for row in expired], [first[0].id])
+        self.assertEqual(expired[0].attempts, 2)
+    
+    @override_settings(ALERT_NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_retries_back_off_then_fail(self):
+        commit_triggers([(self.alert, Decimal('100.00'))])
+        connection = MagicMock()
+        connection.send_messages.side_effect = OSError("connection reset")
+        
+        with patch('alerts.notifications.get_connection', return_value=connection):
+            self.assertEqual(dispatch_outbox(now=self.later), (1, 0))
+            self.assertEqual(dispatch_outbox(now=self.later), (0, 0))
+            self.assertEqual(dispatch_outbox(now=self.later + timezone.timedelta(hours=1)), (1, 0))
+        
+        row = NotificationOutbox.objects.get()
+        self.assertEqual((row.status, row.attempts, row.last_error), ('failed', 2, 'connection reset'))
+
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    """Records posted webhooks; answers 500 to the first ``fail_first`` requests"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+            server.connections.add(self.client_address)
+            failing = server.fail_first > 0
+            server.fail_first -= 1
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(0.02)
+        with server.lock:
+            server.in_flight -= 1
+            if not failing:
+                server.received.append((dict(self.headers), body))
+        self.send_response(500 if failing else server.status)
+        if server.status in (301, 302, 307, 308):
+            self.send_header('Location', 'http://169.254.169.254/latest/meta-data/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    ALERT_WEBHOOK_CONCURRENCY=8, ALERT_WEBHOOK_PER_HOST_CONCURRENCY=2,
+    ALERT_WEBHOOK_REQUIRE_HTTPS=False, ALERT_WEBHOOK_ALLOW_PRIVATE=True
+)
+class WebhookDeliveryTest(TestCase):
+    def setUp(self):
+        self.receiver = ThreadingHTTPServer(('127.0.0.1', 0), WebhookReceiver)
+        self.receiver.daemon_threads = True
+        self.receiver.lock = threading.Lock()
+        self.receiver.in_flight = self.receiver.peak = self.receiver.fail_first = 0
+        self.receiver.status = 204
+        self.receiver.connections = set()
+        self.receiver.received = []
+        threading.Thread(target=self.receiver.serve_forever, daemon=True).start()
+        self.addCleanup(self.receiver.server_close)
+        self.addCleanup(self.receiver.shutdown)
+        
+        self.user = User.objects.create_user(username='hooks', email='hooks@example.com', password='x')
+        self.stock = Stock.objects.create(symbol='HOOK', name='Hook Inc.', current_price=Decimal('100.00'))
+        self.endpoint = WebhookEndpoint.objects.create(
+            user=self.user, url=f'http://127.0.0.1:{self.receiver.server_address[1]}/alerts'
+        )
+    
+    def trigger(self, count):
+        alerts = [
+            Alert.objects.create(
+                user=self.user, stock=self.stock, alert_type='threshold', condition='above',
+                threshold_price=Decimal(90 - i),
+            )
+            for i in range(count)
+        ]
+        return commit_triggers([(alert, Decimal('100.00')) for alert in alerts])
+    
+    def test_trigger_writes_webhook_outbox_row(self):
+        triggered, = self.trigger(1)
+        
+        row = NotificationOutbox.objects.get(channel='webhook')
+        self.assertEqual((row.endpoint, row.triggered_alert), (self.endpoint, triggered))
+        self.assertEqual(row.idempotency_key, f'webhook:{self.endpoint.id}:{triggered.id}')
+    
+    def test_concurrent_signed_delivery_over_pooled_connections(self):
+        self.trigger(12)
+        
+        with WebhookDispatcher() as dispatcher:
+            self.assertEqual(dispatcher.drain(), (12, 12))
+        
+        self.assertEqual(len(self.receiver.received), 12)
+        self.assertEqual(self.receiver.peak, 2)
+        self.assertLessEqual(len(self.receiver.connections), 2)
+        headers, body = self.receiver.received[0]
+        timestamp, signature = [part.split('=', 1)[1] for part in headers['X-Signature'].split(',')]
+        self.assertEqual(signature, sign_payload(self.endpoint.secret, timestamp, body))
+        self.assertEqual(headers['X-Idempotency-Key'], json.loads(body)['id'])
+        self.assertEqual(NotificationOutbox.objects.filter(channel='webhook', status='sent').count(), 12)
+    
+    def test_failed_posts_retry_with_backoff(self):
+        self.trigger(1)
+        self.receiver.fail_first = 1
+        later = timezone.now() + timezone.timedelta(hours=1)
+        
+        with WebhookDispatcher() as dispatcher:
+            self.assertEqual(dispatcher.dispatch(), (1, 0))
+            self.assertEqual(dispatcher.dispatch(), (0, 0))
+            self.assertEqual(dispatcher.dispatch(now=later), (1, 1))
+        
+        row = NotificationOutbox.objects.get(channel='webhook')
+        self.assertEqual((row.status, row.attempts), ('sent', 2))
+        self.assertEqual(len(self.receiver.received), 1)
+    
+    def test_rows_of_deactivated_endpoint_fail(self):
+        self.trigger(2)
+        WebhookEndpoint.objects.filter(id=self.endpoint.id).update(is_active=False)
+        
+        with WebhookDispatcher() as dispatcher:
+            self.assertEqual(dispatcher.dispatch(), (0, 0))
+        
+        rows = NotificationOutbox.objects.filter(channel='webhook')
+        self.assertEqual(
+            set(rows.values_list('status', 'last_error')), {('failed', 'Webhook endpoint deactivated')}
+        )
+        self.assertEqual(self.receiver.received, [])
+    
+    def test_redirects_are_not_followed(self):
+        self.trigger(1)
+        self.receiver.status = 307
+        
+        with WebhookDispatcher() as dispatcher:
+            self.assertEqual(dispatcher.dispatch(), (1, 0))
+        
+        row = NotificationOutbox.objects.get(channel='webhook')
+        self.assertEqual((row.status, row.last_error), ('pending', 'HTTP 307'))
+        self.assertEqual(len(self.receiver.received), 1)
+    
+    def test_private_destination_refused_before_posting(self):
+        self.trigger(1)
+        
+        with override_settings(ALERT_WEBHOOK_ALLOW_PRIVATE=False), WebhookDispatcher() as dispatcher:
+            self.assertEqual(dispatcher.dispatch(), (1, 0))
+        
+        row = NotificationOutbox.objects.get(channel='webhook')
+        self.assertIn('non-public address', row.last_error)
+        self.assertEqual(self.receiver.received, [])
+    
+    @override_settings(ALERT_WEBHOOK_CONCURRENCY=2, ALERT_WEBHOOK_PER_HOST_CONCURRENCY=1)
+    def test_slow_host_cannot_take_every_worker(self):
+        started = time.monotonic()
+        finished = {}
+        
+        def post(row):
+            time.sleep(0.1 if 'slow' in row.endpoint.url else 0)
+            finished[row.id] = time.monotonic() - started
+        
+        rows = [
+            MagicMock(id=i, endpoint=MagicMock(url=f"http://{'slow' if i < 4 else 'fast'}.example.com/hook"))
+            for i in range(6)
+        ]
+        with WebhookDispatcher() as dispatcher, patch.object(dispatcher, 'post', side_effect=post):
+            results = dispatcher.post_all(rows)
+        
+        self.assertEqual(results, {i: None for i in range(6)})
+        self.assertLess(max(finished[4], finished[5]), 0.1)
+        self.assertGreaterEqual(finished[3], 0.4)
+
+
+class WebhookEndpointApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='hookapi', email='hookapi@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def resolving_to(self, address):
+        return patch('alerts.webhooks.socket.getaddrinfo', return_value=[(None, None, None, '', (address, 443))])
+    
+    def test_non_public_destinations_refused(self):
+        for url, address in (
+            ('https://hooks.example.com/a', '169.254.169.254'),
+            ('https://hooks.example.com/a', '10.0.0.5'),
+            ('https://localhost/a', '127.0.0.1'),
+            ('https://hooks.example.com/a', '::ffff:192.168.1.1'),
+            ('http://hooks.example.com/a', '93.184.216.34'),
+        ):
+            with self.resolving_to(address):
+                response = self.client.post('/api/webhooks/', {'url': url}, format='json')
+            self.assertEqual(response.status_code, 400, (url, address))
+            self.assertIn('url', response.json()['errors'])
+        self.assertFalse(WebhookEndpoint.objects.exists())
+    
+    def test_public_https_destination_accepted(self):
+        with self.resolving_to('93.184.216.34'):
+            response = self.client.post('/api/webhooks/', {'url': 'https://hooks.example.com/a'}, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['url'], 'https://hooks.example.com/a')
+    
+    def test_secret_shown_only_on_create_and_rotation(self):
+        with self.resolving_to('93.184.216.34'):
+            created = self.client.post('/api/webhooks/', {'url': 'https://hooks.example.com/a'}, format='json')
+        endpoint = WebhookEndpoint.objects.get()
+        self.assertEqual(created.json()['data']['secret'], endpoint.secret)
+        
+        self.assertNotIn('secret', self.client.get('/api/webhooks/').json()['data'][0])
+        self.assertNotIn('secret', self.client.get(f'/api/webhooks/{endpoint.id}/').json())
+        
+        rotated = self.client.post(f'/api/webhooks/{endpoint.id}/rotate-secret/').json()['data']['secret']
+        endpoint.refresh_from_db()
+        self.assertEqual(rotated, endpoint.secret)
+        self.assertNotEqual(rotated, created.json()['data']['secret'])
+
+
+@override_settings(PUSH_STREAM_ENABLED=True, PUSH_STREAM_QUEUE_SIZE=2)
+@patch.object(StreamBroker, 'ensure_listening')
+class PushStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='streamer', email='streamer@example.com', password='pass')
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'))
+        Stock.objects.create(symbol='MSFT', name='Microsoft', current_price=Decimal('300.00'))
+        self.alert = Alert.objects.create(
+            user=self.user, stock=self.stock, alert_type='threshold',
+            condition='above', threshold_price=Decimal('160.00')
+        )
+        self.token = str(AccessToken.for_user(self.user))
+    
+    def test_broker_routes_by_symbol_and_user(self, ensure_listening):
+        broker = StreamBroker()
+        mine = broker.subscribe(self.user.id, {'AAPL'})
+        other = broker.subscribe(self.user.id + 1, {'AAPL', 'MSFT'})
+        
+        self.assertEqual(broker.dispatch(price_channel('AAPL'), '{"price": "1"}'), 2)
+        self.assertEqual(broker.dispatch(price_channel('MSFT'), '{"price": "2"}'), 1)
+        self.assertEqual(broker.dispatch(user_channel(self.user.id), '{"alert_id": 1}'), 1)
+        self.assertEqual(mine.queue.get_nowait(), 'event: price\ndata: {"price": "1"}\n\n')
+        self.assertEqual(mine.queue.get_nowait(), 'event: alert\ndata: {"alert_id": 1}\n\n')
+        self.assertTrue(mine.queue.empty())
+        
+        # Slow readers keep only the newest frames
+        broker.dispatch(price_channel('AAPL'), '{"price": "3"}')
+        self.assertEqual(other.dropped, 1)
+        
+        broker.unsubscribe(mine)
+        broker.unsubscribe(other)
+        self.assertEqual(len(broker), 0)
+        self.assertEqual(dict(broker.by_symbol), {})
+    
+    def test_requires_token(self, ensure_listening):
+        response = self.client.get('/api/stream/')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get('/api/stream/', {'token': 'not-a-token'})
+        self.assertEqual(response.status_code, 401)
+    
+    async def test_streams_watched_prices_and_own_triggers(self, ensure_listening):
+        response = await self.async_client.get('/api/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        self.assertIn(b': subscribed to 1 symbols', await anext(frames))
+        
+        broker = get_broker()
+        broker.dispatch(price_channel('MSFT'), '{"symbol": "MSFT"}')
+        broker.dispatch(user_channel(self.user.id + 1), '{"alert_id": 0}')
+        broker.dispatch(price_channel('AAPL'), '{"symbol": "AAPL"}')
+        broker.dispatch(user_channel(self.user.id), '{"alert_id": 1}')
+        self.assertEqual(await anext(frames), b'event: price\ndata: {"symbol": "AAPL"}\n\n')
+        self.assertEqual(await anext(frames), b'event: alert\ndata: {"alert_id": 1}\n\n')
+        self.assertEqual(len(broker), 1)
+    
+    @override_settings(PUSH_STREAM_MAX_AGE=0)
+    async def test_stream_ends_after_max_age(self, ensure_listening):
+        broker = StreamBroker()
+        frames = [frame async for frame in event_frames(broker, self.user.id, {'AAPL'})]
+        self.assertEqual(len(frames), 1)
+        self.assertTrue(frames[0].startswith('retry: '))
+        self.assertEqual(len(broker), 0)
+    
+    def test_triggers_published_to_owner_channel(self, ensure_listening):
+        with self.captureOnCommitCallbacks() as callbacks:
+            triggered = commit_triggers([(self.alert, Decimal('161.00'))])
+        
+        with patch('alerts.stream.get_redis') as get_redis:
+            publish_triggers([t.id for t in triggered])
+        channel, body = get_redis.return_value.publish.call_args.args
+        self.assertEqual(channel, user_channel(self.user.id))
+        response = self.client.get('/api/triggered-alerts/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(json.loads(body), response.json()['results']['data'][0])
+
+
+class AlertConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='watcher', email='watcher@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'))
+        self.alert = Alert.objects.create(
+            user=self.user, stock=self.stock, alert_type='duration',
+            condition='above', threshold_price=Decimal('160.00'), duration_minutes=5
+        )
+    
+    def test_alert_list_tracks_duration_state(self):
+        etag = self.client.get('/api/alerts/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/alerts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        self.alert.should_trigger(Decimal('161.00'))
+        self.assertEqual(self.client.get('/api/alerts/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_triggered_list_changes_with_new_trigger(self):
+        etag = self.client.get('/api/triggered-alerts/')['ETag']
+        self.assertEqual(self.client.get('/api/triggered-alerts/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        with patch('alerts.services.enqueue_notifications'):
+            commit_triggers([(self.alert, Decimal('161.00'))])
+        self.assertEqual(self.client.get('/api/triggered-alerts/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class TriggeredAlertListTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='history', email='history@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        other = User.objects.create_user(username='someone', email='someone@example.com', password='pass')
+        triggers = []
+        for i, owner in enumerate([self.user, self.user, self.user, other]):
+            stock = Stock.objects.create(symbol=f'SYM{i}', name=f'Stock {i}', current_price=Decimal('100.00'))
+            alert = Alert.objects.create(
+                user=owner, stock=stock, alert_type='threshold',
+                condition='above', threshold_price=Decimal('90.00')
+            )
+            triggers.extend((alert, Decimal('100.00') + n) for n in range(10))
+        with patch('alerts.services.enqueue_notifications'):
+            commit_triggers(triggers)
+    
+    def test_numbered_pages_by_default(self):
+        payload = self.client.get('/api/triggered-alerts/').json()
+        self.assertEqual(payload['count'], 30)
+        self.assertEqual(len(payload['results']['data']), 20)
+        
+        last_page = self.client.get('/api/triggered-alerts/', {'page': 2}).json()
+        self.assertIsNone(last_page['next'])
+        self.assertEqual(len(last_page['results']['data']), 10)
+        ids = [row['id'] for row in payload['results']['data'] + last_page['results']['data']]
+        self.assertEqual(ids, list(
+            TriggeredAlert.objects.filter(user=self.user).order_by('-triggered_at', '-id').values_list('id', flat=True)
+        ))
+    
+    def test_cursor_pages_in_one_joined_query(self):
+        seen = []
+        url = '/api/triggered-alerts/?pagination=cursor&page_size=12'
+        while url:
+            with self.assertNumQueries(2):  # ETag validator, then the page
+                payload = self.client.get(url).json()
+            seen.extend(row['id'] for row in payload['results']['data'])
+            url = payload['next']
+        
+        expected = list(
+            TriggeredAlert.objects.filter(user=self.user).order_by('-triggered_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 30)
+    
+    def test_flat_rows(self):
+        row = self.client.get('/api/triggered-alerts/').json()['results']['data'][0]
+        
+        self.assertEqual(set(row), {
+            'id', 'alert', 'stock_symbol', 'stock_name', 'alert_type', 'condition', 'threshold_price',
+            'trigger_price', 'triggered_at', 'email_sent', 'email_sent_at', 'notification_error',
+        })
+        self.assertEqual(row['threshold_price'], '90.00')
+        self.assertIsInstance(row['alert'], int)
+        detail = self.client.get(f"/api/triggered-alerts/{row['id']}/").json()
+        self.assertEqual(detail, row)
+
+
+class AlertStatisticsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counted', email='counted@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stock = Stock.objects.create(symbol='CNT', name='Counted', current_price=Decimal('100.00'))
+        AlertStatistics.reconcile([self.user.id])
+        self.alerts = [
+            Alert.objects.create(
+                user=self.user, stock=self.stock, alert_type=alert_type,
+                condition='above', threshold_price=threshold,
+                duration_minutes=5 if alert_type == 'duration' else None
+            )
+            for alert_type, threshold in [
+                ('threshold', Decimal('90.00')), ('threshold', Decimal('95.00')), ('duration', Decimal('90.00'))
+            ]
+        ]
+    
+    def counters(self):
+        return AlertStatistics.objects.get(user=self.user)
+    
+    def test_counters_follow_alert_writes(self):
+        counters = self.counters()
+        self.assertEqual((counters.total_alerts, counters.active_alerts), (3, 3))
+        self.assertEqual((counters.threshold_alerts, counters.duration_alerts), (2, 1))
+        
+        with patch('alerts.services.enqueue_notifications'):
+            commit_triggers([(self.alerts[0], Decimal('100.00')), (self.alerts[1], Decimal('101.00'))])
+        counters = self.counters()
+        self.assertEqual(counters.total_triggered, 2)
+        self.assertEqual(counters.active_alerts, 1)
+        
+        self.alerts[0].delete()
+        counters = self.counters()
+        self.assertEqual((counters.total_alerts, counters.threshold_alerts), (2, 1))
+        self.assertEqual(counters.total_triggered, 1)
+    
+    def test_first_trigger_creates_counters(self):
+        AlertStatistics.objects.all().delete()
+        with patch('alerts.services.enqueue_notifications'):
+            commit_triggers([(self.alerts[2], Decimal('100.00'))])
+        
+        counters = self.counters()
+        self.assertEqual(counters.total_triggered, 1)
+        self.assertEqual((counters.total_alerts, counters.active_alerts), (3, 2))
+    
+    def test_endpoint_reads_counters(self):
+        with patch('alerts.services.enqueue_notifications'):
+            commit_triggers([(self.alerts[0], Decimal('100.00'))])
+        TriggeredAlert.objects.filter(alert=self.alerts[0]).update(
+            triggered_at=timezone.now() - timezone.timedelta(days=10)
+        )
+        
+        # counters row + one aggregate over the recent window
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/alerts/statistics/').json()['data']
+        self.assertEqual(data, {
+            'total_alerts': 3,
+            'active_alerts': 2,
+            'inactive_alerts': 1,
+            'total_triggered': 1,
+            'triggered_this_week': 0,
+            'triggered_this_month': 1,
+            'alert_types': {'threshold': 2, 'duration': 1},
+        })
+    
+    def test_reconcile_repairs_drift(self):
+        AlertStatistics.objects.filter(user=self.user).update(total_alerts=50, total_triggered=7)
+        
+        result = reconcile_alert_statistics()
+        
+        self.assertTrue(result['success'])
+        counters = self.counters()
+        self.assertEqual((counters.total_alerts, counters.total_triggered), (3, 0))
+        self.assertIsNotNone(counters.reconciled_at)
+
+
+class BulkAlertTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulk', email='bulk@example.com', password='pass')
+        AlertStatistics.reconcile([self.user.id])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for symbol in ('AAPL', 'MSFT', 'TSLA'):
+            Stock.objects.create(symbol=symbol, name=symbol, current_price=Decimal('100.00'))
+    
+    def test_bulk_create_reports_each_row(self):
+        rows = [
+            {'stock_symbol': 'aapl', 'alert_type': 'threshold', 'condition': 'above', 'threshold_price': '150.00'},
+            {'stock_symbol': 'NOPE', 'alert_type': 'threshold', 'condition': 'above', 'threshold_price': '1.00'},
+            {'stock_symbol': 'MSFT', 'alert_type': 'duration', 'condition': 'below', 'threshold_price': '90.00'},
+            {'stock_symbol': 'AAPL', 'alert_type': 'threshold', 'condition': 'above', 'threshold_price': '150'},
+            {
+                'stock_symbol': 'MSFT', 'alert_type': 'duration', 'condition': 'below',
+                'threshold_price': '90.00', 'duration_minutes': 5
+            },
+        ]
+        response = self.client.post('/api/alerts/bulk/', rows, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        payload = response.json()
+        self.assertEqual((payload['created'], payload['failed']), (2, 3))
+        self.assertEqual([row['success'] for row in payload['data']], [True, False, False, False, True])
+        self.assertIn('stock_symbol', payload['data'][1]['errors'])
+        self.assertIn('already exists', payload['data'][3]['errors']['non_field_errors'][0])
+        self.assertEqual(payload['data'][0]['data']['stock_symbol'], 'AAPL')
+        self.assertEqual(Alert.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(AlertChange.objects.filter(operation='insert', user_id=self.user.id).count(), 2)
+    
+    def test_bulk_create_query_count(self):
+        rows = [
+            {'stock_symbol': symbol, 'alert_type': 'threshold', 'condition': 'above', 'threshold_price': str(price)}
+            for symbol in ('AAPL', 'MSFT', 'TSLA') for price in range(100, 120)
+        ]
+        # symbols + active duplicates + savepoint, insert alerts, statistics, change feed rows, release
+        with self.assertNumQueries(7):
+            response = self.client.post('/api/alerts/bulk/', {'alerts': rows}, format='json')
+        self.assertEqual(response.json()['created'], 60)
+    
+    def test_bulk_create_reports_concurrent_duplicate(self):
+        rows = [
+            {'stock_symbol': symbol, 'alert_type': 'threshold', 'condition': 'above', 'threshold_price': '150.00'}
+            for symbol in ('AAPL', 'MSFT', 'TSLA')
+        ]
+        original_clean = Alert.clean
+        concurrent = []
+        
+        def clean_after_concurrent_insert(alert):
+            # Another request commits the MSFT alert once the duplicate check has run
+            if alert.stock.symbol == 'MSFT' and not concurrent:
+                concurrent.append(alert)
+                Alert.objects.create(
+                    user=self.user, stock=alert.stock, alert_type='threshold',
+                    condition='above', threshold_price=Decimal('150.00')
+                )
+            original_clean(alert)
+        
+        with patch.object(Alert, 'clean', clean_after_concurrent_insert):
+            response = self.client.post('/api/alerts/bulk/', rows, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        payload = response.json()
+        self.assertEqual([row['success'] for row in payload['data']], [True, False, True])
+        self.assertIn('already exists', payload['data'][1]['errors']['non_field_errors'][0])
+        self.assertEqual(Alert.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(AlertChange.objects.filter(operation='insert', user_id=self.user.id).count(), 3)
+    
+    def test_csv_import(self):
+        body = (
+            'stock_symbol,alert_type,condition,threshold_price,duration_minutes\n'
+            'TSLA,threshold,below,80.00,\n'
+            'TSLA,duration,above,120.00,15\n'
+            'TSLA,sideways,above,1.00,\n'
+        )
+        response = self.client.post('/api/alerts/bulk/', body, content_type='text/csv')
+        
+        self.assertEqual(response.status_code, 201)
+        payload = response.json()
+        self.assertEqual(payload['created'], 2)
+        self.assertIn('alert_type', payload['data'][2]['errors'])
+        self.assertEqual(Alert.objects.get(alert_type='duration').duration_minutes, 15)
+    
+    @override_settings(ALERT_BULK_MAX_ROWS=2)
+    def test_too_many_rows(self):
+        body = 'stock_symbol,alert_type,condition,threshold_price\n' + 'AAPL,threshold,above,1\n' * 3
+        response = self.client.post('/api/alerts/bulk/', body, content_type='text/csv')
+        
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Alert.objects.exists())
+    
+    def make_alerts(self):
+        return [
+            Alert.objects.create(
+                user=self.user, stock=Stock.objects.get(symbol=symbol), alert_type='threshold',
+                condition='above', threshold_price=Decimal('150.00')
+            )
+            for symbol in ('AAPL', 'MSFT', 'TSLA')
+        ]
+    
+    def test_bulk_deactivate_and_reactivate(self):
+        alerts = self.make_alerts()
+        
+        response = self.client.post('/api/alerts/bulk-update/', {
+            'filter': {'stock_symbol': ['aapl', 'MSFT']}, 'is_active': False
+        }, format='json')
+        
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(set(Alert.objects.filter(is_active=True).values_list('id', flat=True)), {alerts[2].id})
+        self.assertEqual(AlertStatistics.objects.get(user=self.user).active_alerts, 1)
+        
+        response = self.client.post('/api/alerts/bulk-update/', {
+            'filter': {'is_active': False}, 'is_active': True
+        }, format='json')
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(Alert.objects.filter(is_active=True).count(), 3)
+    
+    def test_bulk_delete_by_filter(self):
+        alerts = self.make_alerts()
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        Alert.objects.create(
+            user=other, stock=alerts[0].stock, alert_type='threshold',
+            condition='above', threshold_price=Decimal('150.00')
+        )
+        
+        response = self.client.post('/api/alerts/bulk-delete/', {
+            'filter': {'ids': [alerts[0].id, alerts[1].id]}
+        }, format='json')
+        
+        self.assertEqual(response.json(), {'success': True, 'deleted': 2})
+        self.assertEqual(Alert.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Alert.objects.filter(user=other).count(), 1)
+    
+    def test_bulk_delete_records_changes_in_bulk(self):
+        alerts = self.make_alerts()
+        for alert in alerts[:2]:
+            TriggeredAlert.objects.create(alert=alert, trigger_price=Decimal('155.00'))
+        TriggeredAlert.objects.create(alert=alerts[0], trigger_price=Decimal('160.00'))
+        AlertStatistics.reconcile([self.user.id])
+        
+        self.client.post('/api/alerts/bulk-delete/', {'filter': {'ids': [alerts[2].id]}}, format='json')
+        # The same statements however many alerts match: one change INSERT, one counter UPDATE of each kind
+        with self.assertNumQueries(12):
+            response = self.client.post('/api/alerts/bulk-delete/', {
+                'filter': {'ids': [alerts[0].id, alerts[1].id]}
+            }, format='json')
+        
+        self.assertEqual(response.json(), {'success': True, 'deleted': 2})
+        self.assertEqual(AlertChange.objects.filter(operation='delete', user_id=self.user.id).count(), 3)
+        counters = AlertStatistics.objects.get(user=self.user)
+        self.assertEqual((counters.total_alerts, counters.total_triggered), (0, 0))
+    
+    def test_empty_filter_refused(self):
+        self.make_alerts()
+        
+        for body in ({}, {'filter': {}}, {'filter': {'owner': 1}}):
+            response = self.client.post('/api/alerts/bulk-delete/', body, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Alert.objects.count(), 3)
+
+
+class AsyncAlertReadTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='asyncreader', email='asyncreader@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}}
+        triggers = []
+        for i in range(3):
+            stock = Stock.objects.create(symbol=f'ASY{i}', name=f'Async {i}', current_price=Decimal('100.00'))
+            alert = Alert.objects.create(
+                user=self.user, stock=stock, alert_type='threshold',
+                condition='above', threshold_price=Decimal('90.00'), is_active=i != 2
+            )
+            triggers.extend((alert, Decimal('100.00') + n) for n in range(5))
+        with patch('alerts.services.enqueue_notifications'):
+            commit_triggers(triggers)
+    
+    async def test_alert_list_matches_sync(self):
+        for params in ({}, {'is_active': 'false'}, {'stock_symbol': 'asy1'}):
+            expected = await sync_to_async(lambda: self.client.get('/api/alerts/', params).json())()
+            response = await self.async_client.get('/api/async/alerts/', params, **self.auth)
+            self.assertEqual(response.json(), expected)
+    
+    async def test_triggered_pages_match_sync(self):
+        for params in ({}, {'days': 1}):
+            expected = await sync_to_async(lambda: self.client.get('/api/triggered-alerts/', params).json())()
+            response = await self.async_client.get('/api/async/triggered-alerts/', params, **self.auth)
+            self.assertEqual(response.json(), expected)
+    
+    async def test_triggered_cursor_pages(self):
+        seen = []
+        url = '/api/async/triggered-alerts/?pagination=cursor&page_size=4'
+        while url:
+            payload = (await self.async_client.get(url, **self.auth)).json()
+            seen.extend(row['id'] for row in payload['results']['data'])
+            url = payload['next']
+        
+        expected = await sync_to_async(lambda: list(
+            TriggeredAlert.objects.filter(user=self.user).order_by('-triggered_at', '-id').values_list('id', flat=True)
+        ))()
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 15)
+        
+        sync_row = await sync_to_async(lambda: self.client.get('/api/triggered-alerts/').json())()
+        async_row = (await self.async_client.get('/api/async/triggered-alerts/', **self.auth)).json()
+        self.assertEqual(async_row['results']['data'][0], sync_row['results']['data'][0])
+        
+        response = await self.async_client.get(
+            '/api/async/triggered-alerts/', {'pagination': 'cursor', 'cursor': '!!'}, **self.auth
+        )
+        self.assertEqual(response.status_code, 404)
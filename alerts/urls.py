@@ -1,11 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AlertViewSet, TriggeredAlertViewSet
+from .stream import stream
+from .views import AlertViewSet, TriggeredAlertViewSet, WebhookEndpointViewSet, notification_preferences
 
 router = DefaultRouter()
 router.register(r'alerts', AlertViewSet, basename='alert')
 router.register(r'triggered-alerts', TriggeredAlertViewSet, basename='triggered-alert')
+router.register(r'webhooks', WebhookEndpointViewSet, basename='webhook')
 
 urlpatterns = [
+    path('stream/', stream, name='stream'),
+    path('notification-preferences/', notification_preferences, name='notification-preferences'),
     path('', include(router.urls)),
 ]
@@ -1,19 +1,52 @@
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django.utils import timezone
 import logging
 
-from .models import Alert, TriggeredAlert
+from django.db.models import Count, Max, Q
+from stocks.cache import cached_response
+from stocks.conditional import conditional
+
+from .bulk import CSVParser, TooManyRows, alert_rows, create_alerts, delete_alerts, filter_alerts, set_active
+from .models import (
+    Alert, AlertStatistics, NotificationPreference, TriggeredAlert, WebhookEndpoint, generate_webhook_secret,
+)
 from .serializers import (
     AlertSerializer, 
     AlertCreateSerializer, 
+    NotificationPreferenceSerializer,
     TriggeredAlertSerializer,
+    WebhookEndpointSerializer,
 )
-from .tasks import evaluate_alert
 logger = logging.getLogger(__name__)
 
 
+def alerts_state(request, *args, **kwargs):
+    # Duration tracking saves skip updated_at, so its fields are part of the state
+    state = Alert.objects.filter(user=request.user).aggregate(
+        count=Count('id'),
+        updated_at=Max('updated_at'),
+        first_met=Max('condition_first_met'),
+        currently_met=Count('id', filter=Q(condition_currently_met=True)),
+    )
+    return tuple(state.values())
+
+
+def triggered_alerts_state(request, *args, **kwargs):
+    state = TriggeredAlert.objects.filter(user=request.user).aggregate(
+        count=Count('id'),
+        triggered_at=Max('triggered_at'),
+        email_sent_at=Max('email_sent_at'),
+        emailed=Count('id', filter=Q(email_sent=True)),
+        failed=Count('id', filter=~Q(notification_error='')),
+    )
+    return tuple(state.values())
+
+
 class AlertViewSet(viewsets.ModelViewSet):
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
@@ -57,6 +90,7 @@ class AlertViewSet(viewsets.ModelViewSet):
                 'error': 'Failed to create alert'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @conditional(alerts_state)
     def list(self, request, *args, **kwargs):
         """List user's alerts"""
         try:
@@ -114,27 +148,142 @@ class AlertViewSet(viewsets.ModelViewSet):
                 'error': 'Failed to delete alert'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['post'], parser_classes=[*api_settings.DEFAULT_PARSER_CLASSES, CSVParser])
+    def bulk(self, request):
+        """Create many alerts from a JSON array or a CSV upload, reporting each row"""
+        try:
+            try:
+                rows = alert_rows(request.data)
+            except APIException as e:
+                # Malformed CSV/JSON or an unsupported content type
+                return Response({
+                    'success': False,
+                    'error': str(e.detail)
+                }, status=e.status_code)
+            except TooManyRows as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            results = []
+            for index, result in enumerate(create_alerts(request.user, rows)):
+                if isinstance(result, Alert):
+                    results.append({'row': index, 'success': True, 'data': AlertSerializer(result).data})
+                else:
+                    results.append({'row': index, 'success': False, 'errors': result})
+            created = sum(result['success'] for result in results)
+            
+            logger.info(f"Bulk created {created} of {len(rows)} alerts for {request.user}")
+            
+            return Response({
+                'success': created > 0,
+                'created': created,
+                'failed': len(rows) - created,
+                'data': results
+            }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+            
+        except Exception as e:
+            logger.error(f"Error bulk creating alerts: {e}")
+            return Response({
+                'success': False,
+                'error': 'Failed to create alerts'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """Activate or deactivate every alert matching ``filter``"""
+        try:
+            is_active = request.data.get('is_active')
+            if not isinstance(is_active, bool):
+                return Response({
+                    'success': False,
+                    'error': 'is_active must be true or false'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                alert_ids = set_active(filter_alerts(self.get_queryset(), request.data.get('filter')), is_active)
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            logger.info(f"Bulk updated {len(alert_ids)} alerts for {request.user}")
+            
+            return Response({
+                'success': True,
+                'updated': len(alert_ids),
+                'data': alert_ids
+            })
+            
+        except Exception as e:
+            logger.error(f"Error bulk updating alerts: {e}")
+            return Response({
+                'success': False,
+                'error': 'Failed to update alerts'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Delete every alert matching ``filter`` in one transaction"""
+        try:
+            try:
+                queryset = filter_alerts(self.get_queryset(), request.data.get('filter'))
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            deleted = delete_alerts(queryset)
+            
+            logger.info(f"Bulk deleted {deleted} alerts for {request.user}")
+            
+            return Response({
+                'success': True,
+                'deleted': deleted
+            })
+            
+        except Exception as e:
+            logger.error(f"Error bulk deleting alerts: {e}")
+            return Response({
+                'success': False,
+                'error': 'Failed to delete alerts'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
     @action(detail=False, methods=['get'])
+    @cached_response('alert-statistics', per_user=True)
     def statistics(self, request):
         """Get user's alert statistics"""
         try:
-            user_alerts = Alert.objects.filter(user=request.user)
-            triggered_alerts = TriggeredAlert.objects.filter(alert__user=request.user)
+            counters = AlertStatistics.objects.filter(user=request.user).first()
+            if counters is None:
+                counters, = AlertStatistics.reconcile([request.user.id])
+            
+            # Recent windows come from the (user, triggered_at) index, not the full history
+            now = timezone.now()
+            recent = TriggeredAlert.objects.filter(
+                user=request.user, triggered_at__gte=now - timezone.timedelta(days=30)
+            ).aggregate(
+                week=Count('id', filter=Q(triggered_at__gte=now - timezone.timedelta(days=7))),
+                month=Count('id'),
+            )
             
             stats = {
-                'total_alerts': user_alerts.count(),
-                'active_alerts': user_alerts.filter(is_active=True).count(),
-                'inactive_alerts': user_alerts.filter(is_active=False).count(),
-                'total_triggered': triggered_alerts.count(),
-                'triggered_this_week': triggered_alerts.filter(
-                    triggered_at__gte=timezone.now() - timezone.timedelta(days=7)
-                ).count(),
-                'triggered_this_month': triggered_alerts.filter(
-                    triggered_at__gte=timezone.now() - timezone.timedelta(days=30)
-                ).count(),
+                'total_alerts': counters.total_alerts,
+                'active_alerts': counters.active_alerts,
+                'inactive_alerts': counters.total_alerts - counters.active_alerts,
+                'total_triggered': counters.total_triggered,
+                'triggered_this_week': recent['week'],
+                'triggered_this_month': recent['month'],
                 'alert_types': {
-                    'threshold': user_alerts.filter(alert_type='threshold').count(),
-                    'duration': user_alerts.filter(alert_type='duration').count(),
+                    'threshold': counters.threshold_alerts,
+                    'duration': counters.duration_alerts,
                 }
             }
             
@@ -151,15 +300,28 @@ class AlertViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class TriggeredAlertCursorPagination(CursorPagination):
+    """Keyset pages on (triggered_at, id) so deep pages need no OFFSET or COUNT"""
+    ordering = ('-triggered_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
 class TriggeredAlertViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = TriggeredAlert.objects.all()
     serializer_class = TriggeredAlertSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    @property
+    def pagination_class(self):
+        """Numbered pages with a count by default; ``?pagination=cursor`` opts in to keyset pages"""
+        request = getattr(self, 'request', None)
+        if request is not None and request.query_params.get('pagination') == 'cursor':
+            return TriggeredAlertCursorPagination
+        return PageNumberPagination
+    
     def get_queryset(self):
-        queryset = TriggeredAlert.objects.filter(
-            alert__user=self.request.user
-        ).order_by('-triggered_at')
+        queryset = TriggeredAlert.objects.filter(user=self.request.user).flat().order_by('-triggered_at', '-id')
         
         # Filter by date range if provided
         days = self.request.query_params.get('days')
@@ -173,6 +335,7 @@ class TriggeredAlertViewSet(viewsets.ReadOnlyModelViewSet):
                 
         return queryset
     
+    @conditional(triggered_alerts_state, windowed='days')
     def list(self, request, *args, **kwargs):
         """List user's triggered alerts with enhanced response format"""
         try:
@@ -199,3 +362,105 @@ class TriggeredAlertViewSet(viewsets.ReadOnlyModelViewSet):
                 'success': False,
                 'error': 'Failed to fetch triggered alerts'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class WebhookEndpointViewSet(viewsets.ModelViewSet):
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return WebhookEndpoint.objects.filter(user=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        """Register a webhook endpoint; the signing secret is returned here"""
+        try:
+            serializer = self.get_serializer(data=request.data)
+            if serializer.is_valid():
+                endpoint = serializer.save()
+                logger.info(f"Webhook endpoint created: {endpoint}")
+                return Response({
+                    'success': True,
+                    'message': 'Webhook endpoint created successfully',
+                    'data': {**serializer.data, 'secret': endpoint.secret}
+                }, status=status.HTTP_201_CREATED)
+            
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+            
+        except Exception as e:
+            logger.error(f"Error creating webhook endpoint: {e}")
+            return Response({
+                'success': False,
+                'error': 'Failed to create webhook endpoint'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def list(self, request, *args, **kwargs):
+        """List the user's webhook endpoints"""
+        try:
+            serializer = self.get_serializer(self.get_queryset(), many=True)
+            return Response({
+                'success': True,
+                'data': serializer.data
+            })
+            
+        except Exception as e:
+            logger.error(f"Error listing webhook endpoints: {e}")
+            return Response({
+                'success': False,
+                'error': 'Failed to fetch webhook endpoints'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=True, methods=['post'], url_path='rotate-secret')
+    def rotate_secret(self, request, pk=None):
+        """Replace the endpoint's signing secret and return the new one"""
+        endpoint = self.get_object()
+        try:
+            endpoint.secret = generate_webhook_secret()
+            endpoint.save(update_fields=['secret'])
+            logger.info(f"Webhook secret rotated: {endpoint}")
+            return Response({
+                'success': True,
+                'data': {**self.get_serializer(endpoint).data, 'secret': endpoint.secret}
+            })
+            
+        except Exception as e:
+            logger.error(f"Error rotating webhook secret: {e}")
+            return Response({
+                'success': False,
+                'error': 'Failed to rotate webhook secret'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET', 'PUT'])
+@permission_classes([permissions.IsAuthenticated])
+def notification_preferences(request):
+    """Get or update how the user's triggered alerts are delivered"""
+    try:
+        preference, _ = NotificationPreference.objects.get_or_create(user=request.user)
+        if request.method == 'GET':
+            return Response({
+                'success': True,
+                'data': NotificationPreferenceSerializer(preference).data
+            })
+        
+        serializer = NotificationPreferenceSerializer(preference, data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response({
+                'success': True,
+                'message': 'Notification preferences updated successfully',
+                'data': serializer.data
+            })
+        
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+        
+    except Exception as e:
+        logger.error(f"Error handling notification preferences: {e}")
+        return Response({
+            'success': False,
+            'error': 'Failed to handle notification preferences'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,225 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NotificationOutbox
+from .notifications import lease_outbox, retry_or_fail, unleased_outbox
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_payload(row):
+    triggered_alert = row.triggered_alert
+    alert = triggered_alert.alert
+    return {
+        'id': row.idempotency_key,
+        'event': 'alert.triggered',
+        'triggered_alert_id': triggered_alert.id,
+        'alert_id': alert.id,
+        'stock_symbol': alert.stock.symbol,
+        'alert_type': alert.alert_type,
+        'condition': alert.condition,
+        'threshold_price': alert.threshold_price,
+        'trigger_price': triggered_alert.trigger_price,
+        'triggered_at': triggered_alert.triggered_at,
+    }
+
+
+def check_webhook_url(url):
+    """Raise ValueError unless ``url`` may receive webhooks.
+
+    The host is resolved and every address it maps to must be global, so
+    endpoints cannot reach loopback, private or link-local networks (such
+    as the cloud metadata service). Called when an endpoint is saved and
+    again before each post, since DNS answers can change in between.
+    """
+    parts = urlsplit(url)
+    schemes = ('https',) if settings.ALERT_WEBHOOK_REQUIRE_HTTPS else ('https', 'http')
+    if parts.scheme not in schemes:
+        raise ValueError(f"Webhook URL must use {' or '.join(schemes)}")
+    if not parts.hostname:
+        raise ValueError("Webhook URL must include a host")
+    if settings.ALERT_WEBHOOK_ALLOW_PRIVATE:
+        return
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Webhook host {parts.hostname} could not be resolved")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if getattr(address, 'ipv4_mapped', None):
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise ValueError(f"Webhook host {parts.hostname} resolves to a non-public address")
+
+
+def sign_payload(secret, timestamp, body):
+    """HMAC-SHA256 over ``{timestamp}.{body}``, as sent in the X-Signature header"""
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class WebhookDispatcher:
+    """Posts webhook outbox rows concurrently over pooled keep-alive connections.
+
+    One requests Session is shared by a thread pool of
+    ``ALERT_WEBHOOK_CONCURRENCY`` workers, and its connection pool keeps
+    connections to each host open between deliveries. Rows wait in a queue
+    per destination host and at most ``ALERT_WEBHOOK_PER_HOST_CONCURRENCY``
+    of each host are submitted at a time, so one slow receiver cannot take
+    every worker. Each request carries the row's idempotency key and a
+    timestamped signature; failures are retried with backoff by the outbox.
+    """
+
+    def __init__(self, worker=None):
+        self.worker = worker
+        self.concurrency = settings.ALERT_WEBHOOK_CONCURRENCY
+        self.per_host = settings.ALERT_WEBHOOK_PER_HOST_CONCURRENCY
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.concurrency, pool_maxsize=self.per_host, max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='webhook')
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def claim(self, batch_size=None, now=None):
+        """Lease up to ``batch_size`` due webhook rows.
+
+        Pending rows of deactivated endpoints are failed first; nothing
+        would ever claim them otherwise. Deleting an endpoint deletes its rows.
+        """
+        now = now or timezone.now()
+        batch_size = batch_size or settings.ALERT_NOTIFICATION_BATCH_SIZE
+        unleased_outbox('webhook', now).filter(endpoint__is_active=False).update(
+            status='failed', leased_until=None, last_error='Webhook endpoint deactivated'
+        )
+        due = unleased_outbox('webhook', now).filter(available_at__lte=now, endpoint__is_active=True)
+        with transaction.atomic():
+            ids = list(due.order_by('available_at', 'id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return []
+            owner = lease_outbox(due.filter(id__in=ids), self.worker, now)
+        return list(
+            NotificationOutbox.objects.filter(lease_owner=owner)
+            .select_related('endpoint', 'triggered_alert__alert__stock')
+        )
+
+    def dispatch(self, batch_size=None, now=None):
+        """Claim one batch and post it. Returns (claimed count, sent count)."""
+        now = now or timezone.now()
+        rows = self.claim(batch_size, now)
+        if not rows:
+            return 0, 0
+
+        results = self.post_all(rows)
+        sent_ids = [row_id for row_id, error in results.items() if error is None]
+        errors = {row_id: error for row_id, error in results.items() if error is not None}
+
+        if sent_ids:
+            NotificationOutbox.objects.filter(id__in=sent_ids).update(
+                status='sent',
+                sent_at=timezone.now(),
+                leased_until=None,
+                last_error=''
+            )
+        retry_or_fail(rows, errors, now)
+        logger.info(f"Delivered {len(sent_ids)} of {len(rows)} webhooks")
+        return len(rows), len(sent_ids)
+
+    def drain(self, batch_size=None):
+        """Dispatch batches until no due rows are left. Returns (claimed count, sent count)."""
+        claimed_total = sent_total = 0
+        while True:
+            claimed, sent = self.dispatch(batch_size)
+            if not claimed:
+                return claimed_total, sent_total
+            claimed_total += claimed
+            sent_total += sent
+
+    def post_all(self, rows):
+        """Post ``rows`` with at most ``per_host`` in flight per host. Returns {row id: error or None}.
+
+        A host's next row is submitted only when one of its posts finishes,
+        so workers never wait on a busy host while other hosts have rows.
+        """
+        queues = defaultdict(deque)
+        for row in rows:
+            queues[urlsplit(row.endpoint.url).netloc].append(row)
+
+        running = {}
+
+        def submit(host):
+            row = queues[host].popleft()
+            running[self.executor.submit(self.post, row)] = (host, row)
+
+        for host, queue in queues.items():
+            for _ in range(min(self.per_host, len(queue))):
+                submit(host)
+
+        results = {}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                host, row = running.pop(future)
+                results[row.id] = future.result()
+                if queues[host]:
+                    submit(host)
+        return results
+
+    def post(self, row):
+        """Deliver one row; returns None on success or the error.
+
+        Redirects are not followed, since their target has not been checked.
+        """
+        try:
+            check_webhook_url(row.endpoint.url)
+        except ValueError as e:
+            return str(e)
+        body = json.dumps(webhook_payload(row), cls=DjangoJSONEncoder).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'stock-alerting-webhooks',
+            'X-Idempotency-Key': row.idempotency_key,
+            'X-Signature': f"t={timestamp},v1={sign_payload(row.endpoint.secret, timestamp, body)}",
+        }
+        try:
+            response = self.session.post(
+                row.endpoint.url, data=body, headers=headers, timeout=settings.ALERT_WEBHOOK_TIMEOUT,
+                allow_redirects=False
+            )
+        except requests.RequestException as e:
+            return str(e)
+        if 200 <= response.status_code < 300:
+            return None
+        return f"HTTP {response.status_code}"
+
+
+def dispatch_webhooks(worker=None, batch_size=None):
+    """Drain every due webhook row with a short-lived dispatcher"""
+    with WebhookDispatcher(worker) as dispatcher:
+        return dispatcher.drain(batch_size)
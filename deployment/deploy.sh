@@ -96,6 +96,7 @@ echo -e "${YELLOW}Setting up systemd services...${NC}"
 sudo cp deployment/stock-alerting.service /etc/systemd/system/
 sudo cp deployment/celery.service /etc/systemd/system/
 sudo cp deployment/celerybeat.service /etc/systemd/system/
+sudo cp deployment/stock-alerting-stream.service /etc/systemd/system/
 
 # Create required directories
 sudo mkdir -p /var/run/celery /var/log/celery
@@ -103,8 +104,8 @@ sudo chown ubuntu:ubuntu /var/run/celery /var/log/celery
 
 # Enable and start services
 sudo systemctl daemon-reload
-sudo systemctl enable stock-alerting celery celerybeat
-sudo systemctl start stock-alerting celery celerybeat
+sudo systemctl enable stock-alerting stock-alerting-stream celery celerybeat
+sudo systemctl start stock-alerting stock-alerting-stream celery celerybeat
 
 # Setup Nginx
 echo -e "${YELLOW}Setting up Nginx...${NC}"
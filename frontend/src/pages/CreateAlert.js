@@ -6,7 +6,6 @@ import toast from 'react-hot-toast';
 const CreateAlert = () => {
     const navigate = useNavigate();
     const [stocks, setStocks] = useState([]);
-    const [loading, setLoading] = useState(true);
     const [submitting, setSubmitting] = useState(false);
     const [formData, setFormData] = useState({
         stock_symbol: '',
@@ -17,21 +16,29 @@ const CreateAlert = () => {
         is_active: true
     });
 
+    // Autocomplete from the ranked search endpoint as the symbol is typed
     useEffect(() => {
-        const fetchStocks = async () => {
+        const query = formData.stock_symbol.trim();
+        if (!query) {
+            setStocks([]);
+            return undefined;
+        }
+        let cancelled = false;
+        const timer = setTimeout(async () => {
             try {
-                const response = await stockAPI.getStocks();
-                setStocks(response.data.results || response.data);
+                const response = await stockAPI.searchStocks(query);
+                if (!cancelled) {
+                    setStocks(response.data.data);
+                }
             } catch (error) {
-                console.error('Error fetching stocks:', error);
-                toast.error('Failed to fetch stocks');
-            } finally {
-                setLoading(false);
+                console.error('Error searching stocks:', error);
             }
+        }, 150);
+        return () => {
+            cancelled = true;
+            clearTimeout(timer);
         };
-
-        fetchStocks();
-    }, []);
+    }, [formData.stock_symbol]);
 
     const handleChange = (e) => {
         const { name, value, type, checked } = e.target;
@@ -82,14 +89,6 @@ const CreateAlert = () => {
         }
     };
 
-    if (loading) {
-        return (
-            <div style={{ display: 'flex', justifyContent: 'center', alignItems: 'center', minHeight: '400px' }}>
-                <div className="loading-spinner"></div>
-            </div>
-        );
-    }
-
     return (
         <div style={{ maxWidth: '600px', margin: '0 auto' }}>
             <div style={{ marginBottom: '2rem' }}>
@@ -112,10 +111,14 @@ const CreateAlert = () => {
                         <label style={{ display: 'block', marginBottom: '0.5rem', fontWeight: '500', fontSize: '1rem' }}>
                             📈 Select Stock *
                         </label>
-                        <select
+                        <input
+                            type="text"
                             name="stock_symbol"
+                            list="stock-search-results"
                             value={formData.stock_symbol}
-                            onChange={handleChange}
+                            onChange={(e) => setFormData({ ...formData, stock_symbol: e.target.value.toUpperCase() })}
+                            placeholder="Search by symbol or company name"
+                            autoComplete="off"
                             required
                             style={{
                                 width: '100%',
@@ -129,17 +132,17 @@ const CreateAlert = () => {
                             }}
                             onFocus={(e) => e.target.style.borderColor = '#2563eb'}
                             onBlur={(e) => e.target.style.borderColor = '#d1d5db'}
-                        >
-                            <option value="">Choose a stock to monitor</option>
-                            {stocks.filter(stock => stock.is_active).map((stock) => (
+                        />
+                        <datalist id="stock-search-results">
+                            {stocks.map((stock) => (
                                 <option key={stock.id} value={stock.symbol}>
                                     {stock.symbol} - {stock.name} ({stock.exchange})
                                 </option>
                             ))}
-                        </select>
-                        {stocks.filter(stock => stock.is_active).length === 0 && (
+                        </datalist>
+                        {formData.stock_symbol && stocks.length === 0 && (
                             <p style={{ color: '#dc2626', fontSize: '0.875rem', marginTop: '0.5rem' }}>
-                                No active stocks available for monitoring.
+                                No active stocks match "{formData.stock_symbol}".
                             </p>
                         )}
                     </div>
@@ -1,8 +1,10 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { stockAPI, alertAPI } from '../services/api';
+import { stockAPI, alertAPI, streamAPI } from '../services/api';
 import { useAuth } from '../contexts/AuthContext';
 
+const TRIGGERED_POLL_INTERVAL_MS = 30000;
+
 const Dashboard = () => {
     const { user } = useAuth();
     const [stats, setStats] = useState({
@@ -56,6 +58,45 @@ const Dashboard = () => {
         fetchDashboardData();
     }, []);
 
+    useEffect(() => {
+        // New triggers are pushed as they commit; if the stream is refused
+        // (disabled, or the token was rejected) poll the list instead
+        let pollTimer = null;
+
+        const pollTriggeredAlerts = async () => {
+            try {
+                const response = await alertAPI.getTriggeredAlerts();
+                const triggered = Array.isArray(response.data.results)
+                    ? response.data.results
+                    : (response.data.results?.data || response.data || []);
+                setRecentAlerts(triggered.slice(0, 5));
+                setStats(previous => ({ ...previous, triggeredAlerts: triggered.length }));
+            } catch (error) {
+                console.error('Error polling triggered alerts:', error);
+            }
+        };
+
+        const source = streamAPI.open();
+        source.addEventListener('alert', (event) => {
+            const triggered = JSON.parse(event.data);
+            setRecentAlerts(previous => [triggered, ...previous.filter(alert => alert.id !== triggered.id)].slice(0, 5));
+            setStats(previous => ({ ...previous, triggeredAlerts: previous.triggeredAlerts + 1 }));
+        });
+        source.onerror = () => {
+            // EventSource retries dropped connections by itself and only
+            // closes for good when the server refuses the stream
+            if (source.readyState === EventSource.CLOSED && pollTimer === null) {
+                pollTimer = setInterval(pollTriggeredAlerts, TRIGGERED_POLL_INTERVAL_MS);
+            }
+        };
+        return () => {
+            source.close();
+            if (pollTimer !== null) {
+                clearInterval(pollTimer);
+            }
+        };
+    }, []);
+
     if (loading) {
         return (
             <div style={{ display: 'flex', justifyContent: 'center', alignItems: 'center', minHeight: '400px' }}>
@@ -72,7 +72,11 @@ export const stockAPI = {
     getStocks: () => api.get('/stocks/'),
     getStock: (id) => api.get(`/stocks/${id}/`),
     getStockPrices: (id) => api.get(`/stocks/${id}/price_history/`),
+    getBatchHistory: (symbols, hours = 24, resolution = '5m') => api.get('/stocks/batch-history/', {
+        params: { symbols: symbols.join(','), hours, resolution }
+    }),
     getCurrentPrices: () => api.get('/stocks/current_prices/'),
+    searchStocks: (query, limit = 10) => api.get('/stocks/search/', { params: { q: query, limit } }),
 };
 
 // Alert API calls
@@ -84,4 +88,11 @@ export const alertAPI = {
     getTriggeredAlerts: () => api.get('/triggered-alerts/'),
 };
 
+// Server-Sent Events: 'price' events for watched symbols and 'alert' events for the user's triggers
+export const streamAPI = {
+    open: () => new EventSource(
+        `${API_BASE_URL}/stream/?token=${encodeURIComponent(localStorage.getItem('access_token') || '')}`
+    ),
+};
+
 export default api;
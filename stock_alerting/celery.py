@@ -28,6 +28,26 @@ app.conf.beat_schedule = {
         'task': 'stocks.tasks.cleanup_old_price_data',
         'schedule': crontab(day_of_month=1, hour=2, minute=0),  # Monthly on 1st at 2 AM
     },
+    'dispatch-notifications': {
+        'task': 'alerts.tasks.dispatch_notifications',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    'dispatch-webhooks': {
+        'task': 'alerts.tasks.dispatch_webhooks',
+        'schedule': crontab(minute='*'),  # Every minute, picks up retries
+    },
+    'send-notification-digests': {
+        'task': 'alerts.tasks.send_notification_digests',
+        'schedule': crontab(hour=21, minute=0),  # Daily after market close
+    },
+    'prune-alert-changes': {
+        'task': 'alerts.tasks.prune_alert_changes',
+        'schedule': crontab(hour=3, minute=0),  # Daily at 3 AM
+    },
+    'reconcile-alert-statistics': {
+        'task': 'alerts.tasks.reconcile_alert_statistics',
+        'schedule': crontab(hour=3, minute=30),  # Daily, after the change feed prune
+    },
 }
 
 app.conf.timezone = 'UTC'
@@ -169,6 +169,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'stock_alerting.renderers.ORJSONRenderer',
+        'stock_alerting.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'stock_alerting.renderers.ORJSONParser',
+        'stock_alerting.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 
@@ -228,6 +239,44 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Alert evaluation
+ALERT_NOTIFICATION_BATCH_SIZE = config('ALERT_NOTIFICATION_BATCH_SIZE', default=100, cast=int)
+# Triggers of one user within this window are merged into one email (0 sends immediately)
+ALERT_NOTIFICATION_COALESCE_SECONDS = config('ALERT_NOTIFICATION_COALESCE_SECONDS', default=60, cast=int)
+# Most triggers listed in one coalesced or digest email
+ALERT_NOTIFICATION_MAX_LISTED = config('ALERT_NOTIFICATION_MAX_LISTED', default=50, cast=int)
+# Notification outbox: how long a dispatcher owns claimed rows, and retry backoff
+ALERT_NOTIFICATION_LEASE_SECONDS = config('ALERT_NOTIFICATION_LEASE_SECONDS', default=120, cast=int)
+ALERT_NOTIFICATION_RETRY_SECONDS = config('ALERT_NOTIFICATION_RETRY_SECONDS', default=30, cast=int)
+ALERT_NOTIFICATION_MAX_ATTEMPTS = config('ALERT_NOTIFICATION_MAX_ATTEMPTS', default=5, cast=int)
+# Webhook delivery: worker threads, in-flight requests per destination host, request timeout in seconds
+ALERT_WEBHOOK_CONCURRENCY = config('ALERT_WEBHOOK_CONCURRENCY', default=32, cast=int)
+ALERT_WEBHOOK_PER_HOST_CONCURRENCY = config('ALERT_WEBHOOK_PER_HOST_CONCURRENCY', default=8, cast=int)
+ALERT_WEBHOOK_TIMEOUT = config('ALERT_WEBHOOK_TIMEOUT', default=10, cast=float)
+# Webhooks must use https and resolve to public addresses; relax only for local development
+ALERT_WEBHOOK_REQUIRE_HTTPS = config('ALERT_WEBHOOK_REQUIRE_HTTPS', default=True, cast=bool)
+ALERT_WEBHOOK_ALLOW_PRIVATE = config('ALERT_WEBHOOK_ALLOW_PRIVATE', default=False, cast=bool)
+# When enabled, `manage.py run_alert_engine` evaluates alerts and the periodic task is skipped
+ALERT_ENGINE_ENABLED = config('ALERT_ENGINE_ENABLED', default=False, cast=bool)
+ALERT_ENGINE_QUEUE = config('ALERT_ENGINE_QUEUE', default='alerts:engine-events')
+# Consumers lagging further behind than this must reload from the Alert table
+ALERT_CHANGEFEED_RETENTION_DAYS = config('ALERT_CHANGEFEED_RETENTION_DAYS', default=7, cast=int)
+# Change feed gaps: how long consumers wait in order for a missing id, then how long
+# they keep rechecking it after moving past; a transaction committing later is lost
+ALERT_CHANGEFEED_GAP_SECONDS = config('ALERT_CHANGEFEED_GAP_SECONDS', default=1.0, cast=float)
+ALERT_CHANGEFEED_LATE_SECONDS = config('ALERT_CHANGEFEED_LATE_SECONDS', default=3600, cast=float)
+
+# Most alerts one bulk create or CSV import request may carry
+ALERT_BULK_MAX_ROWS = config('ALERT_BULK_MAX_ROWS', default=500, cast=int)
+
+# Server-Sent Events push stream (/api/stream/), served from the ASGI application
+PUSH_STREAM_ENABLED = config('PUSH_STREAM_ENABLED', default=False, cast=bool)
+PUSH_STREAM_HEARTBEAT = config('PUSH_STREAM_HEARTBEAT', default=15, cast=float)
+PUSH_STREAM_MAX_AGE = config('PUSH_STREAM_MAX_AGE', default=600, cast=float)
+PUSH_STREAM_RETRY_MS = config('PUSH_STREAM_RETRY_MS', default=3000, cast=int)
+PUSH_STREAM_QUEUE_SIZE = config('PUSH_STREAM_QUEUE_SIZE', default=100, cast=int)
+PUSH_STREAM_MAX_SYMBOLS = config('PUSH_STREAM_MAX_SYMBOLS', default=200, cast=int)
+
 # Stock API Configuration
 TWELVE_DATA_API_KEY = config('TWELVE_DATA_API_KEY', default='')
 
@@ -236,6 +285,37 @@ CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/
 # CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = 'django-db'
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+# Shared cache for snapshots such as the market board; per-process memory when unset
+CACHE_URL = config('CACHE_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Market board (current_prices) snapshot lifetime; ingestion rebuilds it after every batch
+MARKET_BOARD_TTL = config('MARKET_BOARD_TTL', default=60, cast=int)
+
+# Largest page of price_history rows; larger ranges are followed with ?before=<next>
+PRICE_HISTORY_PAGE_SIZE = config('PRICE_HISTORY_PAGE_SIZE', default=10000, cast=int)
+
+# Most symbols one batch-history request may ask for
+PRICE_BATCH_MAX_SYMBOLS = config('PRICE_BATCH_MAX_SYMBOLS', default=25, cast=int)
+
+# Version-keyed response cache for read endpoints (stocks.cache). Writers in
+# other processes (Celery, the alert engine) bump versions only in a shared
+# cache, so it stays off on per-process memory whatever the setting says
+RESPONSE_CACHE_ENABLED = bool(CACHE_URL) and config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', default=60, cast=int)
+RESPONSE_CACHE_MAX_BYTES = config('RESPONSE_CACHE_MAX_BYTES', default=1048576, cast=int)
+
+# Seconds a process keeps its stock search index before rebuilding it even without a change
+STOCK_SEARCH_MAX_AGE = config('STOCK_SEARCH_MAX_AGE', default=300, cast=int)
+
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
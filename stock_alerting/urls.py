@@ -19,9 +19,20 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from alerts import asyncviews as alert_async
+from stocks import asyncviews as stock_async
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/auth/', include('authentication.urls')),
+
+    # Async read path, served by the ASGI app
+    path('api/async/stocks/', stock_async.stock_list, name='async-stock-list'),
+    path('api/async/stocks/current_prices/', stock_async.current_prices, name='async-current-prices'),
+    path('api/async/stocks/<int:pk>/price_history/', stock_async.price_history, name='async-price-history'),
+    path('api/async/alerts/', alert_async.alert_list, name='async-alert-list'),
+    path('api/async/triggered-alerts/', alert_async.triggered_alert_list, name='async-triggered-alert-list'),
+
     path('api/stocks/', include('stocks.urls')),
     path('api/', include('alerts.urls')),
     
@@ -0,0 +1,65 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from stock_alerting.asyncapi import async_api_view, json_response, negotiated_format, paginate
+
+from .board import BOARD_RENDERERS, aget_market_board, board_content
+from .history import PriceHistoryStream, history_params
+from .models import Stock
+from .serializers import StockSerializer
+
+
+@async_api_view('Failed to fetch stocks')
+async def stock_list(request):
+    """GET /api/stocks/ on the async ORM"""
+    queryset = Stock.objects.filter(is_active=True)
+    symbol = request.GET.get('symbol')
+    if symbol:
+        queryset = queryset.filter(symbol__icontains=symbol)
+
+    page = await paginate(request, queryset.order_by('symbol'), lambda rows: StockSerializer(rows, many=True).data)
+    if page is None:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+    return json_response(page)
+
+
+@async_api_view('Failed to fetch current prices')
+async def current_prices(request):
+    """GET /api/stocks/current_prices/ from the shared market board"""
+    format = negotiated_format(request)
+    try:
+        content = board_content(
+            await aget_market_board(), request.GET.get('since'), request.GET.get('symbol'), format
+        )
+    except ValueError:
+        return json_response({
+            'success': False,
+            'error': 'Since parameter must be a valid version number'
+        }, status=400)
+    return HttpResponse(content, content_type=BOARD_RENDERERS[format].media_type)
+
+
+@async_api_view('Failed to fetch price history')
+async def price_history(request, pk):
+    """GET /api/stocks/{id}/price_history/, streamed from an async cursor"""
+    stock = await Stock.objects.filter(is_active=True, pk=pk).only('id', 'symbol').afirst()
+    if stock is None:
+        return json_response({
+            'success': False,
+            'error': 'Stock not found'
+        }, status=404)
+
+    try:
+        hours, limit, before = history_params(request.GET)
+    except ValueError as e:
+        return json_response({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+    since = timezone.now() - timezone.timedelta(hours=hours)
+    history = PriceHistoryStream(
+        stock, hours, since, before, limit,
+        columnar=request.GET.get('layout') == 'columnar'
+    )
+    return StreamingHttpResponse(history.astream(), content_type='application/json')
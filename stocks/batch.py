@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .history import from_cursor, to_cursor
+from .models import StockPrice
+
+# Bucket widths a batch may ask for, in seconds
+RESOLUTIONS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+
+# Most buckets per series, so a fine resolution needs a short window
+MAX_POINTS = 1440
+
+
+def bucket_range(hours, resolution, now):
+    """(first, count) of the aligned buckets covering the ``hours`` before ``now``.
+
+    ``first`` is the first bucket's index since the epoch. The window's ends
+    rarely fall on bucket boundaries, so it touches one bucket more than
+    ``hours`` divides into.
+    """
+    step = RESOLUTIONS[resolution] * 1_000_000
+    first = to_cursor(now - timedelta(hours=hours)) // step
+    return first, to_cursor(now) // step - first + 1
+
+
+def batch_params(params, now=None):
+    """(symbols, hours, resolution) from query parameters; the ValueError message is the 400 error.
+
+    Symbols come comma-separated, repeated, or both, and are deduplicated
+    in request order. The point limit is checked against the buckets the
+    window ending at ``now`` actually spans.
+    """
+    symbols = list(dict.fromkeys(
+        symbol.strip().upper()
+        for value in params.getlist('symbols')
+        for symbol in value.split(',')
+        if symbol.strip()
+    ))
+    if not symbols:
+        raise ValueError('Symbols parameter is required')
+    max_symbols = settings.PRICE_BATCH_MAX_SYMBOLS
+    if len(symbols) > max_symbols:
+        raise ValueError(f'At most {max_symbols} symbols per request')
+
+    try:
+        hours = int(params.get('hours', '24'))
+    except ValueError:
+        raise ValueError('Hours parameter must be a valid integer')
+    if not 0 < hours <= 720:
+        raise ValueError('Hours parameter must be between 1 and 720 (30 days)')
+
+    resolution = params.get('resolution', '5m')
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Resolution must be one of {', '.join(RESOLUTIONS)}")
+    if bucket_range(hours, resolution, now or timezone.now())[1] > MAX_POINTS:
+        raise ValueError(f'Resolution {resolution} gives more than {MAX_POINTS} points over {hours} hours')
+    return symbols, hours, resolution
+
+
+def batch_history(board, symbols, hours, resolution, now=None):
+    """Aligned price series and current quotes for ``symbols``, in columnar form.
+
+    Stock ids and quotes come from the market board, so the only query is
+    one range scan over every requested stock's prices, in (stock,
+    timestamp) index order. Buckets are aligned to multiples of the
+    resolution since the epoch and run oldest first: bucket ``i`` starts at
+    ``start + i * step`` milliseconds. Each holds the last price in it, or
+    null when the stock had no tick.
+    """
+    rows = {row['symbol']: row for row in board.rows}
+    found = [symbol for symbol in symbols if symbol in rows]
+    step = RESOLUTIONS[resolution] * 1_000_000
+    first, buckets = bucket_range(hours, resolution, now or timezone.now())
+
+    series = {symbol: [None] * buckets for symbol in found}
+    by_id = {rows[symbol]['id']: series[symbol] for symbol in found}
+    if by_id:
+        prices = StockPrice.objects.filter(
+            stock_id__in=by_id, timestamp__gte=from_cursor(first * step)
+        ).order_by('stock_id', 'timestamp').values_list('stock_id', 'timestamp', 'price')
+        for stock_id, timestamp, price in prices.iterator(chunk_size=2000):
+            bucket = to_cursor(timestamp) // step - first
+            if bucket < buckets:
+                by_id[stock_id][bucket] = float(price)
+
+    return {
+        'success': True,
+        'hours': hours,
+        'resolution': resolution,
+        'start': first * step // 1000,
+        'step': step // 1000,
+        'count': buckets,
+        'symbols': found,
+        'missing': [symbol for symbol in symbols if symbol not in rows],
+        'quotes': {
+            symbol: {
+                'current_price': rows[symbol]['current_price'],
+                'last_updated': rows[symbol]['last_updated'],
+                'version': rows[symbol]['version'],
+            }
+            for symbol in found
+        },
+        'data': series,
+    }
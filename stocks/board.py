@@ -0,0 +1,121 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from stock_alerting.renderers import MessagePackRenderer, ORJSONRenderer
+from .models import Stock
+
+logger = logging.getLogger(__name__)
+
+BOARD_CACHE_KEY = 'stocks:market-board:document'
+
+# Formats the board encodes itself; others (the browsable API) get the document
+BOARD_RENDERERS = {renderer.format: renderer for renderer in (ORJSONRenderer(), MessagePackRenderer())}
+
+
+def row_version(last_updated, updated_at):
+    """Microseconds since the epoch of the row's latest price or edit"""
+    changed = max(filter(None, (last_updated, updated_at)))
+    return int(changed.timestamp() * 1_000_000)
+
+
+class MarketBoard:
+    """Current price of every stock, as one snapshot with a version.
+
+    Built with a single query from the prices ingestion keeps on Stock. The
+    version is the newest row version, so every process builds the same
+    version from the same data and clients can ask for the rows changed
+    since the version they hold. The full response is encoded once per
+    format in ``BOARD_RENDERERS``.
+    """
+
+    def __init__(self, version, rows, removed):
+        self.version = version
+        self.rows = rows
+        self.removed = removed
+        self.document = self.render(rows)
+        self.content = {format: renderer.render(self.document) for format, renderer in BOARD_RENDERERS.items()}
+
+    @classmethod
+    def build(cls):
+        rows = []
+        removed = []
+        version = 0
+        for stock in Stock.objects.values(
+            'id', 'symbol', 'name', 'current_price', 'last_updated', 'updated_at', 'is_active'
+        ).order_by('symbol'):
+            stock_version = row_version(stock['last_updated'], stock['updated_at'])
+            version = max(version, stock_version)
+            if not stock['is_active']:
+                removed.append((stock_version, stock['symbol']))
+                continue
+            rows.append({
+                'id': stock['id'],
+                'symbol': stock['symbol'],
+                'name': stock['name'],
+                'current_price': float(stock['current_price']) if stock['current_price'] is not None else None,
+                'last_updated': stock['last_updated'],
+                'version': stock_version,
+            })
+        return cls(version, rows, removed)
+
+    def render(self, rows, **extra):
+        return {
+            'success': True,
+            'version': self.version,
+            **extra,
+            'count': len(rows),
+            'data': rows,
+        }
+
+    def changes(self, since):
+        """Rows changed after ``since`` and symbols deactivated since then"""
+        rows = [row for row in self.rows if row['version'] > since]
+        removed = [symbol for version, symbol in self.removed if version > since]
+        return self.render(rows, since=since, removed=removed)
+
+    def matching(self, symbol):
+        """Rows whose symbol contains ``symbol``, like the list filter"""
+        symbol = symbol.upper()
+        return self.render([row for row in self.rows if symbol in row['symbol'].upper()])
+
+
+def rebuild_market_board():
+    """Rebuild the snapshot and store it in the shared cache"""
+    board = MarketBoard.build()
+    cache.set(BOARD_CACHE_KEY, board, settings.MARKET_BOARD_TTL)
+    logger.info(f"Rebuilt market board version {board.version} with {len(board.rows)} stocks")
+    return board
+
+
+def get_market_board():
+    """The cached snapshot, rebuilt on a miss"""
+    board = cache.get(BOARD_CACHE_KEY)
+    if board is None:
+        board = rebuild_market_board()
+    return board
+
+
+async def aget_market_board():
+    board = await cache.aget(BOARD_CACHE_KEY)
+    if board is None:
+        board = await sync_to_async(rebuild_market_board)()
+    return board
+
+
+def board_document(board, since=None, symbol=None):
+    """Response data for ``?since=`` or ``?symbol=``; raises ValueError for a bad version"""
+    if since is not None:
+        return board.changes(int(since))
+    if symbol:
+        return board.matching(symbol)
+    return board.document
+
+
+def board_content(board, since=None, symbol=None, format='json'):
+    """board_document() encoded in ``format``, a key of BOARD_RENDERERS"""
+    if since is None and not symbol:
+        return board.content[format]
+    return BOARD_RENDERERS[format].render(board_document(board, since, symbol))
@@ -0,0 +1,143 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+VERSION_KEY = 'response-cache:version:{}'
+COUNTER_KEY = 'response-cache:{}:{}'
+ENTRY_KEY = 'response-cache:response:{}'
+STOCKS_SCOPE = 'stocks'
+
+# Names of every cached endpoint, for the counters
+ENDPOINTS = []
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def data_version(scope):
+    """Current version of a scope's data, part of every cached response key"""
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version lost to eviction never repeats an old one
+        cache.add(key, time.time_ns() // 1000, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    """Move scopes to a new version once the current transaction commits.
+
+    Bumping after commit means a reader that sees the new version also sees
+    the new rows, so a response computed from old rows is never stored
+    under the new version.
+    """
+    def bump():
+        for scope in scopes:
+            key = VERSION_KEY.format(scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns() // 1000, None)
+    transaction.on_commit(bump)
+
+
+def count(name, outcome):
+    key = COUNTER_KEY.format(outcome, name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def counters(names):
+    """{name: (hits, misses)} for the given cached endpoints"""
+    values = cache.get_many([COUNTER_KEY.format(outcome, name) for name in names for outcome in ('hit', 'miss')])
+    return {
+        name: (values.get(COUNTER_KEY.format('hit', name), 0), values.get(COUNTER_KEY.format('miss', name), 0))
+        for name in names
+    }
+
+
+def cache_key(request, name, version, user_id):
+    query = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.lists()))
+    raw = f'{name}|{request.path}|{query}|{request.accepted_media_type}|{version}|{user_id}'
+    return ENTRY_KEY.format(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def cached_response(name, per_user=False, skip_params=()):
+    """Serve a viewset action's 200 responses from the cache, keyed on its data version.
+
+    The key covers the path, query parameters, negotiated media type and the
+    current version of the shared stocks data, or of the requesting user's
+    own data when ``per_user`` is set. Writers bump the version after commit instead of
+    deleting entries, so there is nothing to invalidate; old entries expire
+    after RESPONSE_CACHE_TTL, which also bounds drift of "last N hours"
+    windows. Requests with any of ``skip_params`` are not cached. Streamed
+    responses are stored only when they fit in RESPONSE_CACHE_MAX_BYTES.
+
+    Under ``conditional`` each entry also keeps the ETag it was served
+    with. The validator reads the database while the key only follows the
+    version, so an entry whose ETag no longer matches is a miss: a body is
+    never sent, or confirmed with a 304, under an ETag it does not match.
+    """
+    ENDPOINTS.append(name)
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE_ENABLED or any(param in request.query_params for param in skip_params):
+                return view_method(self, request, *args, **kwargs)
+
+            user_id = request.user.id if per_user else None
+            version = data_version(user_scope(user_id) if per_user else STOCKS_SCOPE)
+            key = cache_key(request, name, version, user_id)
+
+            etag = getattr(request, '_etag', None)
+            entry = cache.get(key)
+            if entry is not None and entry[2] == etag:
+                count(name, 'hit')
+                content_type, content, _ = entry
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            count(name, 'miss')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if response.streaming:
+                response.streaming_content = store_stream(
+                    key, response['Content-Type'], response.streaming_content, etag
+                )
+            else:
+                response = self.finalize_response(request, response, *args, **kwargs)
+                response.render()
+                cache.set(key, (response['Content-Type'], response.content, etag), settings.RESPONSE_CACHE_TTL)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def store_stream(key, content_type, stream, etag):
+    """Pass a streamed body through, caching it at the end if it stayed small"""
+    parts = []
+    size = 0
+    for part in stream:
+        yield part
+        if parts is not None:
+            size += len(part)
+            if size > settings.RESPONSE_CACHE_MAX_BYTES:
+                parts = None
+            else:
+                parts.append(part)
+    if parts is not None:
+        cache.set(key, (content_type, b''.join(parts), etag), settings.RESPONSE_CACHE_TTL)
@@ -0,0 +1,53 @@
+import hashlib
+import time
+
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .board import get_market_board
+from .models import Stock
+
+# Windowed responses ("last N hours") also change as rows age out, so their
+# validators roll over with this many seconds of wall clock
+WINDOW_SECONDS = 60
+
+
+def conditional(validator, windowed=False):
+    """Answer GET with 304 when the client's ETag still matches.
+
+    ``validator(request, *args, **kwargs)`` runs one cheap aggregate and
+    returns the state. The ETag hashes that state with the path, query
+    parameters and negotiated media type, and the check runs before the
+    action, so a matching request skips its queries and serialization
+    entirely. ``windowed`` (True, or a query parameter name) marks responses
+    that also age with the clock. No Last-Modified is sent: a date with
+    one-second resolution misses deletes and same-second writes that the
+    state catches, so If-Modified-Since alone could get a stale 304.
+    """
+    def etag(request, *args, **kwargs):
+        if not hasattr(request, '_etag'):
+            state = validator(request, *args, **kwargs)
+            if windowed is True or (windowed and windowed in request.query_params):
+                state = (state, int(time.time() // WINDOW_SECONDS))
+            query = sorted(request.query_params.lists())
+            raw = f'{request.path}|{query}|{request.accepted_media_type}|{state}'
+            request._etag = f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
+        return request._etag
+
+    return method_decorator(condition(etag_func=etag))
+
+
+def stocks_state(request, *args, **kwargs):
+    state = Stock.objects.aggregate(
+        count=Count('id'), last_updated=Max('last_updated'), updated_at=Max('updated_at')
+    )
+    return tuple(state.values())
+
+
+def stock_state(request, *args, pk=None, **kwargs):
+    return Stock.objects.filter(pk=pk).values_list('last_updated', 'updated_at').first()
+
+
+def board_state(request, *args, **kwargs):
+    return get_market_board().version
@@ -0,0 +1,225 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from stock_alerting.renderers import dumps
+
+from .models import StockPrice
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+ROW_FIELDS = (
+    'id', 'price', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'timestamp', 'created_at'
+)
+CHUNK_ROWS = 500
+
+
+def to_cursor(timestamp):
+    """Keyset cursor for a row: its timestamp in integer microseconds since the epoch"""
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def from_cursor(cursor):
+    return EPOCH + timedelta(microseconds=int(cursor))
+
+
+def iso(value):
+    # Same representation as DRF's DateTimeField
+    value = value.astimezone(dt_timezone.utc).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def decimal_text(value):
+    return None if value is None else str(value)
+
+
+def decimal_number(value):
+    return 'null' if value is None else str(value)
+
+
+def history_params(params):
+    """(hours, limit, before) from query parameters; the ValueError message is the 400 error"""
+    try:
+        hours = int(params.get('hours', '24'))
+    except ValueError:
+        raise ValueError('Hours parameter must be a valid integer')
+    if hours <= 0:
+        raise ValueError('Hours parameter must be greater than 0')
+    if hours > 720:  # 30 days * 24 hours
+        raise ValueError('Hours parameter cannot exceed 720 (30 days)')
+
+    page_size = settings.PRICE_HISTORY_PAGE_SIZE
+    try:
+        limit = int(params.get('limit', page_size))
+        before = params.get('before')
+        before = from_cursor(before) if before else None
+    except (ValueError, OverflowError):
+        raise ValueError('Limit and before parameters must be valid integers')
+    if not 0 < limit <= page_size:
+        raise ValueError(f'Limit parameter must be between 1 and {page_size}')
+    return hours, limit, before
+
+
+def price_rows(stock, since, before=None, limit=None):
+    """Newest-first rows of ``stock`` after ``since`` and strictly before ``before``"""
+    queryset = StockPrice.objects.filter(stock=stock, timestamp__gte=since)
+    if before is not None:
+        queryset = queryset.filter(timestamp__lt=before)
+    queryset = queryset.order_by('-timestamp').values_list(*ROW_FIELDS)
+    if limit is not None:
+        queryset = queryset[:limit]
+    return queryset
+
+
+class PriceHistoryStream:
+    """Streams one page of price history as JSON.
+
+    Rows are read through a database cursor and written in chunks, so the
+    default format never holds the page in memory. The page
+    is keyset-paginated on timestamp: one extra row is read to know whether
+    there is a next page, and ``next`` is the cursor to pass as ``before``.
+    The columnar format sends the symbol once and parallel arrays of epoch
+    milliseconds, prices and volumes, about a tenth of the bytes.
+    """
+
+    def __init__(self, stock, hours, since, before=None, limit=None, columnar=False):
+        self.stock = stock
+        self.hours = hours
+        self.since = since
+        self.before = before
+        self.limit = limit
+        self.columnar = columnar
+
+    def meta(self):
+        return {
+            'success': True,
+            'symbol': self.stock.symbol,
+            'period': f'{self.hours} hours',
+            'layout': 'columnar' if self.columnar else 'rows',
+        }
+
+    def header(self):
+        return json.dumps(self.meta())[:-1]
+
+    def fields(self, values):
+        id, price, open_price, high_price, low_price, close_price, volume, timestamp, created_at = values
+        return {
+            'id': id,
+            'stock': self.stock.id,
+            'stock_symbol': self.stock.symbol,
+            'price': decimal_text(price),
+            'open_price': decimal_text(open_price),
+            'high_price': decimal_text(high_price),
+            'low_price': decimal_text(low_price),
+            'close_price': decimal_text(close_price),
+            'volume': volume,
+            'timestamp': iso(timestamp),
+            'created_at': iso(created_at),
+        }
+
+    def row(self, values):
+        return dumps(self.fields(values)).decode()
+
+    def start(self):
+        self.count = 0
+        self.next = None
+        return []
+
+    def accept(self, values, chunk):
+        """Add a row to ``chunk``; False for the extra row that shows there is a next page"""
+        if self.limit is not None and self.count == self.limit:
+            self.next = to_cursor(self.last_timestamp)
+            return False
+        chunk.append(values)
+        self.count += 1
+        self.last_timestamp = values[7]
+        return True
+
+    def rows(self):
+        limit = self.limit + 1 if self.limit is not None else None
+        return price_rows(self.stock, self.since, self.before, limit)
+
+    def pages(self):
+        """Yield lists of at most CHUNK_ROWS rows, recording ``count`` and the ``next`` cursor"""
+        chunk = self.start()
+        for values in self.rows().iterator(chunk_size=2000):
+            if not self.accept(values, chunk):
+                break
+            if len(chunk) == CHUNK_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def apages(self):
+        """pages(), each chunk read on the database thread.
+
+        Not QuerySet.aiterator(): on Django 4.2 it runs a values_list query
+        on the event loop.
+        """
+        pages = self.pages()
+        next_page = sync_to_async(lambda: next(pages, None))
+        while (chunk := await next_page()) is not None:
+            yield chunk
+
+    def footer(self):
+        return f', "count": {self.count}, "next": {json.dumps(self.next)}}}'
+
+    def __iter__(self):
+        yield self.header()
+        if self.columnar:
+            yield from self.columns(self.pages())
+        else:
+            yield ', "data": ['
+            separator = ''
+            for chunk in self.pages():
+                yield separator + ', '.join(self.row(values) for values in chunk)
+                separator = ', '
+            yield ']'
+        yield self.footer()
+
+    async def astream(self):
+        """The same body for async views; a suspended query holds no worker thread"""
+        yield self.header()
+        if self.columnar:
+            for text in self.columns([chunk async for chunk in self.apages()]):
+                yield text
+        else:
+            yield ', "data": ['
+            separator = ''
+            async for chunk in self.apages():
+                yield separator + ', '.join(self.row(values) for values in chunk)
+                separator = ', '
+            yield ']'
+        yield self.footer()
+
+    def document(self):
+        """The whole page as one dict, for renderers that cannot stream (MessagePack)"""
+        rows = [values for chunk in self.pages() for values in chunk]
+        if self.columnar:
+            data = {
+                'timestamp': [to_cursor(values[7]) // 1000 for values in rows],
+                'price': [values[1] for values in rows],
+                'volume': [values[6] for values in rows],
+            }
+        else:
+            data = [self.fields(values) for values in rows]
+        return {
+            **self.meta(),
+            'data': data,
+            'count': self.count,
+            'next': self.next,
+        }
+
+    def columns(self, chunks):
+        # Parallel arrays need every timestamp before the first price, so the
+        # page is held as compact text; the page size bounds it
+        timestamps, prices, volumes = [], [], []
+        for chunk in chunks:
+            for values in chunk:
+                timestamps.append(to_cursor(values[7]) // 1000)
+                prices.append(decimal_number(values[1]))
+                volumes.append('null' if values[6] is None else str(values[6]))
+        yield ', "data": {"timestamp": [' + ','.join(map(str, timestamps)) + ']'
+        yield ', "price": [' + ','.join(prices) + ']'
+        yield ', "volume": [' + ','.join(volumes) + ']}'
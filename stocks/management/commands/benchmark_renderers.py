@@ -0,0 +1,74 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from alerts.serializers import TriggeredAlertSerializer
+from stock_alerting.renderers import MessagePackRenderer, ORJSONRenderer
+from stocks.history import PriceHistoryStream
+from stocks.models import Stock
+
+
+class Command(BaseCommand):
+    help = "Benchmark response rendering of price_history and triggered alert payloads on synthetic data"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = options['rows']
+        now = timezone.now()
+
+        history = PriceHistoryStream(Stock(id=1, symbol='AAPL'), 24, now)
+        prices = []
+        for i in range(rows):
+            price = Decimal(rng.randint(9000, 11000)) / 100
+            timestamp = now - timezone.timedelta(seconds=i * 5)
+            prices.append(history.fields(
+                (i, price, price, price, price, price, rng.randint(0, 10 ** 6), timestamp, timestamp)
+            ))
+
+        triggered = TriggeredAlertSerializer([
+            {
+                'id': i,
+                'alert_id': i,
+                'stock_symbol': 'AAPL',
+                'stock_name': 'Apple Inc.',
+                'alert_type': 'threshold',
+                'condition': 'above',
+                'threshold_price': Decimal('150.00'),
+                'trigger_price': Decimal(rng.randint(15000, 16000)) / 100,
+                'triggered_at': now - timezone.timedelta(minutes=i),
+                'email_sent': True,
+                'email_sent_at': now,
+                'notification_error': '',
+            }
+            for i in range(rows)
+        ], many=True).data
+
+        payloads = {
+            'price_history': {'success': True, 'symbol': 'AAPL', 'data': prices},
+            'triggered_alerts': {'success': True, 'data': triggered},
+        }
+        renderers = [JSONRenderer(), ORJSONRenderer(), MessagePackRenderer()]
+
+        self.stdout.write(f"{rows} rows per payload, best of {options['repeat']}")
+        for name, payload in payloads.items():
+            baseline = None
+            for renderer in renderers:
+                best = float('inf')
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    content = renderer.render(payload, renderer.media_type, {})
+                    best = min(best, time.perf_counter() - started)
+                baseline = baseline or best
+                self.stdout.write(
+                    f"{name:<17} {type(renderer).__name__:<20} {best * 1000:>8.2f} ms "
+                    f"{len(content):>10,} bytes  {baseline / best:5.2f}x"
+                )
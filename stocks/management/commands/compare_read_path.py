@@ -0,0 +1,76 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from stocks.models import Stock
+
+ENDPOINTS = {
+    'stocks': 'stocks/',
+    'current_prices': 'stocks/current_prices/',
+    'price_history': 'stocks/{stock_id}/price_history/?hours=24',
+    'alerts': 'alerts/',
+    'triggered_alerts': 'triggered-alerts/',
+}
+
+
+class Command(BaseCommand):
+    help = "Load the WSGI and ASGI read endpoints concurrently and compare throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', default='http://127.0.0.1:8000/api/')
+        parser.add_argument('--asgi', default='http://127.0.0.1:8001/api/async/')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--endpoint', choices=list(ENDPOINTS), action='append')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user {options['username']}")
+        stock = Stock.objects.filter(is_active=True).order_by('id').first()
+        if stock is None:
+            raise CommandError("No active stocks")
+
+        session = requests.Session()
+        session.headers['Authorization'] = f'Bearer {AccessToken.for_user(user)}'
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=options['concurrency'])
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        self.stdout.write(
+            f"{options['requests']} requests per endpoint, {options['concurrency']} concurrent"
+        )
+        for name in options['endpoint'] or ENDPOINTS:
+            path = ENDPOINTS[name].format(stock_id=stock.id)
+            for server in ('wsgi', 'asgi'):
+                self.report(name, server, self.load(session, options[server] + path, options))
+
+    def load(self, session, url, options):
+        def fetch(_):
+            started = time.perf_counter()
+            response = session.get(url)
+            response.content
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        return time.perf_counter() - started, results
+
+    def report(self, name, server, run):
+        elapsed, results = run
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f"{name:<17} {server}  {len(results) / elapsed:>8.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:>8.1f} ms  p95 {p95 * 1000:>8.1f} ms  "
+            f"{errors} errors"
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+# Import the views so every cached endpoint has registered its name
+import alerts.views  # noqa: F401
+import stocks.views  # noqa: F401
+from stocks.cache import ENDPOINTS, counters
+
+
+class Command(BaseCommand):
+    help = "Show response cache hits and misses per endpoint"
+
+    def handle(self, *args, **options):
+        for name, (hits, misses) in counters(ENDPOINTS).items():
+            total = hits + misses
+            ratio = hits / total if total else 0
+            self.stdout.write(f"{name:<20} {hits:>10} hits {misses:>10} misses  {ratio:6.1%}")
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:29
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_change_24h(apps, schema_editor):
+    Stock = apps.get_model('stocks', 'Stock')
+    StockPrice = apps.get_model('stocks', 'StockPrice')
+    since = timezone.now() - timezone.timedelta(hours=24)
+    for stock in Stock.objects.exclude(current_price=None):
+        history = StockPrice.objects.filter(stock=stock).values_list('price', flat=True)
+        reference = (
+            history.filter(timestamp__lte=since).order_by('-timestamp').first()
+            or history.filter(timestamp__gt=since).order_by('timestamp').first()
+        )
+        if reference is None:
+            continue
+        stock.reference_price_24h = reference
+        stock.change_24h = stock.current_price - reference
+        if reference:
+            stock.change_percent_24h = (stock.change_24h / reference * 100).quantize(Decimal('0.0001'))
+        stock.save(update_fields=['reference_price_24h', 'change_24h', 'change_percent_24h'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0003_remove_api_request_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='change_24h',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='change_percent_24h',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='reference_price_24h',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_change_24h, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from django.db import models
 from django.utils import timezone
 
@@ -8,6 +9,10 @@ class Stock(models.Model):
     exchange = models.CharField(max_length=50, blank=True)
     current_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     last_updated = models.DateTimeField(null=True, blank=True)
+    # Maintained at ingest so listings need no price queries
+    reference_price_24h = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    change_24h = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    change_percent_24h = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -18,6 +23,25 @@ class Stock(models.Model):
     def __str__(self):
         return f"{self.symbol} - {self.name}"
 
+    def refresh_change_24h(self, now):
+        """Set the 24h reference price and change from stored history (does not save).
+
+        The reference is the last price at or before 24 hours ago, or the
+        oldest price after it when history is shorter than that.
+        """
+        since = now - timezone.timedelta(hours=24)
+        history = StockPrice.objects.filter(stock=self, timestamp__lte=now).values_list('price', flat=True)
+        reference = (
+            history.filter(timestamp__lte=since).order_by('-timestamp').first()
+            or history.filter(timestamp__gt=since).order_by('timestamp').first()
+        )
+        self.reference_price_24h = reference
+        if reference is None or self.current_price is None:
+            self.change_24h = self.change_percent_24h = None
+            return
+        self.change_24h = self.current_price - reference
+        self.change_percent_24h = (self.change_24h / reference * 100).quantize(Decimal('0.0001')) if reference else None
+
 
 class StockPrice(models.Model):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='prices')
@@ -0,0 +1,166 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from .cache import data_version
+from .models import Stock
+
+SEARCH_SCOPE = 'stock-search'
+
+# Stock fields whose change rebuilds the index; price updates never do
+INDEXED_FIELDS = frozenset({'symbol', 'name', 'exchange', 'is_active'})
+
+# Matches kept per trie node, the most a search can return
+NODE_RESULTS = 50
+TRIE_DEPTH = 4
+
+WORD = re.compile(r'\w+')
+
+MATCHES = ['exact', 'symbol_prefix', 'name_prefix', 'symbol_contains', 'name_contains']
+
+
+def postings():
+    return array('I')
+
+
+def grams(text, sizes):
+    return {text[i:i + n] for n in sizes for i in range(len(text) - n + 1)}
+
+
+class PrefixIndex:
+    """Ranked prefix lookups over keys inserted in rank order.
+
+    Short prefixes match many keys, so the first TRIE_DEPTH levels are a
+    trie, flattened into a dict of prefix -> node, whose nodes keep their
+    first NODE_RESULTS positions ready ranked. Longer prefixes match few
+    keys and are answered from the sorted keys: bisect to the first one and
+    collect the run.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.keys = []
+
+    def insert(self, key, position):
+        for depth in range(1, min(len(key), TRIE_DEPTH) + 1):
+            matches = self.nodes.setdefault(key[:depth], [])
+            if len(matches) < NODE_RESULTS and (not matches or matches[-1] != position):
+                matches.append(position)
+        self.keys.append((key, position))
+
+    def finish(self):
+        self.keys.sort()
+
+    def lookup(self, prefix):
+        if len(prefix) <= TRIE_DEPTH:
+            return self.nodes.get(prefix, [])
+        positions = set()
+        index = bisect_left(self.keys, (prefix,))
+        while index < len(self.keys) and self.keys[index][0].startswith(prefix):
+            positions.add(self.keys[index][1])
+            index += 1
+        return sorted(positions)[:NODE_RESULTS]
+
+
+class SymbolIndex:
+    """Search index over active stocks' symbols and company names.
+
+    Stocks are ranked shortest symbol first, then alphabetically. Symbol
+    prefixes and prefixes of every word start in the name (so "appl" and
+    "apple i" alike) come from PrefixIndex. Substrings come from n-gram postings
+    (1- to 3-grams of symbols, 3-grams of names): the rarest gram of the
+    query gives the candidates, which are then checked. Results are tiered
+    by MATCHES and ranked within each tier.
+    """
+
+    def __init__(self, stocks, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.stocks = sorted(stocks, key=lambda stock: (len(stock['symbol']), stock['symbol']))
+        self.symbols = {}
+        self.symbol_prefixes = PrefixIndex()
+        self.name_prefixes = PrefixIndex()
+        self.symbol_grams = defaultdict(postings)
+        self.name_grams = defaultdict(postings)
+        for position, stock in enumerate(self.stocks):
+            symbol = stock['_symbol'] = stock['symbol'].lower()
+            name = stock['_name'] = stock['name'].lower()
+            self.symbols[symbol] = position
+            self.symbol_prefixes.insert(symbol, position)
+            for word in WORD.finditer(name):
+                self.name_prefixes.insert(name[word.start():], position)
+            for gram in grams(symbol, (1, 2, 3)):
+                self.symbol_grams[gram].append(position)
+            for gram in grams(name, (3,)):
+                self.name_grams[gram].append(position)
+        self.symbol_prefixes.finish()
+        self.name_prefixes.finish()
+
+    @classmethod
+    def build(cls, version=None):
+        stocks = list(Stock.objects.filter(is_active=True).values('id', 'symbol', 'name', 'exchange'))
+        return cls(stocks, version)
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def containing(self, text, postings, field, gram_size):
+        """Positions whose ``field`` contains ``text``, in rank order"""
+        if len(text) <= gram_size:
+            return postings.get(text, ())
+        candidates = min((postings.get(gram, ()) for gram in grams(text, (gram_size,))), key=len)
+        return (position for position in candidates if text in self.stocks[position][field])
+
+    def search(self, query, limit=10):
+        """Up to ``limit`` (stock, match) pairs for ``query``, best first"""
+        text = query.strip().lower()
+        if not text:
+            return []
+        limit = min(limit, NODE_RESULTS)
+        found = {}
+
+        def take(match, positions):
+            for position in positions:
+                if len(found) >= limit:
+                    return
+                found.setdefault(position, match)
+
+        exact = self.symbols.get(text)
+        take('exact', [] if exact is None else [exact])
+        take('symbol_prefix', self.symbol_prefixes.lookup(text))
+        take('name_prefix', self.name_prefixes.lookup(text))
+        take('symbol_contains', self.containing(text, self.symbol_grams, '_symbol', 3))
+        take('name_contains', self.containing(text, self.name_grams, '_name', 3))
+        return [(self.stocks[position], match) for position, match in found.items()]
+
+
+_index = None
+_rebuilding = threading.Lock()
+
+
+def get_search_index():
+    """This process's index, rebuilt when stocks were added, renamed or (de)activated.
+
+    Writers bump SEARCH_SCOPE after commit; STOCK_SEARCH_MAX_AGE bounds how
+    long a change made without a model save (queryset updates) goes unseen.
+    One thread rebuilds while the others keep searching the previous index.
+    """
+    global _index
+    version = data_version(SEARCH_SCOPE)
+    index = _index
+    if index is not None and index.version == version and (
+        time.monotonic() - index.built_at <= settings.STOCK_SEARCH_MAX_AGE
+    ):
+        return index
+    if not _rebuilding.acquire(blocking=index is None):
+        return index
+    try:
+        index = _index = SymbolIndex.build(version)
+    finally:
+        _rebuilding.release()
+    return index
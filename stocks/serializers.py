@@ -13,20 +13,17 @@ class StockSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_latest_price(self, obj):
-        latest_price = obj.prices.first()
-        return float(latest_price.price) if latest_price else None
+        return float(obj.current_price) if obj.current_price is not None else None
     
     def get_price_change_24h(self, obj):
-        latest_prices = obj.prices.all()[:2]
-        if len(latest_prices) >= 2:
-            current = latest_prices[0].price
-            previous = latest_prices[1].price
-            change = current - previous
-            return {
-                'amount': float(change),
-                'percentage': float((change / previous) * 100) if previous else 0
-            }
-        return None
+        # Computed at ingest (Stock.refresh_change_24h), so no per-stock queries here
+        if obj.change_24h is None:
+            return None
+        return {
+            'amount': float(obj.change_24h),
+            'percentage': float(obj.change_percent_24h) if obj.change_percent_24h is not None else 0,
+            'reference_price': float(obj.reference_price_24h),
+        }
 
 
 class StockPriceSerializer(serializers.ModelSerializer):
@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.db import transaction
 import pytz
 from .models import Stock, StockPrice
+from .signals import price_updated
 
 logger = logging.getLogger(__name__)
 
@@ -80,7 +81,18 @@ class StockDataService:
 
                 stock.current_price = quote_data['price']
                 stock.last_updated = now
-                stock.save(update_fields=["current_price", "last_updated"])
+                stock.refresh_change_24h(now)
+                stock.save(update_fields=[
+                    "current_price", "last_updated", "reference_price_24h", "change_24h", "change_percent_24h"
+                ])
+
+            price_updated.send(
+                sender=Stock,
+                stock=stock,
+                price=quote_data['price'],
+                volume=quote_data.get('volume'),
+                timestamp=now
+            )
 
             logger.info(f"Updated {symbol}: ${quote_data['price']}")
             return True
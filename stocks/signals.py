@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .cache import STOCKS_SCOPE, bump_version
+from .models import Stock
+from .search import INDEXED_FIELDS, SEARCH_SCOPE
+
+# Sent after a new quote has been stored for a stock.
+# Arguments: stock, price, volume, timestamp
+price_updated = Signal()
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def bump_stocks_version(sender, **kwargs):
+    # Ingestion saves the stock after each new price, in the same transaction
+    bump_version(STOCKS_SCOPE)
+
+
+@receiver(post_save, sender=Stock)
+def bump_search_version(sender, update_fields=None, **kwargs):
+    # Price ingestion saves with update_fields and leaves the index alone
+    if update_fields is None or INDEXED_FIELDS & set(update_fields):
+        bump_version(SEARCH_SCOPE)
+
+
+@receiver(post_delete, sender=Stock)
+def bump_search_version_on_delete(sender, **kwargs):
+    bump_version(SEARCH_SCOPE)
@@ -4,6 +4,7 @@ from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 from .models import Stock, StockPrice
+from .board import rebuild_market_board
 from .services import StockDataService
 
 logger = logging.getLogger(__name__)
@@ -48,6 +49,10 @@ def fetch_all_stock_prices():
             logger.error(f" Exception processing {stock.symbol}: {e}")
             continue
     
+    if success_count:
+        # One snapshot per batch instead of per request
+        rebuild_market_board()
+    
     total_processed = success_count + error_count
     logger.info(f"Completed: {success_count} successful, {error_count} errors out of {total_processed}")
     
@@ -1,12 +1,27 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.http import http_date
 from decimal import Decimal
 from unittest.mock import patch, MagicMock
 import requests
+from django.core.cache import cache
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+import msgpack
 
 from stocks.models import Stock, StockPrice
 from stocks.services import StockDataService
+from stocks.board import rebuild_market_board
+from stocks.cache import counters
+from alerts.models import Alert
+from stocks.serializers import StockPriceSerializer
+from stock_alerting.renderers import MessagePackParser, ORJSONRenderer
+import io
+import json
 
 User = get_user_model()
 
@@ -141,3 +156,516 @@ class StockServicesTest(TestCase):
             stock_count = Stock.objects.count()
         
         self.assertGreater(stock_count, 0, "Stocks should be loaded via fixtures or test setup")
+
+
+class CurrentPricesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='viewer', email='viewer@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        self.apple = Stock.objects.create(
+            symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'), last_updated=now
+        )
+        self.tesla = Stock.objects.create(
+            symbol='TSLA', name='Tesla Inc.', current_price=Decimal('250.00'), last_updated=now
+        )
+    
+    def test_served_from_snapshot_without_per_stock_queries(self):
+        for i in range(20):
+            Stock.objects.create(symbol=f'S{i}', name=f'Stock {i}', current_price=Decimal('10.00'))
+        rebuild_market_board()
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/stocks/current_prices/')
+        
+        payload = response.json()
+        self.assertEqual(payload['count'], 22)
+        self.assertEqual(payload['data'][0]['symbol'], 'AAPL')
+        self.assertEqual(payload['data'][0]['current_price'], 150.0)
+    
+    def test_changes_since_version(self):
+        version = self.client.get('/api/stocks/current_prices/').json()['version']
+        
+        payload = self.client.get('/api/stocks/current_prices/', {'since': version}).json()
+        self.assertEqual((payload['count'], payload['version']), (0, version))
+        
+        later = timezone.now() + timezone.timedelta(seconds=1)
+        Stock.objects.filter(id=self.apple.id).update(current_price=Decimal('151.00'), last_updated=later)
+        self.tesla.is_active = False
+        self.tesla.save()
+        rebuild_market_board()
+        
+        payload = self.client.get('/api/stocks/current_prices/', {'since': version}).json()
+        self.assertGreater(payload['version'], version)
+        self.assertEqual([row['symbol'] for row in payload['data']], ['AAPL'])
+        self.assertEqual(payload['data'][0]['current_price'], 151.0)
+        self.assertEqual(payload['removed'], ['TSLA'])
+    
+    def test_invalid_since(self):
+        response = self.client.get('/api/stocks/current_prices/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_negotiates_msgpack(self):
+        expected = self.client.get('/api/stocks/current_prices/').json()
+        
+        for params, headers in (({'format': 'msgpack'}, {}), ({}, {'HTTP_ACCEPT': 'application/msgpack'})):
+            response = self.client.get('/api/stocks/current_prices/', params, **headers)
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(response.content), expected)
+        
+        response = self.client.get('/api/stocks/current_prices/', {'symbol': 'aa', 'format': 'msgpack'})
+        self.assertEqual([row['symbol'] for row in msgpack.unpackb(response.content)['data']], ['AAPL'])
+
+
+class StockChange24hTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='lister', email='lister@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('110.00'))
+        self.now = timezone.now()
+    
+    def test_reference_is_price_24_hours_ago(self):
+        StockPrice.objects.create(stock=self.stock, price=Decimal('90.00'), timestamp=self.now - timezone.timedelta(hours=30))
+        StockPrice.objects.create(stock=self.stock, price=Decimal('100.00'), timestamp=self.now - timezone.timedelta(hours=25))
+        StockPrice.objects.create(stock=self.stock, price=Decimal('108.00'), timestamp=self.now - timezone.timedelta(hours=1))
+        
+        self.stock.refresh_change_24h(self.now)
+        
+        self.assertEqual(self.stock.reference_price_24h, Decimal('100.00'))
+        self.assertEqual(self.stock.change_24h, Decimal('10.00'))
+        self.assertEqual(self.stock.change_percent_24h, Decimal('10.0000'))
+    
+    def test_short_history_uses_oldest_price(self):
+        StockPrice.objects.create(stock=self.stock, price=Decimal('100.00'), timestamp=self.now - timezone.timedelta(hours=3))
+        StockPrice.objects.create(stock=self.stock, price=Decimal('105.00'), timestamp=self.now - timezone.timedelta(hours=1))
+        
+        self.stock.refresh_change_24h(self.now)
+        self.assertEqual(self.stock.reference_price_24h, Decimal('100.00'))
+        
+        self.stock.refresh_change_24h(self.now - timezone.timedelta(hours=5))
+        self.assertIsNone(self.stock.change_24h)
+    
+    def test_list_runs_no_per_stock_queries(self):
+        for i in range(15):
+            stock = Stock.objects.create(symbol=f'S{i}', name=f'Stock {i}', current_price=Decimal('20.00'))
+            StockPrice.objects.create(stock=stock, price=Decimal('16.00'), timestamp=self.now - timezone.timedelta(hours=25))
+            stock.refresh_change_24h(self.now)
+            stock.save()
+        
+        # ETag validator, page count and page rows only
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/stocks/')
+        
+        rows = {row['symbol']: row for row in response.json()['results']}
+        self.assertEqual(rows['S0']['latest_price'], 20.0)
+        self.assertEqual(rows['S0']['price_change_24h'], {'amount': 4.0, 'percentage': 25.0, 'reference_price': 16.0})
+        self.assertIsNone(rows['AAPL']['price_change_24h'])
+
+
+class PriceHistoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='charter', email='charter@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'))
+        now = timezone.now()
+        StockPrice.objects.bulk_create([
+            StockPrice(
+                stock=self.stock, price=Decimal('100.00') + i, high_price=Decimal('101.50') + i,
+                volume=1000 + i, timestamp=now - timezone.timedelta(minutes=i)
+            )
+            for i in range(5)
+        ])
+    
+    def get(self, **params):
+        url = f'/api/stocks/{self.stock.id}/price_history/'
+        with self.assertNumQueries(3):  # the ETag validator, the stock, then one cursor over the page
+            response = self.client.get(url, params)
+            content = b''.join(response.streaming_content)
+        return json.loads(content)
+    
+    def test_rows_match_serializer(self):
+        payload = self.get()
+        
+        expected = StockPriceSerializer(StockPrice.objects.order_by('-timestamp'), many=True).data
+        self.assertEqual(payload['data'], json.loads(json.dumps(expected)))
+        self.assertEqual((payload['count'], payload['next'], payload['symbol']), (5, None, 'AAPL'))
+    
+    def test_keyset_pages(self):
+        first = self.get(limit=2)
+        second = self.get(limit=2, before=first['next'])
+        third = self.get(limit=2, before=second['next'])
+        
+        prices = [row['price'] for page in (first, second, third) for row in page['data']]
+        self.assertEqual(prices, ['100.00', '101.00', '102.00', '103.00', '104.00'])
+        self.assertIsNone(third['next'])
+    
+    def test_columnar_format(self):
+        payload = self.get(layout='columnar', limit=3)
+        
+        self.assertEqual(payload['data']['price'], [100.0, 101.0, 102.0])
+        self.assertEqual(payload['data']['volume'], [1000, 1001, 1002])
+        self.assertEqual(len(payload['data']['timestamp']), 3)
+        self.assertGreater(payload['data']['timestamp'][0], payload['data']['timestamp'][1])
+        self.assertIsNotNone(payload['next'])
+    
+    def test_invalid_limit(self):
+        response = self.client.get(f'/api/stocks/{self.stock.id}/price_history/', {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'))
+        StockPrice.objects.create(stock=self.stock, price=Decimal('150.00'))
+    
+    def test_repeated_reads_hit_until_ingest_bumps_version(self):
+        first = self.client.get('/api/stocks/')
+        with self.assertNumQueries(1):  # the ETag validator only
+            second = self.client.get('/api/stocks/')
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.content, second.content)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.current_price = Decimal('151.00')
+            self.stock.save()
+        
+        third = self.client.get('/api/stocks/')
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.json()['results'][0]['latest_price'], 151.0)
+        self.assertEqual(counters(['stock-list'])['stock-list'], (1, 2))
+    
+    def test_write_without_version_bump_is_not_served_stale(self):
+        first = self.client.get('/api/stocks/')
+        
+        # A write from another process: the row changes but this cache never sees a bump
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal('152.00'), last_updated=timezone.now())
+        
+        second = self.client.get('/api/stocks/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((second.status_code, second['X-Cache']), (200, 'MISS'))
+        self.assertEqual(second.json()['results'][0]['latest_price'], 152.0)
+        self.assertEqual(self.client.get('/api/stocks/', HTTP_IF_NONE_MATCH=second['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/api/stocks/')['X-Cache'], 'HIT')
+    
+    def test_streamed_history_is_cached(self):
+        url = f'/api/stocks/{self.stock.id}/price_history/'
+        first = b''.join(self.client.get(url).streaming_content)
+        
+        with self.assertNumQueries(1):  # the ETag validator only
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.content, first)
+        self.assertEqual(self.client.get(url, {'limit': 1})['X-Cache'], 'MISS')
+    
+    def test_per_user_statistics(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        
+        self.assertEqual(self.client.get('/api/alerts/statistics/')['X-Cache'], 'MISS')
+        self.assertEqual(other_client.get('/api/alerts/statistics/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/alerts/statistics/')['X-Cache'], 'HIT')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Alert.objects.create(
+                user=self.user, stock=self.stock, alert_type='threshold',
+                condition='above', threshold_price=Decimal('160.00')
+            )
+        
+        response = self.client.get('/api/alerts/statistics/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['data']['total_alerts'], 1)
+        self.assertEqual(other_client.get('/api/alerts/statistics/')['X-Cache'], 'HIT')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='poller', email='poller@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stock = Stock.objects.create(
+            symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'), last_updated=timezone.now()
+        )
+    
+    def test_list_not_modified_until_stock_changes(self):
+        response = self.client.get('/api/stocks/')
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        
+        with self.assertNumQueries(1):  # the validator aggregate only
+            response = self.client.get('/api/stocks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/api/stocks/?symbol=AA', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        
+        Stock.objects.filter(id=self.stock.id).update(
+            current_price=Decimal('151.00'), last_updated=timezone.now() + timezone.timedelta(seconds=1)
+        )
+        response = self.client.get('/api/stocks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_if_modified_since_alone_never_answers_304(self):
+        other = Stock.objects.create(symbol='MSFT', name='Microsoft', current_price=Decimal('300.00'))
+        Stock.objects.filter(id=other.id).update(updated_at=timezone.now() - timezone.timedelta(days=1))
+        self.client.get('/api/stocks/')
+        
+        # The newest timestamp is unchanged, but the list lost a row
+        other.delete()
+        response = self.client.get('/api/stocks/', HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+    
+    def test_current_prices_validated_by_board_version(self):
+        etag = self.client.get('/api/stocks/current_prices/')['ETag']
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/stocks/current_prices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_price_history_and_detail(self):
+        for url in (f'/api/stocks/{self.stock.id}/', f'/api/stocks/{self.stock.id}/price_history/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class RendererTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='packer', email='packer@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'))
+        StockPrice.objects.create(stock=self.stock, price=Decimal('150.25'), volume=1200, timestamp=timezone.now())
+    
+    def test_orjson_matches_stock_renderer(self):
+        data = {
+            'price': Decimal('150.25'),
+            'when': timezone.now(),
+            'day': timezone.now().date(),
+            'symbols': ('AAPL', 'MSFT'),
+            'data': StockPriceSerializer(StockPrice.objects.all(), many=True).data,
+        }
+        
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+    
+    def test_msgpack_by_accept_header(self):
+        response = self.client.get('/api/stocks/', HTTP_ACCEPT='application/msgpack')
+        
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        payload = msgpack.unpackb(response.content)
+        self.assertEqual(payload['results'][0]['symbol'], 'AAPL')
+        
+        # Cached per media type
+        self.assertEqual(self.client.get('/api/stocks/')['Content-Type'], 'application/json')
+    
+    def test_price_history_as_msgpack(self):
+        url = f'/api/stocks/{self.stock.id}/price_history/'
+        streamed = json.loads(b''.join(self.client.get(url).streaming_content))
+        
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        
+        self.assertEqual(msgpack.unpackb(response.content), streamed)
+        columnar = msgpack.unpackb(self.client.get(url, {'layout': 'columnar', 'format': 'msgpack'}).content)
+        self.assertEqual(columnar['data']['price'], [150.25])
+    
+    def test_msgpack_request_body(self):
+        body = msgpack.packb({
+            'stock_symbol': 'AAPL', 'alert_type': 'threshold', 'condition': 'above', 'threshold_price': '200.00'
+        })
+        response = self.client.post('/api/alerts/', body, content_type='application/msgpack')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Alert.objects.filter(user=self.user, threshold_price=Decimal('200.00')).exists())
+        
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+
+class StockSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='searcher', email='searcher@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for symbol, name in [
+            ('AAPL', 'Apple Inc.'),
+            ('APP', 'AppLovin Corporation'),
+            ('SNAP', 'Snap Inc.'),
+            ('MSFT', 'Microsoft Corporation'),
+        ]:
+            Stock.objects.create(symbol=symbol, name=name, exchange='NASDAQ')
+        Stock.objects.create(symbol='APPN', name='Appian Corp', is_active=False)
+    
+    def search(self, q, **params):
+        response = self.client.get('/api/stocks/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(row['symbol'], row['match']) for row in response.json()['data']]
+    
+    def test_ranked_tiers(self):
+        self.assertEqual(self.search('app'), [('APP', 'exact'), ('AAPL', 'name_prefix')])
+        self.assertEqual(self.search('AA'), [('AAPL', 'symbol_prefix')])
+        self.assertEqual(self.search('corp'), [('APP', 'name_prefix'), ('MSFT', 'name_prefix')])
+        self.assertEqual(self.search('microso'), [('MSFT', 'name_prefix')])
+        self.assertEqual(self.search('apple inc'), [('AAPL', 'name_prefix')])
+        self.assertEqual(self.search('ap'), [
+            ('APP', 'symbol_prefix'), ('AAPL', 'name_prefix'), ('SNAP', 'symbol_contains')
+        ])
+        self.assertEqual(self.search('pple'), [('AAPL', 'name_contains')])
+        self.assertEqual(self.search('app', limit=1), [('APP', 'exact')])
+    
+    def test_served_from_memory(self):
+        self.search('a')
+        with self.assertNumQueries(0):
+            self.search('ms')
+    
+    def test_rebuilt_when_listing_changes(self):
+        self.assertEqual(self.search('nvd'), [])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Stock.objects.create(symbol='NVDA', name='NVIDIA Corporation')
+        self.assertEqual(self.search('nvd'), [('NVDA', 'symbol_prefix')])
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Stock.objects.filter(symbol='MSFT').get().save(update_fields=['current_price', 'last_updated'])
+        # Only the stocks scope moves on a price update
+        self.assertEqual(len(callbacks), 1)
+    
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/stocks/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/stocks/search/', {'q': 'a', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/stocks/search/', {'q': 'a', 'limit': 500}).status_code, 400)
+
+
+class AsyncReadPathTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='async', email='async@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}}
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('150.00'))
+        Stock.objects.create(symbol='MSFT', name='Microsoft', current_price=Decimal('300.00'))
+        now = timezone.now()
+        StockPrice.objects.bulk_create([
+            StockPrice(stock=self.stock, price=Decimal('100.00') + i, timestamp=now - timezone.timedelta(minutes=i))
+            for i in range(5)
+        ])
+    
+    async def test_stock_list_matches_sync(self):
+        expected = await sync_to_async(lambda: self.client.get('/api/stocks/', {'symbol': 'a'}).json())()
+        response = await self.async_client.get('/api/async/stocks/', {'symbol': 'a'}, **self.auth)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+    
+    async def test_current_prices_matches_sync(self):
+        expected = await sync_to_async(lambda: self.client.get('/api/stocks/current_prices/').json())()
+        response = await self.async_client.get('/api/async/stocks/current_prices/', **self.auth)
+        
+        self.assertEqual(response.json(), expected)
+        response = await self.async_client.get('/api/async/stocks/current_prices/', {'since': 'x'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get('/api/async/stocks/current_prices/', {'format': 'msgpack'}, **self.auth)
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+    
+    async def test_price_history_streams_same_pages(self):
+        url = f'/api/stocks/{self.stock.id}/price_history/'
+        expected = await sync_to_async(
+            lambda: json.loads(b''.join(self.client.get(url, {'limit': 2}).streaming_content))
+        )()
+        response = await self.async_client.get(f'/api/async{url[4:]}', {'limit': 2}, **self.auth)
+        payload = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        
+        self.assertEqual(payload, expected)
+        response = await self.async_client.get(f'/api/async{url[4:]}', {'limit': 0}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+    
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/async/stocks/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/async/stocks/', headers={'Authorization': 'Bearer junk'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post('/api/async/stocks/', **self.auth)
+        self.assertEqual(response.status_code, 405)
+    
+    async def test_query_string_token_refused(self):
+        token = self.auth['headers']['Authorization'][len('Bearer '):]
+        response = await self.async_client.get('/api/async/stocks/', {'token': token})
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(PRICE_BATCH_MAX_SYMBOLS=3)
+class BatchHistoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='watchlist', email='watchlist@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        self.ticks = {}
+        for symbol, base in (('AAPL', 100), ('MSFT', 300)):
+            stock = Stock.objects.create(symbol=symbol, name=symbol, current_price=Decimal(base))
+            prices = [
+                StockPrice(stock=stock, price=Decimal(base + i), timestamp=now - timezone.timedelta(minutes=7 * i))
+                for i in range(12)
+            ]
+            StockPrice.objects.bulk_create(prices)
+            self.ticks[symbol] = prices
+        rebuild_market_board()
+    
+    def test_aligned_series_from_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/stocks/batch-history/', {
+                'symbols': 'msft,AAPL,NOPE', 'hours': 1, 'resolution': '15m'
+            })
+        payload = response.json()
+        
+        self.assertEqual(payload['symbols'], ['MSFT', 'AAPL'])
+        self.assertEqual(payload['missing'], ['NOPE'])
+        self.assertEqual(payload['step'], 15 * 60 * 1000)
+        self.assertEqual(payload['quotes']['MSFT']['current_price'], 300.0)
+        for symbol, prices in self.ticks.items():
+            series = payload['data'][symbol]
+            self.assertEqual(len(series), payload['count'])
+            expected = [None] * payload['count']
+            for tick in sorted(prices, key=lambda tick: tick.timestamp):
+                bucket = (int(tick.timestamp.timestamp() * 1000) - payload['start']) // payload['step']
+                if bucket >= 0:
+                    expected[bucket] = float(tick.price)
+            self.assertEqual(series, expected)
+    
+    def test_limits(self):
+        for params in (
+            {},
+            {'symbols': 'A,B,C,D'},
+            {'symbols': 'AAPL', 'hours': 0},
+            {'symbols': 'AAPL', 'resolution': '2m'},
+            {'symbols': 'AAPL', 'hours': 48, 'resolution': '1m'},
+            {'symbols': 'AAPL', 'hours': 24, 'resolution': '1m'},  # 1441 aligned buckets
+        ):
+            response = self.client.get('/api/stocks/batch-history/', params)
+            self.assertEqual(response.status_code, 400, params)
+        
+        response = self.client.get('/api/stocks/batch-history/', {
+            'symbols': ['AAPL', 'MSFT,AAPL'], 'hours': 720, 'resolution': '1d'
+        })
+        self.assertEqual(response.json()['symbols'], ['AAPL', 'MSFT'])
+        response = self.client.get('/api/stocks/batch-history/', {'symbols': 'AAPL', 'hours': 23, 'resolution': '1m'})
+        self.assertEqual(response.json()['count'], 23 * 60 + 1)
+    
+    def test_msgpack(self):
+        response = self.client.get('/api/stocks/batch-history/', {'symbols': 'AAPL', 'format': 'msgpack'})
+        payload = msgpack.unpackb(response.content)
+        self.assertEqual(payload['symbols'], ['AAPL'])
+        self.assertEqual(len(payload['data']['AAPL']), payload['count'])
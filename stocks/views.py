@@ -2,11 +2,18 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 import logging
 
-from .models import Stock, StockPrice
-from .serializers import StockSerializer, StockPriceSerializer
+from .batch import batch_history, batch_params
+from .board import BOARD_RENDERERS, board_content, board_document, get_market_board
+from .cache import cached_response
+from .conditional import board_state, conditional, stock_state, stocks_state
+from .history import PriceHistoryStream, history_params
+from .models import Stock
+from .search import NODE_RESULTS, get_search_index
+from .serializers import StockSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -24,84 +31,139 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(symbol__icontains=symbol)
         return queryset.order_by('symbol')
     
+    @conditional(stocks_state)
+    @cached_response('stock-list')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional(stock_state)
+    @cached_response('stock-detail')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
+    @conditional(stock_state, windowed=True)
+    @cached_response('price-history')
     def price_history(self, request, pk=None):
-        """Get price history for a specific stock"""
+        """Stream price history for a specific stock, newest first, one keyset page at a time"""
         try:
             stock = self.get_object()
-            hours_param = request.query_params.get('hours', '24')
-            
-            # Validate hours parameter
             try:
-                hours = int(hours_param)
-            except ValueError:
+                hours, limit, before = history_params(request.query_params)
+            except ValueError as e:
                 return Response({
                     'success': False,
-                    'error': 'Hours parameter must be a valid integer'
+                    'error': str(e)
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Validate hours range
-            if hours <= 0:
+            since = timezone.now() - timezone.timedelta(hours=hours)
+            history = PriceHistoryStream(
+                stock, hours, since, before, limit,
+                columnar=request.query_params.get('layout') == 'columnar'
+            )
+            if request.accepted_renderer.format == 'msgpack':
+                return Response(history.document())
+            return StreamingHttpResponse(history, content_type='application/json')
+            
+        except Exception as e:
+            logger.error(f"Error fetching price history: {e}")
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    @conditional(board_state)
+    def current_prices(self, request):
+        """Get current prices for all active stocks, or only those changed since ``?since=<version>``"""
+        try:
+            board = get_market_board()
+            since, symbol = request.query_params.get('since'), request.query_params.get('symbol')
+            renderer = request.accepted_renderer
+            try:
+                if renderer.format not in BOARD_RENDERERS:
+                    return Response(board_document(board, since, symbol))
+                content = board_content(board, since, symbol, renderer.format)
+            except ValueError:
                 return Response({
                     'success': False,
-                    'error': 'Hours parameter must be greater than 0'
+                    'error': 'Since parameter must be a valid version number'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            if hours > 720:  # 30 days * 24 hours
+            return HttpResponse(content, content_type=renderer.media_type)
+            
+        except Exception as e:
+            logger.error(f"Error fetching current prices: {e}")
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'], url_path='batch-history')
+    @conditional(board_state, windowed=True)
+    @cached_response('batch-history')
+    def batch_history(self, request):
+        """Aligned price series and quotes for up to PRICE_BATCH_MAX_SYMBOLS symbols in one request"""
+        try:
+            now = timezone.now()
+            try:
+                symbols, hours, resolution = batch_params(request.query_params, now)
+            except ValueError as e:
                 return Response({
                     'success': False,
-                    'error': 'Hours parameter cannot exceed 720 (30 days)'
+                    'error': str(e)
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            since = timezone.now() - timezone.timedelta(hours=hours)
-            prices = StockPrice.objects.filter(
-                stock=stock,
-                timestamp__gte=since
-            ).order_by('-timestamp')
-            
-            serializer = StockPriceSerializer(prices, many=True)
-            
-            return Response({
-                'success': True,
-                'symbol': stock.symbol,
-                'period': f'{hours} hours',
-                'count': prices.count(),
-                'data': serializer.data
-            })
+            return Response(batch_history(get_market_board(), symbols, hours, resolution, now))
             
         except Exception as e:
-            logger.error(f"Error fetching price history: {e}")
+            logger.error(f"Error fetching batch history: {e}")
             return Response({
                 'success': False,
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @action(detail=False, methods=['get'])
-    def current_prices(self, request):
-        """Get current prices for all active stocks"""
+    def search(self, request):
+        """Ranked symbol and company name matches for ``?q=``, for autocomplete"""
         try:
-            stocks = self.get_queryset()
+            query = request.query_params.get('q', '').strip()
+            if not query:
+                return Response({
+                    'success': False,
+                    'error': 'Query parameter q is required'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            stocks_with_prices = []
-            for stock in stocks:
-                latest_price = stock.prices.first()  
-                stock_data = {
-                    'id': stock.id,
-                    'symbol': stock.symbol,
-                    'name': stock.name,
-                    'current_price': float(latest_price.price) if latest_price else None,
-                    'last_updated': latest_price.timestamp if latest_price else None
+            try:
+                limit = int(request.query_params.get('limit', 10))
+            except ValueError:
+                limit = 0
+            if not 0 < limit <= NODE_RESULTS:
+                return Response({
+                    'success': False,
+                    'error': f'Limit parameter must be between 1 and {NODE_RESULTS}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            results = [
+                {
+                    'id': stock['id'],
+                    'symbol': stock['symbol'],
+                    'name': stock['name'],
+                    'exchange': stock['exchange'],
+                    'match': match,
                 }
-                stocks_with_prices.append(stock_data)
+                for stock, match in get_search_index().search(query, limit)
+            ]
             
             return Response({
                 'success': True,
-                'count': len(stocks_with_prices),
-                'data': stocks_with_prices
+                'query': query,
+                'count': len(results),
+                'data': results
             })
             
         except Exception as e:
-            logger.error(f"Error fetching current prices: {e}")
+            logger.error(f"Error searching stocks: {e}")
             return Response({
                 'success': False,
                 'error': str(e)